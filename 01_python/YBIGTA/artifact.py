@@ -0,0 +1,340 @@
+import json
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import Sequence
+from typing import Optional, Union, Iterator, List, Dict, Tuple, Any
+from YBIGTA.vocabulary import Vocabulary
+
+# File layout (little-endian):
+#   header      : magic, format version, length of the metadata
+#   metadata    : JSON, padded with spaces to a multiple of 8 bytes
+#   offsets     : uint32 * (n_strings + 1), start of each string in the buffer
+#   token index : uint32 * token_slots, open-addressing hash table from the
+#                 CRC32 of a token to its ID + 1, 0 for an empty slot
+#   merge index : uint32 * merge_slots, the same from the CRC32 of
+#                 first + '\0' + second to the rank of the merge + 1
+#   buffer      : UTF-8 strings back to back; the tokens in ID order, then
+#                 the left and right symbol of every merge, in rank order
+# Both tables are probed linearly and at most half full. The slot counts
+# are powers of two, stored in the metadata.
+MAGIC = b'YBTK'
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<4sIQ')
+
+def build_index(keys: List[bytes]) -> array:
+    '''
+    Build a hash table from keys to their position, as stored in the file
+    Args:
+        keys (List[bytes]): keys, in value order; a repeated key keeps
+                            its first position
+    Returns:
+        uint32 slots holding position + 1, or 0 if empty
+    '''
+    n_slots = 1 << (2 * len(keys)).bit_length()
+    mask = n_slots - 1
+    slots = array('I', bytes(4 * n_slots))
+    for value, key in enumerate(keys):
+        slot = zlib.crc32(key) & mask
+        while slots[slot]:
+            if keys[slots[slot] - 1] == key:
+                break
+            slot = (slot + 1) & mask
+        else:
+            slots[slot] = value + 1
+    return slots
+
+def merge_key(first: bytes, second: bytes) -> bytes:
+    return first + b'\0' + second
+
+def save_artifact(path: str,
+                  meta: Dict[str, Any],
+                  tokens: List[str],
+                  merges: List[Tuple[str, str]]
+) -> None:
+    '''
+    Write a tokenizer artifact
+    Args:
+        path (str): output file
+        meta (Dict[str, Any]): JSON-serialisable metadata
+        tokens (List[str]): vocabulary, in ID order
+        merges (List[Tuple[str, str]]): merged pairs, in rank order
+    Returns:
+        None
+    '''
+    strings = list(tokens)
+    for first, second in merges:
+        strings += [first, second]
+    encoded = [string.encode('utf-8') for string in strings]
+    token_index = build_index(encoded[:len(tokens)])
+    merge_index = build_index([merge_key(encoded[k], encoded[k+1])
+                               for k in range(len(tokens), len(encoded), 2)])
+
+    meta = dict(meta, n_tokens=len(tokens), n_merges=len(merges),
+                token_slots=len(token_index), merge_slots=len(merge_index))
+    meta_bytes = json.dumps(meta).encode('utf-8')
+    meta_bytes += b' ' * (-len(meta_bytes) % 8)
+
+    offsets = array('I', [0])
+    for string in encoded:
+        offsets.append(offsets[-1] + len(string))
+    if sys.byteorder == 'big':
+        for table in (offsets, token_index, merge_index):
+            table.byteswap()
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(meta_bytes)))
+        f.write(meta_bytes)
+        f.write(offsets.tobytes())
+        f.write(token_index.tobytes())
+        f.write(merge_index.tobytes())
+        f.write(b''.join(encoded))
+
+class MappedArtifact:
+    def __init__(self,
+                 path: str
+    ) -> None:
+        '''
+        A tokenizer artifact memory-mapped for reading. Tables are used in
+        place and strings are decoded only when looked up, so opening the
+        file costs the same whatever the size of the vocabulary, and every
+        process mapping it shares the same pages of the page cache.
+        Args:
+            path (str): artifact file
+        Returns:
+            None
+        Raises:
+            ValueError: if the file is not an artifact of this format version
+        '''
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mm) < HEADER.size:
+            raise ValueError(f'{path} is not a tokenizer artifact')
+        magic, version, meta_len = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a tokenizer artifact')
+        if version != FORMAT_VERSION:
+            raise ValueError(f'unsupported tokenizer artifact version {version}')
+
+        pos = HEADER.size
+        self.meta = json.loads(self.mm[pos:pos+meta_len].decode('utf-8'))
+        pos += meta_len
+        self.n_tokens, self.n_merges = self.meta['n_tokens'], self.meta['n_merges']
+        self.offsets, pos = self._table(pos, self.n_tokens + 2 * self.n_merges + 1)
+        self.token_index, pos = self._table(pos, self.meta['token_slots'])
+        self.merge_index, pos = self._table(pos, self.meta['merge_slots'])
+        self.buffer = pos
+
+    def _table(self,
+               pos: int,
+               length: int
+    ) -> Tuple[Union[memoryview, array], int]:
+        # A view of the mapped pages, or a swapped copy on big-endian hosts
+        view = memoryview(self.mm)[pos:pos + 4 * length]
+        if sys.byteorder == 'little':
+            table = view.cast('I')
+        else:
+            table = array('I')
+            table.frombytes(view)
+            table.byteswap()
+        return table, pos + 4 * length
+
+    def raw(self,
+            i: int
+    ) -> bytes:
+        '''
+        Args:
+            i (int): string index; tokens first, then the merge symbols
+        Returns:
+            UTF-8 bytes of string i
+        '''
+        return self.mm[self.buffer+self.offsets[i]:self.buffer+self.offsets[i+1]]
+
+    def string(self,
+               i: int
+    ) -> str:
+        return str(self.raw(i), 'utf-8')
+
+    def find_token(self,
+                   token: str
+    ) -> Optional[int]:
+        '''
+        Args:
+            token (str)
+        Returns:
+            ID of the token, None if it is not in the vocabulary
+        '''
+        key = token.encode('utf-8')
+        index = self.token_index
+        mask = len(index) - 1
+        slot = zlib.crc32(key) & mask
+        while index[slot]:
+            if self.raw(index[slot] - 1) == key:
+                return index[slot] - 1
+            slot = (slot + 1) & mask
+        return None
+
+    def find_merge(self,
+                   first: str,
+                   second: str
+    ) -> Optional[int]:
+        '''
+        Args:
+            first (str), second (str): symbols of the pair
+        Returns:
+            Rank of the first merge of the pair, None if it was never merged
+        '''
+        first_key, second_key = first.encode('utf-8'), second.encode('utf-8')
+        index = self.merge_index
+        mask = len(index) - 1
+        slot = zlib.crc32(merge_key(first_key, second_key)) & mask
+        while index[slot]:
+            i = self.n_tokens + 2 * (index[slot] - 1)
+            if self.raw(i) == first_key and self.raw(i+1) == second_key:
+                return index[slot] - 1
+            slot = (slot + 1) & mask
+        return None
+
+class MappedVocabulary(Vocabulary):
+    def __init__(self,
+                 artifact: MappedArtifact
+    ) -> None:
+        '''
+        Read-only Vocabulary backed by a MappedArtifact. Lookups go through
+        the hash table in the file; the tokens looked up are remembered, so
+        memory grows with the part of the vocabulary a process actually uses.
+        Args:
+            artifact (MappedArtifact)
+        Returns:
+            None
+        '''
+        self.artifact = artifact
+        self.token_to_id: Dict[str, int] = {}
+
+    def add(self,
+            token: str
+    ) -> int:
+        token_id = self.get_id(token)
+        if token_id == -1:
+            raise TypeError('a vocabulary loaded from an artifact is read-only')
+        return token_id
+
+    def get_id(self,
+               token: str,
+               default: int = -1
+    ) -> int:
+        token_id = self.token_to_id.get(token)
+        if token_id is None:
+            token_id = self.artifact.find_token(token)
+            if token_id is None:
+                return default
+            self.token_to_id[token] = token_id
+        return token_id
+
+    def index(self,
+              token: str
+    ) -> int:
+        token_id = self.get_id(token)
+        if token_id == -1:
+            raise ValueError(f'{token!r} is not in vocabulary')
+        return token_id
+
+    def __contains__(self, token: str) -> bool:
+        return self.get_id(token) != -1
+
+    def __getitem__(self, token_id: int) -> str:
+        if token_id < 0:
+            token_id += len(self)
+        if not 0 <= token_id < len(self):
+            raise IndexError('token ID out of range')
+        return self.artifact.string(token_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return map(self.artifact.string, range(len(self)))
+
+    def __len__(self) -> int:
+        return self.artifact.n_tokens
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (Vocabulary, list)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f'MappedVocabulary({self.artifact.path!r})'
+
+class MappedRanks:
+    def __init__(self,
+                 artifact: MappedArtifact
+    ) -> None:
+        '''
+        Pair -> rank lookups of BPEEncoder, through the merge table of a
+        MappedArtifact; pairs looked up are remembered, as in MappedVocabulary
+        Args:
+            artifact (MappedArtifact)
+        Returns:
+            None
+        '''
+        self.artifact = artifact
+        self.cache: Dict[Tuple[str, str], Optional[int]] = {}
+
+    def get(self,
+            pair: Tuple[str, str]
+    ) -> Optional[int]:
+        try:
+            return self.cache[pair]
+        except KeyError:
+            rank = self.cache[pair] = self.artifact.find_merge(*pair)
+            return rank
+
+class MappedMerges(Sequence):
+    def __init__(self,
+                 artifact: MappedArtifact
+    ) -> None:
+        '''
+        The merges of a MappedArtifact, in rank order, decoded on access.
+        ranks looks pairs up without decoding the others.
+        Args:
+            artifact (MappedArtifact)
+        Returns:
+            None
+        '''
+        self.artifact = artifact
+        self.ranks = MappedRanks(artifact)
+
+    def __getitem__(self, rank: int) -> Tuple[str, str]:
+        if rank < 0:
+            rank += len(self)
+        if not 0 <= rank < len(self):
+            raise IndexError('merge rank out of range')
+        i = self.artifact.n_tokens + 2 * rank
+        return self.artifact.string(i), self.artifact.string(i+1)
+
+    def __len__(self) -> int:
+        return self.artifact.n_merges
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (MappedMerges, list)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f'MappedMerges({self.artifact.path!r})'
+
+def load_artifact(path: str
+) -> Tuple[Dict[str, Any], MappedVocabulary, MappedMerges]:
+    '''
+    Memory-map a tokenizer artifact. Nothing but the metadata is decoded
+    up front; see MappedArtifact.
+    Args:
+        path (str): artifact file
+    Returns:
+        meta (Dict[str, Any]): metadata
+        tokens (MappedVocabulary): vocabulary, in ID order
+        merges (MappedMerges): merged pairs, in rank order
+    '''
+    artifact = MappedArtifact(path)
+    return artifact.meta, MappedVocabulary(artifact), MappedMerges(artifact)
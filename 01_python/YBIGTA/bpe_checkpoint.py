@@ -0,0 +1,186 @@
+import hashlib
+import os
+import pickle
+import struct
+import zlib
+from array import array
+from typing import Optional, Dict, Any
+from YBIGTA.bpe_trainer import BPETrainer
+
+# A checkpoint is a directory holding
+#   base.bin : pickled training settings and word table of the trainer
+#              when training started
+#   log.bin  : one record per save, each the changes since the previous save
+# A record is its payload length, the pickled payload and its CRC32, so a
+# record cut short by a crash is detected and dropped on restore.
+RECORD_HEADER = struct.Struct('<Q')
+RECORD_CRC = struct.Struct('<I')
+
+def corpus_fingerprint(word_freq: Dict[str, int]) -> str:
+    '''
+    Hash of a word table, in order, to tell whether a checkpoint was
+    written for the same corpus
+    Args:
+        word_freq (Dict[str, int]): words as space-separated symbols
+                                    and their frequencies
+    Returns:
+        Hex digest of the words and their frequencies
+    '''
+    digest = hashlib.sha256()
+    for word, freq in word_freq.items():
+        digest.update(f'{word}\t{freq}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+class BPECheckpoint:
+    def __init__(self,
+                 path: str
+    ) -> None:
+        '''
+        Incremental checkpoints of a BPETrainer. The full word table is
+        written once, when training starts; after that each save only
+        appends the merges, the new symbols and the words rewritten since
+        the previous save, so the cost of a save grows with the work done
+        since the last one rather than with the size of the corpus.
+        Args:
+            path (str): checkpoint directory, created if necessary
+        Returns:
+            None
+        '''
+        self.path = path
+        self.base_path = os.path.join(path, 'base.bin')
+        self.log_path = os.path.join(path, 'log.bin')
+        self.n_merges = 0
+        self.n_symbols = 0
+
+    def exists(self) -> bool:
+        '''
+        Returns:
+            Whether a checkpoint to resume from has been written
+        '''
+        return os.path.exists(self.base_path)
+
+    def start(self,
+              trainer: BPETrainer,
+              settings: Optional[Dict[str, Any]] = None
+    ) -> None:
+        '''
+        Write the word table of a new trainer and discard any older checkpoint
+        Args:
+            trainer (BPETrainer): trainer about to start training
+            settings (Dict[str, Any]): what the training depends on, e.g. the
+                                       corpus_fingerprint and min_frequency,
+                                       checked by restore()
+        Returns:
+            None
+        '''
+        os.makedirs(self.path, exist_ok=True)
+        table = (settings or {}, trainer.id_to_symbol, trainer.merges,
+                 trainer.symbols, trainer.offsets, trainer.lengths, trainer.freqs)
+        tmp_path = self.base_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(table, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        # Truncate the log before the new base becomes visible, so an old
+        # log is never replayed on top of a new base
+        open(self.log_path, 'wb').close()
+        os.replace(tmp_path, self.base_path)
+
+        trainer.dirty.clear()
+        self.n_merges = len(trainer.merges)
+        self.n_symbols = len(trainer.id_to_symbol)
+
+    def save(self,
+             trainer: BPETrainer
+    ) -> None:
+        '''
+        Append the changes made by the trainer since the previous save
+        Args:
+            trainer (BPETrainer): trainer passed to start() or returned by restore()
+        Returns:
+            None
+        '''
+        words = array('q', sorted(trainer.dirty))
+        lengths = array('i')
+        ids = array('i')
+        for i in words:
+            start = trainer.offsets[i]
+            lengths.append(trainer.lengths[i])
+            ids.extend(trainer.symbols[start:start+trainer.lengths[i]])
+        payload = pickle.dumps((trainer.id_to_symbol[self.n_symbols:],
+                                trainer.merges[self.n_merges:],
+                                words, lengths, ids),
+                               protocol=pickle.HIGHEST_PROTOCOL)
+
+        with open(self.log_path, 'ab') as f:
+            f.write(RECORD_HEADER.pack(len(payload)))
+            f.write(payload)
+            f.write(RECORD_CRC.pack(zlib.crc32(payload)))
+            f.flush()
+            os.fsync(f.fileno())
+
+        trainer.dirty.clear()
+        self.n_merges = len(trainer.merges)
+        self.n_symbols = len(trainer.id_to_symbol)
+
+    def restore(self,
+                num_workers: Optional[int] = 1,
+                settings: Optional[Dict[str, Any]] = None
+    ) -> BPETrainer:
+        '''
+        Rebuild the trainer as of the last complete save. Later saves
+        continue to append to the same checkpoint.
+        Args:
+            num_workers (int): number of processes for the pair count,
+                               None to use all cores
+            settings (Dict[str, Any]): settings of the training to resume,
+                                       None to skip the check
+        Returns:
+            BPETrainer that continues where the saved one stopped
+        Raises:
+            ValueError: if settings differ from those passed to start()
+        '''
+        with open(self.base_path, 'rb') as f:
+            saved_settings, id_to_symbol, merges, symbols, offsets, lengths, freqs = pickle.load(f)
+        if settings is not None and settings != saved_settings:
+            keys = sorted(key for key in set(settings) | set(saved_settings)
+                          if settings.get(key) != saved_settings.get(key))
+            raise ValueError(f'checkpoint in {self.path} was written with a different '
+                             f'{", ".join(keys)}; train without resume to start over')
+
+        valid = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'rb') as f:
+                data = f.read()
+            pos = 0
+            while pos + RECORD_HEADER.size <= len(data):
+                size, = RECORD_HEADER.unpack_from(data, pos)
+                end = pos + RECORD_HEADER.size + size + RECORD_CRC.size
+                if end > len(data):
+                    break
+                payload = data[pos+RECORD_HEADER.size:end-RECORD_CRC.size]
+                crc, = RECORD_CRC.unpack_from(data, end - RECORD_CRC.size)
+                if crc != zlib.crc32(payload):
+                    break
+
+                new_symbols, new_merges, words, word_lengths, ids = pickle.loads(payload)
+                id_to_symbol += new_symbols
+                merges += new_merges
+                read = 0
+                for i, length in zip(words, word_lengths):
+                    start = offsets[i]
+                    symbols[start:start+length] = ids[read:read+length]
+                    lengths[i] = length
+                    read += length
+                pos = valid = end
+
+            if valid < len(data):
+                # Drop the torn record, so that new records follow the last valid one
+                with open(self.log_path, 'r+b') as f:
+                    f.truncate(valid)
+
+        trainer = BPETrainer.from_table(id_to_symbol, symbols, offsets, lengths, freqs,
+                                        merges, num_workers)
+        self.n_merges = len(trainer.merges)
+        self.n_symbols = len(trainer.id_to_symbol)
+        return trainer
@@ -0,0 +1,118 @@
+from collections import OrderedDict
+from typing import List, Dict, Tuple
+
+Pair = Tuple[str, str]
+
+class BPEEncoder:
+    def __init__(self,
+                 merges: List[Pair],
+                 cache_size: int = 65536
+    ) -> None:
+        '''
+        Encode words by replaying learned merges in rank order,
+        with a bounded LRU cache from word to tokens
+        Args:
+            merges (List[Pair]): merged pairs, in the order they were learned;
+                                 merges loaded from an artifact bring their
+                                 own rank lookup
+            cache_size (int): maximum number of cached words, 0 disables the cache
+        Returns:
+            None
+        '''
+        self.ranks = getattr(merges, 'ranks', None)
+        if self.ranks is None:
+            self.ranks: Dict[Pair, int] = {}
+            for rank, pair in enumerate(merges):
+                self.ranks.setdefault(tuple(pair), rank)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def encode_word(self,
+                    word: str
+    ) -> Tuple[str, ...]:
+        '''
+        Split a word into tokens, using the cache if possible
+        Args:
+            word (str)
+        Returns:
+            Tuple of tokens
+        '''
+        tokens = self.cache.get(word)
+        if tokens is not None:
+            self.hits += 1
+            self.cache.move_to_end(word)
+            return tokens
+
+        self.misses += 1
+        tokens = self.apply_merges(word)
+        if self.cache_size > 0:
+            self.cache[word] = tokens
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return tokens
+
+    def apply_merges(self,
+                     word: str
+    ) -> Tuple[str, ...]:
+        '''
+        Repeatedly merge the lowest-ranked pair in the word until
+        no learned merge applies
+        Args:
+            word (str)
+        Returns:
+            Tuple of tokens
+        '''
+        symbols = list(word)
+        ranks = self.ranks
+        while len(symbols) > 1:
+            best_rank, best_pair = None, None
+            for pair in zip(symbols, symbols[1:]):
+                rank = ranks.get(pair)
+                if rank is not None and (best_rank is None or rank < best_rank):
+                    best_rank, best_pair = rank, pair
+            if best_pair is None:
+                break
+
+            first, second = best_pair
+            merged = first + second
+            new_symbols = []
+            j = 0
+            while j < len(symbols):
+                if j < len(symbols)-1 and symbols[j] == first and symbols[j+1] == second:
+                    new_symbols.append(merged)
+                    j += 2
+                else:
+                    new_symbols.append(symbols[j])
+                    j += 1
+            symbols = new_symbols
+        return tuple(symbols)
+
+    def cache_info(self) -> Dict[str, float]:
+        '''
+        Cache statistics
+        Args:
+            None
+        Returns:
+            hits, misses, hit rate and current size of the cache
+        '''
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self.cache),
+        }
+
+    def clear_cache(self) -> None:
+        '''
+        Drop all cached words and reset statistics
+        Args:
+            None
+        Returns:
+            None
+        '''
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,437 @@
+import heapq
+from array import array
+from typing import Optional, Callable, List, Dict, Tuple, TYPE_CHECKING
+from YBIGTA.parallel import resolve_num_workers, map_shards
+
+if TYPE_CHECKING:
+    from YBIGTA.bpe_checkpoint import BPECheckpoint
+
+Pair = Tuple[str, str]
+
+# A pair of symbol IDs (first, second) is packed into one int key
+PAIR_SHIFT = 32
+PAIR_MASK = (1 << PAIR_SHIFT) - 1
+
+def count_pairs_range(symbols: array,
+                      offsets: array,
+                      lengths: array,
+                      freqs: array,
+                      start: int,
+                      stop: int
+) -> Tuple[Dict[int, int], Dict[int, List[int]]]:
+    '''
+    Count the pairs of words start..stop-1 of a flat word table
+    Args:
+        symbols, offsets, lengths, freqs (array): word table of BPETrainer
+        start (int), stop (int): range of word indices
+    Returns:
+        pairs_freq (Dict[int, int]): frequency of each packed pair
+        pairs_words (Dict[int, List[int]]): indices of words containing each pair
+    '''
+    pairs_freq, pairs_words = {}, {}
+    for i in range(start, stop):
+        freq = freqs[i]
+        word = symbols[offsets[i]:offsets[i]+lengths[i]]
+        for first, second in zip(word, word[1:]):
+            pair = first << PAIR_SHIFT | second
+            if pair not in pairs_freq:
+                pairs_freq[pair] = 0
+                pairs_words[pair] = [i]
+            elif pairs_words[pair][-1] != i:
+                pairs_words[pair].append(i)
+            pairs_freq[pair] += freq
+    return pairs_freq, pairs_words
+
+class BPETrainer:
+    def __init__(self,
+                 word_freq: Dict[str, int],
+                 num_workers: Optional[int] = 1
+    ) -> None:
+        '''
+        Incremental BPE training engine. Pair counts and a pair -> words
+        inverted index are kept alive across merges, so each merge only
+        revisits the words that actually contain the merged pair.
+
+        Symbols are interned to integer IDs and all words are stored back
+        to back in one flat array('i'), with parallel arrays for the start,
+        length and frequency of each word. A merge rewrites a word's IDs in
+        place, so no strings are built during training.
+        Args:
+            word_freq (Dict[str, int]): words as space-separated symbols
+                                        and their frequencies
+            num_workers (int): number of processes for the initial pair count,
+                               None to use all cores
+        Returns:
+            None
+        '''
+        self.id_to_symbol = []
+        self.symbol_to_id = {}
+        self.merges = []
+        # Indices of words rewritten since the last checkpoint
+        self.dirty = set()
+
+        self.symbols = array('i')
+        self.offsets = array('q')
+        self.lengths = array('i')
+        self.freqs = array('q')
+        for word, freq in word_freq.items():
+            ids = [self.intern(symbol) for symbol in word.split()]
+            self.offsets.append(len(self.symbols))
+            self.lengths.append(len(ids))
+            self.freqs.append(freq)
+            self.symbols.extend(ids)
+
+        self.count_symbols()
+        self.count_pairs(num_workers)
+
+    @classmethod
+    def from_table(cls,
+                   id_to_symbol: List[str],
+                   symbols: array,
+                   offsets: array,
+                   lengths: array,
+                   freqs: array,
+                   merges: List[Pair],
+                   num_workers: Optional[int] = 1
+    ) -> 'BPETrainer':
+        '''
+        Rebuild a trainer from a saved word table, e.g. a checkpoint
+        Args:
+            id_to_symbol (List[str]): symbol of each symbol ID
+            symbols, offsets, lengths, freqs (array): flat word table
+            merges (List[Pair]): merges done so far
+            num_workers (int): number of processes for the pair count,
+                               None to use all cores
+        Returns:
+            BPETrainer that continues where the saved one stopped
+        '''
+        trainer = cls({})
+        for symbol in id_to_symbol:
+            trainer.intern(symbol)
+        trainer.symbols = symbols
+        trainer.offsets = offsets
+        trainer.lengths = lengths
+        trainer.freqs = freqs
+        trainer.merges = list(merges)
+        trainer.count_symbols()
+        trainer.count_pairs(num_workers)
+        return trainer
+
+    def count_symbols(self) -> None:
+        '''
+        Count the occurrences of each symbol ID in the word table, so the
+        vocabulary size is known without rescanning during training
+        Args:
+            None
+        Returns:
+            None
+        '''
+        self.symbol_counts = [0] * len(self.id_to_symbol)
+        for i in range(len(self.freqs)):
+            start = self.offsets[i]
+            for symbol in self.symbols[start:start+self.lengths[i]]:
+                self.symbol_counts[symbol] += 1
+        self.n_symbols = sum(1 for count in self.symbol_counts if count > 0)
+
+    def count_pairs(self,
+                    num_workers: Optional[int] = 1
+    ) -> None:
+        '''
+        (Re)build pair counts, the inverted index and the priority queue
+        from the current word table. With several workers, disjoint slices
+        of the word table are counted in parallel and reduced in order.
+        Args:
+            num_workers (int): number of processes, None to use all cores
+        Returns:
+            None
+        '''
+        num_workers = resolve_num_workers(num_workers)
+        table = (self.symbols, self.offsets, self.lengths, self.freqs)
+        if num_workers > 1 and len(self.freqs) > num_workers:
+            shards = map_shards(count_pairs_range, table, len(self.freqs), num_workers)
+        else:
+            shards = [count_pairs_range(*table, 0, len(self.freqs))]
+
+        self.pairs_freq = {}
+        self.pairs_words = {}
+        first_words = {}
+        for pairs_freq, pairs_words in shards:
+            for pair, freq in pairs_freq.items():
+                if pair in self.pairs_freq:
+                    self.pairs_freq[pair] += freq
+                    self.pairs_words[pair].update(pairs_words[pair])
+                else:
+                    self.pairs_freq[pair] = freq
+                    self.pairs_words[pair] = set(pairs_words[pair])
+                    first_words[pair] = pairs_words[pair][0]
+
+        # Shards are reduced in order, so the first shard holding a pair
+        # has its first word
+        self.pairs_first = {}
+        positions = {}
+        last_word = None
+        for pair, i in first_words.items():
+            if i != last_word:
+                positions, last_word = self.first_positions(i), i
+            self.pairs_first[pair] = i, positions[pair]
+
+        self.heap = [(-freq, *self.pairs_first[pair], pair) for pair, freq in self.pairs_freq.items()]
+        heapq.heapify(self.heap)
+
+    def intern(self,
+               symbol: str
+    ) -> int:
+        '''
+        Args:
+            symbol (str)
+        Returns:
+            ID of the symbol, assigning a new one if necessary
+        '''
+        symbol_id = self.symbol_to_id.get(symbol)
+        if symbol_id is None:
+            symbol_id = len(self.id_to_symbol)
+            self.symbol_to_id[symbol] = symbol_id
+            self.id_to_symbol.append(symbol)
+            if hasattr(self, 'symbol_counts'):
+                self.symbol_counts.append(0)
+        return symbol_id
+
+    def word_pairs(self,
+                   i: int
+    ) -> List[int]:
+        '''
+        Args:
+            i (int): word index
+        Returns:
+            Packed keys of the adjacent symbol pairs of word i, in order
+        '''
+        start = self.offsets[i]
+        word = self.symbols[start:start+self.lengths[i]]
+        return [first << PAIR_SHIFT | second for first, second in zip(word, word[1:])]
+
+    def first_positions(self,
+                        i: int
+    ) -> Dict[int, int]:
+        '''
+        Args:
+            i (int): word index
+        Returns:
+            Position of the first occurrence in word i of each of its pairs
+        '''
+        positions = {}
+        for j, pair in enumerate(self.word_pairs(i)):
+            positions.setdefault(pair, j)
+        return positions
+
+    def train(self,
+              n_iter: Optional[int] = None,
+              vocab_size: Optional[int] = None,
+              min_frequency: int = 1,
+              checkpoint: Optional['BPECheckpoint'] = None,
+              checkpoint_every: int = 1000,
+              progress: Optional[Callable[[int, int], None]] = None
+    ) -> List[Pair]:
+        '''
+        Merge pairs until n_iter merges are done in total, the vocabulary
+        reaches vocab_size, or the most frequent pair occurs less than
+        min_frequency times
+        Args:
+            n_iter (int): maximum total number of merges, None for no limit
+            vocab_size (int): target number of symbols in the word table,
+                              None for no limit
+            min_frequency (int): minimum frequency of a pair to be merged
+            checkpoint (BPECheckpoint): where to save progress, None to disable
+            checkpoint_every (int): number of merges between checkpoints
+            progress (Callable): called after every merge with the number of
+                                 merges and the vocabulary size (including
+                                 the padding token), e.g. Profiler.progress
+        Returns:
+            merges (List[Pair]): merged pairs, in order
+        '''
+        last_checkpoint = len(self.merges)
+        while n_iter is None or len(self.merges) < n_iter:
+            if vocab_size is not None and self.n_symbols >= vocab_size:
+                break
+            max_pair = self.best_pair()
+            if max_pair is None:
+                break
+            if self.pairs_freq[max_pair] < min_frequency:
+                # Put the pair back, so that training can be continued
+                heapq.heappush(self.heap, (-self.pairs_freq[max_pair], *self.pairs_first[max_pair], max_pair))
+                break
+            self.merge(max_pair)
+            if progress is not None:
+                progress(len(self.merges), self.n_symbols + 1)
+
+            if checkpoint is not None and len(self.merges) - last_checkpoint >= checkpoint_every:
+                checkpoint.save(self)
+                last_checkpoint = len(self.merges)
+
+        if checkpoint is not None and len(self.merges) > last_checkpoint:
+            checkpoint.save(self)
+        return self.merges
+
+    def best_pair(self) -> Optional[int]:
+        '''
+        Pop the most frequent pair from the priority queue.
+        Heap entries are (-frequency, word index, position, pair), so ties
+        are broken by the first occurrence of the pair in the word table,
+        which is the order BPETokenizer.get_stats inserts pairs into
+        pairs_freq. An entry is stale once the pair's frequency or first
+        occurrence has changed; stale entries are discarded lazily.
+        Args:
+            None
+        Returns:
+            max_pair (int): packed key of the most frequent pair,
+                            None if no pair is left
+        '''
+        heap = self.heap
+        while heap:
+            neg_freq, i, j, pair = heapq.heappop(heap)
+            if self.pairs_freq.get(pair) == -neg_freq and self.pairs_first[pair] == (i, j):
+                return pair
+        return None
+
+    def first_occurrence(self,
+                         pair: int
+    ) -> Tuple[int, int]:
+        '''
+        Find the first position of a pair in the word table, by searching
+        the words that contain it
+        Args:
+            pair (int): packed key of the pair
+        Returns:
+            (word index, symbol index) of the first occurrence
+        '''
+        i = min(self.pairs_words[pair])
+        return i, self.word_pairs(i).index(pair)
+
+    def merge(self,
+              max_pair: int
+    ) -> None:
+        '''
+        Merge max_pair in every word that contains it, and update pair
+        counts, the inverted index and the priority queue accordingly
+        Args:
+            max_pair (int): packed key of the pair to merge
+        Returns:
+            None
+        '''
+        first, second = max_pair >> PAIR_SHIFT, max_pair & PAIR_MASK
+        first_symbol, second_symbol = self.id_to_symbol[first], self.id_to_symbol[second]
+        merged = self.intern(first_symbol + second_symbol)
+        self.merges.append((first_symbol, second_symbol))
+
+        symbols = self.symbols
+        changed = {}
+        # Pairs whose first occurrence moved, and pairs whose first word lost them
+        moved = set()
+        lost = set()
+        n_merged = 0
+        for i in self.pairs_words[max_pair].copy():
+            freq = self.freqs[i]
+            old_pairs = self.word_pairs(i)
+
+            # Rewrite the word in place; it can only get shorter
+            start = self.offsets[i]
+            end = start + self.lengths[i]
+            read = write = start
+            while read < end:
+                if read < end-1 and symbols[read] == first and symbols[read+1] == second:
+                    symbols[write] = merged
+                    read += 2
+                else:
+                    symbols[write] = symbols[read]
+                    read += 1
+                write += 1
+            n_merged += read - write
+            self.lengths[i] = write - start
+            self.dirty.add(i)
+            new_pairs = self.word_pairs(i)
+
+            # Only pairs around the merged positions change their count
+            delta = {}
+            for pair in old_pairs:
+                delta[pair] = delta.get(pair, 0) - 1
+            for pair in new_pairs:
+                delta[pair] = delta.get(pair, 0) + 1
+
+            remaining = None
+            for pair, count in delta.items():
+                if count == 0:
+                    continue
+                if pair not in self.pairs_freq:
+                    self.pairs_freq[pair] = 0
+                    self.pairs_words[pair] = set()
+                changed.setdefault(pair, self.pairs_freq[pair])
+                self.pairs_freq[pair] += count * freq
+                if count > 0:
+                    self.pairs_words[pair].add(i)
+                else:
+                    if remaining is None:
+                        remaining = set(new_pairs)
+                    if pair not in remaining:
+                        self.pairs_words[pair].discard(i)
+                        if self.pairs_first[pair][0] == i:
+                            lost.add(pair)
+
+            # Positions in the rewritten word shifted, and new pairs may
+            # occur earlier than anywhere else
+            for pair, j in self.first_positions(i).items():
+                occurrence = self.pairs_first.get(pair)
+                if occurrence is None or occurrence[0] >= i and occurrence != (i, j):
+                    self.pairs_first[pair] = i, j
+                    moved.add(pair)
+
+        self.update_symbol_count(merged, n_merged)
+        self.update_symbol_count(first, -n_merged)
+        self.update_symbol_count(second, -n_merged)
+
+        for pair, old_freq in changed.items():
+            if self.pairs_freq[pair] == 0:
+                del self.pairs_freq[pair]
+                del self.pairs_words[pair]
+                del self.pairs_first[pair]
+            elif self.pairs_freq[pair] != old_freq:
+                moved.add(pair)
+        for pair in lost:
+            if pair in self.pairs_words:
+                self.pairs_first[pair] = self.first_occurrence(pair)
+                moved.add(pair)
+        for pair in moved:
+            if pair in self.pairs_freq:
+                heapq.heappush(self.heap, (-self.pairs_freq[pair], *self.pairs_first[pair], pair))
+
+    def update_symbol_count(self,
+                            symbol: int,
+                            count: int
+    ) -> None:
+        '''
+        Add count occurrences of a symbol and keep n_symbols up to date
+        Args:
+            symbol (int): symbol ID
+            count (int): change in the number of occurrences
+        Returns:
+            None
+        '''
+        before = self.symbol_counts[symbol]
+        self.symbol_counts[symbol] = before + count
+        if before == 0 and count > 0:
+            self.n_symbols += 1
+        elif before > 0 and before + count == 0:
+            self.n_symbols -= 1
+
+    def word_freq(self) -> Dict[str, int]:
+        '''
+        Current word table in the format of BPETokenizer.word_freq
+        Args:
+            None
+        Returns:
+            word_freq (Dict[str, int]): words as space-separated symbols
+        '''
+        word_freq = {}
+        for i in range(len(self.freqs)):
+            start = self.offsets[i]
+            word = self.symbols[start:start+self.lengths[i]]
+            word_freq[" ".join(self.id_to_symbol[symbol] for symbol in word)] = self.freqs[i]
+        return word_freq
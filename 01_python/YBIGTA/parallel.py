@@ -0,0 +1,236 @@
+import os
+from collections import Counter, deque
+from itertools import islice
+from multiprocessing import Pool
+from typing import Optional, Union, Callable, Iterable, Iterator, List, Tuple
+from YBIGTA.vocabulary import Vocabulary
+from YBIGTA.preprocessor import QuoteStats
+from YBIGTA.artifact import MappedVocabulary, load_artifact
+
+# Tokenizer owned by each worker process, set up once by the pool initializer
+_worker_tokenizer = None
+# Shared read-only arguments of map_shards, set up once by the pool initializer
+_worker_state = ()
+
+def resolve_num_workers(num_workers: Optional[int]) -> int:
+    '''
+    Args:
+        num_workers (int): number of worker processes, None for all cores
+    Returns:
+        Number of worker processes to use
+    '''
+    if num_workers is None:
+        return os.cpu_count() or 1
+    if not isinstance(num_workers, int) or num_workers < 1:
+        raise ValueError('num_workers needs to be a positive integer or None')
+    return num_workers
+
+def chunked(items: Iterable, chunk_size: int) -> Iterator[List]:
+    '''
+    Split items into consecutive chunks without reading ahead
+    Args:
+        items (Iterable)
+        chunk_size (int): maximum length of a chunk
+    Returns:
+        Iterator over the chunks, in order
+    '''
+    if not isinstance(chunk_size, int) or chunk_size < 1:
+        raise ValueError('chunk_size needs to be a positive integer')
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def imap_bounded(pool: Pool,
+                 func: Callable,
+                 iterable: Iterable,
+                 max_pending: int
+) -> Iterator:
+    '''
+    Like Pool.imap, but never pulls more than max_pending items from
+    iterable ahead of the results consumed by the caller
+    Args:
+        pool (Pool)
+        func (Callable): picklable function applied to each item
+        iterable (Iterable)
+        max_pending (int): maximum number of submitted but unconsumed tasks
+    Returns:
+        Iterator over the results, in input order
+    '''
+    pending = deque()
+    for item in iterable:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+def _init_word_counter(tokenizer_class: type,
+                       profile: bool
+) -> None:
+    global _worker_tokenizer
+    _worker_tokenizer = tokenizer_class()
+    if profile:
+        _worker_tokenizer.enable_profiling()
+
+def _count_words(texts: List[str]) -> Tuple[Counter, QuoteStats, Optional[dict]]:
+    preprocessor = _worker_tokenizer.preprocessor
+    preprocessor.quote_stats = QuoteStats()
+    profiler = _worker_tokenizer.profiler
+    if profiler is not None:
+        profiler.stages = {}
+    counter = _worker_tokenizer.count_words(texts)
+    return counter, preprocessor.quote_stats, profiler.stages if profiler is not None else None
+
+def count_words_parallel(tokenizer_class: type,
+                         chunks: Iterable[List[str]],
+                         num_workers: int,
+                         profile: bool = False
+) -> Iterator[Tuple[Counter, QuoteStats, Optional[dict]]]:
+    '''
+    Count words of each chunk of documents over a process pool. Each worker
+    builds an empty tokenizer of tokenizer_class once and returns one
+    Counter per chunk, with the QuoteStats of the chunk's preprocessing
+    and, if profile is set, the Profiler stages timed while counting it.
+    Only a few chunks per worker are in flight at a time, so chunks can be
+    streamed from disk.
+    Args:
+        tokenizer_class (type): Tokenizer subclass that defines text_to_words
+        chunks (Iterable[List[str]]): chunks of documents
+        num_workers (int): number of worker processes
+        profile (bool): whether to time the stages in the workers
+    Returns:
+        Iterator over the Counters, QuoteStats and stages (None unless
+        profiling), in chunk order
+    '''
+    with Pool(num_workers, initializer=_init_word_counter, initargs=(tokenizer_class, profile)) as pool:
+        yield from imap_bounded(pool, _count_words, chunks, 2 * num_workers)
+
+def init_encoder(tokenizer_class: type,
+                 meta: dict,
+                 tokens: Union[List[str], str],
+                 merges: Optional[List[Tuple[str, str]]]
+) -> None:
+    '''
+    Pool initializer of the encoding workers, called with encoder_initargs:
+    rebuild the trained tokenizer once per worker process for encode_chunk
+    Args:
+        tokenizer_class (type): class of the trained tokenizer
+        meta (dict): its metadata
+        tokens (List[str], str): its vocabulary, or the path of the artifact
+                                 it was loaded from
+        merges (List[Tuple[str, str]]): its merges, None with a path
+    Returns:
+        None
+    '''
+    global _worker_tokenizer
+    _worker_tokenizer = tokenizer_class()
+    if isinstance(tokens, str):
+        _, tokens, merges = load_artifact(tokens)
+    else:
+        tokens = Vocabulary(tokens)
+    _worker_tokenizer.load_state(meta, tokens, merges)
+
+def encoder_initargs(tokenizer) -> tuple:
+    '''
+    Arguments of the init_encoder pool initializer: the trained state of
+    tokenizer, so that tasks only need to carry texts. A tokenizer loaded
+    from an artifact hands over the path instead, and every worker maps
+    the same file.
+    '''
+    if isinstance(tokenizer.tokens, MappedVocabulary):
+        return type(tokenizer), tokenizer.metadata(), tokenizer.tokens.artifact.path, None
+    return (type(tokenizer), tokenizer.metadata(), list(tokenizer.tokens),
+            list(getattr(tokenizer, 'merges', [])))
+
+def encode_chunk(task: Tuple[List[str], Optional[int]]) -> List[List[int]]:
+    '''
+    Encode texts in a worker set up by init_encoder
+    Args:
+        task (Tuple[List[str], Optional[int]]): texts and maximum length of
+                                                list of tokens
+    Returns:
+        List of token IDs for each text
+    '''
+    texts, max_length = task
+    return _worker_tokenizer.encode(texts, max_length)
+
+def encode_iter_parallel(tokenizer,
+                         batches: Iterable[List[str]],
+                         max_length: Optional[int],
+                         num_workers: int
+) -> Iterator[List[List[int]]]:
+    '''
+    Encode batches of texts over a process pool. The trained vocabulary and
+    merges are handed to each worker once by the pool initializer, so tasks
+    only carry the texts. Only a few batches per worker are in flight at a
+    time, so batches can be streamed from disk.
+    Args:
+        tokenizer (Tokenizer): trained tokenizer
+        batches (Iterable[List[str]]): batches of texts
+        max_length (int): maximum length of list of tokens
+        num_workers (int): number of worker processes
+    Returns:
+        Iterator over the token IDs of each batch, in batch order
+    '''
+    tasks = ((batch, max_length) for batch in batches)
+    with Pool(num_workers, initializer=init_encoder, initargs=encoder_initargs(tokenizer)) as pool:
+        yield from imap_bounded(pool, encode_chunk, tasks, 2 * num_workers)
+
+def encode_parallel(tokenizer,
+                    texts: List[str],
+                    max_length: Optional[int],
+                    num_workers: int,
+                    chunk_size: int
+) -> List[List[int]]:
+    '''
+    Encode texts over a process pool, chunk_size texts per task
+    Args:
+        tokenizer (Tokenizer): trained tokenizer
+        texts (List[str])
+        max_length (int): maximum length of list of tokens
+        num_workers (int): number of worker processes
+        chunk_size (int): number of texts per task
+    Returns:
+        List of token IDs for each text, in input order
+    '''
+    text_tokenIDs = []
+    for chunk_tokenIDs in encode_iter_parallel(tokenizer, chunked(texts, chunk_size),
+                                               max_length, num_workers):
+        text_tokenIDs += chunk_tokenIDs
+    return text_tokenIDs
+
+def _init_shard_worker(state: tuple) -> None:
+    global _worker_state
+    _worker_state = state
+
+def _run_shard(task: Tuple[Callable, int, int]):
+    func, start, stop = task
+    return func(*_worker_state, start, stop)
+
+def map_shards(func: Callable,
+               state: tuple,
+               n_items: int,
+               num_workers: int,
+               shards_per_worker: int = 4
+) -> Iterator:
+    '''
+    Apply func(*state, start, stop) to disjoint contiguous ranges of
+    [0, n_items) over a process pool. state is handed to each worker once
+    by the pool initializer, so tasks only carry the range.
+    Args:
+        func (Callable): picklable module-level function
+        state (tuple): read-only arguments shared by all shards
+        n_items (int): number of items to shard
+        num_workers (int): number of worker processes
+        shards_per_worker (int): number of shards per worker, for load balancing
+    Returns:
+        Iterator over the results, in shard order
+    '''
+    n_shards = max(1, min(n_items, num_workers * shards_per_worker))
+    bounds = [n_items * k // n_shards for k in range(n_shards + 1)]
+    tasks = [(func, bounds[k], bounds[k+1]) for k in range(n_shards)]
+    with Pool(num_workers, initializer=_init_shard_worker, initargs=(state,)) as pool:
+        yield from pool.imap(_run_shard, tasks)
@@ -1,5 +1,64 @@
 import re
-from typing import Optional, Union, List
+from collections import Counter
+from typing import Optional, Union, Iterator, List, Dict, Any
+
+# Suffixes split off a word as a token of their own, and their length.
+# Three-character suffixes are looked up first, as in the original
+# chain of endswith checks.
+CONTRACTIONS = {
+    "n't": 3, "'ve": 3, "'ll": 3, "'re": 3,
+    "'d": 2, "'m": 2, "'s": 2, "s'": 2,
+}
+
+class QuoteStats:
+    def __init__(self,
+                 max_examples: int = 100
+    ) -> None:
+        '''
+        Counters of Preprocessor.single_quote_handle, replacing the message
+        it used to print for every word it could not split
+        Args:
+            max_examples (int): number of distinct unknown words kept
+        Returns:
+            None
+        '''
+        self.max_examples = max_examples
+        self.n_quoted = 0
+        self.n_contractions = 0
+        self.n_unknown = 0
+        self.unknown = Counter()
+
+    def add_unknown(self,
+                    word: str
+    ) -> None:
+        self.n_unknown += 1
+        if word in self.unknown or len(self.unknown) < self.max_examples:
+            self.unknown[word] += 1
+
+    def update(self,
+               other: 'QuoteStats'
+    ) -> None:
+        '''
+        Add the counts of another QuoteStats, e.g. of a worker process
+        Args:
+            other (QuoteStats)
+        Returns:
+            None
+        '''
+        self.n_quoted += other.n_quoted
+        self.n_contractions += other.n_contractions
+        self.n_unknown += other.n_unknown
+        for word, count in other.unknown.items():
+            if word in self.unknown or len(self.unknown) < self.max_examples:
+                self.unknown[word] += count
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'n_quoted': self.n_quoted,
+            'n_contractions': self.n_contractions,
+            'n_unknown': self.n_unknown,
+            'unknown': dict(self.unknown.most_common()),
+        }
 
 class Preprocessor:
     def __init__(self) -> None:
@@ -13,44 +72,61 @@ class Preprocessor:
         self.complement_alphabet = r' [`\-=[];,./~!@#$%^&*()_+{\}|:"<>?]'
         self.combined_alphabet = f'{self.complement_alphabet}'
 
+        # A word is a maximal run of characters that are neither whitespace
+        # nor in complement_alphabet, so one findall pass replaces
+        # split()/join, re.split and the empty-string filter
+        self.word_pattern = re.compile(r'[^\s' + re.escape(self.complement_alphabet) + ']+')
+        self.quote_stats = QuoteStats()
+
+    def split_words(self,
+                    text: str
+    ) -> List[str]:
+        '''
+        Split a lowercased string into words without rule, in one regex pass
+        Args:
+            text (str)
+        Returns:
+            List of words of text
+        '''
+        return self.word_pattern.findall(text.lower())
+
+    def iter_words_with_rule(self,
+                             text: str
+    ) -> Iterator[str]:
+        '''
+        Lazily yield the words of a lowercased string, separating
+        quotes, contractions and possessives
+        Args:
+            text (str)
+        Returns:
+            Iterator over the words of text (possibly empty strings)
+        '''
+        for word in self.split_words(text):
+            if "'" in word:
+                first, second = self.single_quote_handle(word)
+                yield first
+                if second is not None:
+                    yield second
+            else:
+                yield word
+
     def split_string(self,
                      input_string: Union[List[str], str]
-    ) -> List[str]:
+    ) -> List[List[str]]:
         '''
         Basic preprocessing for input string without rule
         Args:
             input_string (List[str], str)
         Returns:
-            preprocessed_input_string (str)
+            preprocessed_input_string (List[List[str]])
         '''
         # Convert str to List[str] if necessary
-        if isinstance(input_string, list):
-            pass
-        elif isinstance(input_string, str):
+        if isinstance(input_string, str):
             input_string = [input_string]
-        else:
+        elif not isinstance(input_string, list):
             raise TypeError('input_string is neither a string nor a list of strings')
 
-        # Remove capital letters
-        for i in range(len(input_string)):
-            input_string[i] = input_string[i].lower()
-
-        # Rll possible cases for split
-        for i in range(len(input_string)):
-            input_string[i] = input_string[i].split()
-            input_string[i] = " ".join(input_string[i])
-            input_string[i] = re.split(r'[' + re.escape(self.complement_alphabet) + ']', input_string[i])
-
-        # Remove empty strings
-        temp_string = []
-        for i in range(len(input_string)):
-            temp_string.append([])
-            for s in input_string[i]:
-                if s != '':
-                    temp_string[i].append(s)
-
-        preprocessed_string = temp_string
-        return preprocessed_string
+        return [self.split_words(s) for s in input_string]
         
     def split_string_with_rule(self, 
                      input_string: Union[List[str], str]
@@ -64,75 +140,59 @@ class Preprocessor:
         Returns:
             preprocess_list: list of strings after preprocessing
         '''
-        input_string = self.split_string(input_string)
+        # Convert str to List[str] if necessary
+        if isinstance(input_string, str):
+            input_string = [input_string]
+        elif not isinstance(input_string, list):
+            raise TypeError('input_string is neither a string nor a list of strings')
 
-        # Remove special characters
         preprocess_list = []
-
-        for i in range(len(input_string)):
-            preprocess_list.append([])
-            for word in input_string[i]:
-                if "'" in word:
-                    first, second = self.single_quote_handle(word)
-                    preprocess_list[i].append(first)
-
-                    if second is not None:
-                        preprocess_list[i].append(second)
-                else:
-                    preprocess_list[i].append(word)
+        for s in input_string:
+            if "'" in s:
+                words = self.iter_words_with_rule(s)
+            else:
+                words = self.split_words(s)
 
             # Add blank space between each words and add <\w> at the end of each words.
-            preprocess_list[i] = " ".join(list(preprocess_list[i]))
-            preprocess_list[i] += ' <\w>'
+            preprocess_list.append(" ".join(words) + ' <\\w>')
 
         return preprocess_list
 
-    @staticmethod
-    def single_quote_handle(single_string) -> tuple[str, str]:
+    def single_quote_handle(self,
+                            single_string: str
+    ) -> tuple[str, Optional[str]]:
         ''' Handling with single quotation mark ( ' )
-        divide cases, and divide the words by each cases
+        divide cases, and divide the words by each cases.
+        Words that fit none of the cases are returned unchanged and
+        counted in self.quote_stats.
         Args:
             single_string: string that contains single quotation mark ( ' )
         Returns:
             first: first part of the word
             second: second part of the word (possible to be None)
         '''
-        first = single_string
-        second = None
-
-        # Remove normal [ ' ] from the word (quotes)
-        while "'" in single_string:
-            if single_string.startswith("'"):
-                single_string = single_string[1:]
-            elif (single_string.endswith("'") \
-                and not single_string.endswith("s'")):
-                single_string = single_string[:-1]
-            else:
-                break
-        
-        # Handle with edge cases (contractions / possessive)
-        if "'" in single_string:
-            if single_string.endswith("n't") \
-                or single_string.endswith("'ve") \
-                or single_string.endswith("'ll") \
-                or single_string.endswith("'re"):
-                first = single_string[:-3]
-                second = single_string[-3:]
-            
-            elif single_string.endswith("'d") \
-                or single_string.endswith("'m") \
-                or single_string.endswith("'s") \
-                or single_string.endswith("s'"):
-                first = single_string[:-2]
-                second = single_string[-2:]
-            else:
-                print(f'special case that does not fit in ordinary cases: \
-                        {single_string}')
+        stats = self.quote_stats
+        stats.n_quoted += 1
+
+        # Remove normal [ ' ] from the word (quotes): all leading ones, and
+        # trailing ones except a possessive [ s' ]
+        word = single_string.lstrip("'")
+        stripped = word.rstrip("'")
+        if len(stripped) < len(word) and stripped.endswith('s'):
+            word = word[:len(stripped)+1]
         else:
-            first = single_string
-            second = None
-        return first, second
-            
+            word = stripped
+        if "'" not in word:
+            return word, None
+
+        # Handle with edge cases (contractions / possessive)
+        n = CONTRACTIONS.get(word[-3:]) or CONTRACTIONS.get(word[-2:])
+        if n is None:
+            stats.add_unknown(word)
+            return single_string, None
+        stats.n_contractions += 1
+        return word[:-n], word[-n:]
+
     # @staticmethod
     # def letter_splitter(word):
     #     ''' split the word by each letter
@@ -0,0 +1,153 @@
+import json
+import time
+from functools import wraps
+from typing import Optional, Union, Callable, List, Dict, Any
+
+class Profiler:
+    def __init__(self,
+                 report_every: Optional[int] = None,
+                 report: Optional[Callable[[Dict[str, float]], None]] = None
+    ) -> None:
+        '''
+        Cumulative wall time, call counts and item counts per pipeline
+        stage, and progress of BPE training. Created by
+        Tokenizer.enable_profiling, which swaps the tokenizer's methods for
+        timed wrappers; without a profiler the methods are the plain ones,
+        so profiling costs nothing when it is disabled.
+        Args:
+            report_every (int): record training progress every this many
+                                merges, None to disable
+            report (Callable): called with every progress record, e.g. print
+        Returns:
+            None
+        '''
+        self.report_every = report_every
+        self.report = report
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.progress_reports: List[Dict[str, float]] = []
+        self._train_start = None
+
+    def add(self,
+            stage: str,
+            seconds: float,
+            items: int = 0
+    ) -> None:
+        '''
+        Record one call of a stage
+        Args:
+            stage (str): name of the stage
+            seconds (float): wall time of the call
+            items (int): number of items processed by the call
+        Returns:
+            None
+        '''
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = self.stages[stage] = {'seconds': 0.0, 'calls': 0, 'items': 0}
+        stats['seconds'] += seconds
+        stats['calls'] += 1
+        stats['items'] += items
+
+    def merge(self,
+              stages: Dict[str, Dict[str, float]]
+    ) -> None:
+        '''
+        Add the stage totals of another profiler, e.g. of a worker process.
+        Times of stages run in several workers at once add up, so they can
+        exceed the wall time of the call that started the workers.
+        Args:
+            stages (Dict[str, Dict[str, float]]): seconds, calls and items
+                                                  per stage, as in self.stages
+        Returns:
+            None
+        '''
+        for stage, other in stages.items():
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = {'seconds': 0.0, 'calls': 0, 'items': 0}
+            for key in ('seconds', 'calls', 'items'):
+                stats[key] += other[key]
+
+    def wrap(self,
+             func: Callable,
+             stage: str,
+             items: Optional[Callable[[tuple, Any], int]] = None
+    ) -> Callable:
+        '''
+        Args:
+            func (Callable): function to time
+            stage (str): name of the stage
+            items (Callable): number of items of a call, from its positional
+                              arguments and its result; None to count none
+        Returns:
+            func, recording every call in stage
+        '''
+        @wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            self.add(stage, time.perf_counter() - start,
+                     items(args, result) if items is not None else 0)
+            return result
+        return timed
+
+    def start_training(self) -> None:
+        self._train_start = self._last_time = time.perf_counter()
+        self._last_merges = 0
+
+    def progress(self,
+                 n_merges: int,
+                 vocab_size: Union[int, Callable[[], int]]
+    ) -> None:
+        '''
+        Called after every merge; records a progress report every
+        report_every merges
+        Args:
+            n_merges (int): number of merges done so far
+            vocab_size (int, Callable): current vocabulary size, or a function
+                                        computing it, only called when reporting
+        Returns:
+            None
+        '''
+        if not self.report_every or n_merges % self.report_every != 0:
+            return
+        now = time.perf_counter()
+        if self._train_start is None:
+            self.start_training()
+        record = {
+            'merges': n_merges,
+            'vocab_size': vocab_size() if callable(vocab_size) else vocab_size,
+            'seconds': now - self._train_start,
+            'merges_per_s': (n_merges - self._last_merges) / max(now - self._last_time, 1e-9),
+        }
+        self._last_time, self._last_merges = now, n_merges
+        self.progress_reports.append(record)
+        if self.report is not None:
+            self.report(record)
+
+    def as_dict(self) -> Dict[str, Any]:
+        '''
+        Returns:
+            Per-stage totals and training progress reports
+        '''
+        stages = {}
+        for stage, stats in self.stages.items():
+            stages[stage] = dict(stats)
+            if stats['items'] and stats['seconds'] > 0:
+                stages[stage]['items_per_s'] = stats['items'] / stats['seconds']
+        return {'stages': stages, 'progress': list(self.progress_reports)}
+
+    def to_json(self,
+                path: Optional[str] = None
+    ) -> str:
+        '''
+        Args:
+            path (str): file to write the report to, None to only return it
+        Returns:
+            The report of as_dict as JSON
+        '''
+        output = json.dumps(self.as_dict(), indent=2)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(output + '\n')
+        return output
@@ -0,0 +1,307 @@
+import asyncio
+import json
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional, List, Dict, Tuple, Any
+from YBIGTA.parallel import resolve_num_workers, encoder_initargs, init_encoder, encode_chunk
+
+# Longest request or response line accepted on the Unix socket, in bytes
+LINE_LIMIT = 1 << 26
+
+class TokenizerService:
+    def __init__(self,
+                 tokenizer,
+                 max_batch_size: int = 64,
+                 max_delay: float = 0.002,
+                 num_workers: Optional[int] = 1,
+                 max_length: Optional[int] = None
+    ) -> None:
+        '''
+        asyncio front end of a trained tokenizer. Texts submitted with
+        encode() are queued and coalesced into micro-batches of at most
+        max_batch_size texts, waiting at most max_delay seconds for a batch
+        to fill up. Batches are encoded off the event loop, in a thread if
+        num_workers is 1 and on a process pool otherwise, and every
+        caller's future is resolved with the token IDs of its text.
+        Args:
+            tokenizer (Tokenizer): trained tokenizer
+            max_batch_size (int): maximum number of texts per batch
+            max_delay (float): seconds the first text of a batch waits for more
+            num_workers (int): number of processes encoding batches,
+                               None to use all cores
+            max_length (int): maximum length of list of tokens
+        Returns:
+            None
+        '''
+        if not isinstance(max_batch_size, int) or max_batch_size < 1:
+            raise ValueError('max_batch_size needs to be a positive integer')
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.num_workers = resolve_num_workers(num_workers)
+        self.max_length = max_length
+
+        self.n_requests = 0
+        self.n_batches = 0
+        self.queue: Optional[asyncio.Queue] = None
+        self.executor: Optional[Executor] = None
+        self.batcher: Optional[asyncio.Task] = None
+        self.pending: set = set()
+
+    async def __aenter__(self) -> 'TokenizerService':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        '''
+        Start the worker pool and the batching task
+        '''
+        if self.num_workers > 1:
+            self.executor = ProcessPoolExecutor(self.num_workers, initializer=init_encoder,
+                                                initargs=encoder_initargs(self.tokenizer))
+        else:
+            self.executor = ThreadPoolExecutor(1)
+        # At most two batches per worker are encoded or waiting for a worker
+        self.slots = asyncio.Semaphore(2 * self.num_workers)
+        self.queue = asyncio.Queue()
+        self.batcher = asyncio.create_task(self._run_batcher())
+
+    async def close(self) -> None:
+        '''
+        Stop batching, wait for the batches being encoded and shut down
+        the worker pool. Texts still queued are cancelled.
+        '''
+        if self.batcher is None:
+            return
+        self.batcher.cancel()
+        try:
+            await self.batcher
+        except asyncio.CancelledError:
+            pass
+        if self.pending:
+            await asyncio.gather(*self.pending, return_exceptions=True)
+        while not self.queue.empty():
+            _, future = self.queue.get_nowait()
+            future.cancel()
+        self.executor.shutdown()
+        self.batcher = None
+
+    async def encode(self,
+                     text: str
+    ) -> List[int]:
+        '''
+        Args:
+            text (str)
+        Returns:
+            Token IDs of text, without padding
+        '''
+        if self.batcher is None:
+            raise RuntimeError('the service has not been started')
+        if not isinstance(text, str):
+            raise TypeError('text needs to be a string')
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((text, future))
+        return await future
+
+    def stats(self) -> Dict[str, float]:
+        '''
+        Returns:
+            Number of requests and batches, and the mean batch size
+        '''
+        return {
+            'requests': self.n_requests,
+            'batches': self.n_batches,
+            'mean_batch_size': self.n_requests / self.n_batches if self.n_batches else 0.0,
+        }
+
+    async def _run_batcher(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            try:
+                deadline = loop.time() + self.max_delay
+                while len(batch) < self.max_batch_size:
+                    if not self.queue.empty():
+                        batch.append(self.queue.get_nowait())
+                        continue
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                await self.slots.acquire()
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    future.cancel()
+                raise
+
+            task = asyncio.create_task(self._encode_batch(batch))
+            self.pending.add(task)
+            task.add_done_callback(self.pending.discard)
+
+    async def _encode_batch(self,
+                            batch: List[Tuple[str, asyncio.Future]]
+    ) -> None:
+        try:
+            texts = [text for text, _ in batch]
+            loop = asyncio.get_running_loop()
+            if self.num_workers > 1:
+                result = loop.run_in_executor(self.executor, encode_chunk, (texts, self.max_length))
+            else:
+                result = loop.run_in_executor(self.executor, self.tokenizer.encode,
+                                              texts, self.max_length)
+            try:
+                text_tokenIDs = await result
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            self.n_requests += len(batch)
+            self.n_batches += 1
+            for (_, future), tokenIDs in zip(batch, text_tokenIDs):
+                # The caller may have given up waiting
+                if not future.done():
+                    future.set_result(tokenIDs)
+        finally:
+            self.slots.release()
+
+async def serve_unix(service: TokenizerService,
+                     path: str
+) -> asyncio.AbstractServer:
+    '''
+    Serve a started TokenizerService on a Unix socket. Every request is a
+    line of JSON {"text": ...} and is answered, in order, by a line
+    {"input_ids": [...]} or {"error": ...}. A client may send several
+    requests before reading the answers.
+    Args:
+        service (TokenizerService): started service
+        path (str): path of the socket
+    Returns:
+        asyncio server, to be closed by the caller
+    '''
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        responses = asyncio.Queue()
+
+        async def write_responses() -> None:
+            while True:
+                response = await responses.get()
+                if response is None:
+                    return
+                try:
+                    message = {'input_ids': await response}
+                except Exception as e:
+                    message = {'error': str(e)}
+                writer.write(json.dumps(message).encode('utf-8') + b'\n')
+                await writer.drain()
+
+        async def answer(line: bytes) -> List[int]:
+            return await service.encode(json.loads(line)['text'])
+
+        writing = asyncio.create_task(write_responses())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                responses.put_nowait(asyncio.ensure_future(answer(line)))
+        finally:
+            responses.put_nowait(None)
+            await writing
+            writer.close()
+
+    return await asyncio.start_unix_server(handle, path, limit=LINE_LIMIT)
+
+class UnixClient:
+    def __init__(self,
+                 path: str
+    ) -> None:
+        '''
+        Client of serve_unix, sending one request at a time per connection
+        Args:
+            path (str): path of the socket
+        Returns:
+            None
+        '''
+        self.path = path
+        self.reader = self.writer = None
+
+    async def __aenter__(self) -> 'UnixClient':
+        self.reader, self.writer = await asyncio.open_unix_connection(self.path, limit=LINE_LIMIT)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    async def encode(self,
+                     text: str
+    ) -> List[int]:
+        '''
+        Args:
+            text (str)
+        Returns:
+            Token IDs of text, without padding
+        '''
+        self.writer.write(json.dumps({'text': text}).encode('utf-8') + b'\n')
+        await self.writer.drain()
+        message = json.loads(await self.reader.readline())
+        if 'error' in message:
+            raise RuntimeError(message['error'])
+        return message['input_ids']
+
+def percentile(sorted_values: List[float],
+               q: float
+) -> float:
+    '''
+    Nearest-rank percentile of values sorted in increasing order
+    '''
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+async def generate_load(encoders: List[Any],
+                        texts: List[str],
+                        n_requests: int
+) -> Dict[str, float]:
+    '''
+    Send n_requests texts, cycling through texts, with one concurrent
+    caller per encoder, and measure the latency of every request
+    Args:
+        encoders (List): objects with an async encode(text), e.g. one
+                         TokenizerService shared by all callers or one
+                         UnixClient per caller
+        texts (List[str]): request texts
+        n_requests (int): total number of requests
+    Returns:
+        requests/s and p50/p99/max latency in milliseconds
+    '''
+    latencies = []
+    next_request = iter(range(n_requests))
+
+    async def caller(encoder) -> None:
+        for i in next_request:
+            start = time.perf_counter()
+            await encoder.encode(texts[i % len(texts)])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(caller(encoder) for encoder in encoders))
+    seconds = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'concurrency': len(encoders),
+        'seconds': seconds,
+        'requests_per_s': len(latencies) / seconds if seconds > 0 else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1e3,
+        'p99_ms': percentile(latencies, 99) * 1e3,
+        'max_ms': latencies[-1] * 1e3 if latencies else 0.0,
+    }
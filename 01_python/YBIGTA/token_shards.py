@@ -0,0 +1,250 @@
+import json
+import os
+import sys
+from array import array
+from typing import Optional, Union, Iterable, Iterator, List, Dict, Any
+
+# A shard directory holds
+#   index.json         : token dtype, and the number of documents and
+#                        tokens of every shard, in order
+#   shard_XXXXX.bin    : token IDs of the shard's documents back to back
+#   shard_XXXXX.idx    : uint64 * (n_docs + 1), start of each document in
+#                        the .bin file, in tokens
+# All integers are little-endian. Documents never straddle two shards.
+INDEX_NAME = 'index.json'
+SHARD_NAME = 'shard_{:05d}'
+FORMAT_VERSION = 1
+
+class TokenShardWriter:
+    def __init__(self,
+                 directory: str,
+                 vocab_size: int,
+                 shard_size: int = 1 << 26
+    ) -> None:
+        '''
+        Write encoded documents as a flat token stream in fixed-size shards.
+        Token IDs are stored as uint16 if the vocabulary fits, otherwise
+        as uint32.
+        Args:
+            directory (str): output directory, created if necessary
+            vocab_size (int): number of tokens of the tokenizer
+            shard_size (int): maximum number of tokens per shard; a longer
+                              document gets a shard of its own
+        Returns:
+            None
+        '''
+        if not isinstance(shard_size, int) or shard_size < 1:
+            raise ValueError('shard_size needs to be a positive integer')
+        self.directory = directory
+        self.vocab_size = vocab_size
+        self.shard_size = shard_size
+        self.typecode = 'H' if vocab_size <= 1 << 16 else 'I'
+        self.shards: List[Dict[str, int]] = []
+        self.file = None
+        os.makedirs(directory, exist_ok=True)
+
+    def __enter__(self) -> 'TokenShardWriter':
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self,
+              tokenIDs: List[int]
+    ) -> None:
+        '''
+        Append one document
+        Args:
+            tokenIDs (List[int]): token IDs of the document, without padding
+        Returns:
+            None
+        '''
+        tokens = array(self.typecode)
+        try:
+            tokens.extend(tokenIDs)
+        except OverflowError as e:
+            raise ValueError(f'token IDs need to be in [0, {self.vocab_size}), '
+                             'unknown tokens (-1) cannot be stored') from e
+        if self.file is not None and 0 < self.offsets[-1] \
+                and self.offsets[-1] + len(tokens) > self.shard_size:
+            self._close_shard()
+        if self.file is None:
+            self._open_shard()
+
+        if sys.byteorder == 'big':
+            tokens.byteswap()
+        self.file.write(tokens.tobytes())
+        self.offsets.append(self.offsets[-1] + len(tokens))
+
+    def write_batches(self,
+                      batches: Iterable[List[List[int]]]
+    ) -> None:
+        '''
+        Append the documents of each batch, e.g. from
+        Tokenizer.tokenize_iter(texts, padding=False)
+        Args:
+            batches (Iterable[List[List[int]]])
+        Returns:
+            None
+        '''
+        for batch in batches:
+            for tokenIDs in batch:
+                self.write(tokenIDs)
+
+    def close(self) -> None:
+        '''
+        Finish the current shard and write the index
+        '''
+        if self.file is not None:
+            self._close_shard()
+        index = {
+            'format_version': FORMAT_VERSION,
+            'dtype': 'uint16' if self.typecode == 'H' else 'uint32',
+            'vocab_size': self.vocab_size,
+            'shards': self.shards,
+        }
+        with open(os.path.join(self.directory, INDEX_NAME), 'w') as f:
+            json.dump(index, f, indent=2)
+
+    def abort(self) -> None:
+        '''
+        Stop writing and delete the shards written so far, without writing
+        the index, so a failed run does not leave a truncated shard set
+        that looks complete. An index left by an earlier run is removed too,
+        since its shards may have been overwritten.
+        '''
+        n_shards = len(self.shards)
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            n_shards += 1
+        for k in range(n_shards):
+            for extension in ('.bin', '.idx'):
+                path = os.path.join(self.directory, SHARD_NAME.format(k) + extension)
+                if os.path.exists(path):
+                    os.remove(path)
+        self.shards = []
+        index_path = os.path.join(self.directory, INDEX_NAME)
+        if os.path.exists(index_path):
+            os.remove(index_path)
+
+    def _open_shard(self) -> None:
+        name = SHARD_NAME.format(len(self.shards))
+        self.file = open(os.path.join(self.directory, name + '.bin'), 'wb')
+        self.offsets = array('Q', [0])
+
+    def _close_shard(self) -> None:
+        self.file.close()
+        self.file = None
+        name = SHARD_NAME.format(len(self.shards))
+        offsets = array('Q', self.offsets)
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        with open(os.path.join(self.directory, name + '.idx'), 'wb') as f:
+            f.write(offsets.tobytes())
+        self.shards.append({'name': name, 'n_docs': len(self.offsets) - 1,
+                            'n_tokens': self.offsets[-1]})
+
+class TokenShardReader:
+    def __init__(self,
+                 directory: str
+    ) -> None:
+        '''
+        Random access to the documents written by TokenShardWriter. Shards
+        and their offsets are memory-mapped with numpy, so documents are
+        returned as views into the page cache without being copied, and
+        any number of processes can read the same shards.
+        Args:
+            directory (str): directory written by TokenShardWriter
+        Returns:
+            None
+        '''
+        try:
+            import numpy as np
+        except ImportError as e:
+            raise ImportError('TokenShardReader requires numpy') from e
+
+        with open(os.path.join(directory, INDEX_NAME)) as f:
+            index = json.load(f)
+        if index.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"unsupported token shard version {index.get('format_version')}")
+        self.directory = directory
+        self.vocab_size = index['vocab_size']
+        self.dtype = np.dtype(index['dtype']).newbyteorder('<')
+
+        self.tokens, self.offsets = [], []
+        for shard in index['shards']:
+            path = os.path.join(directory, shard['name'])
+            # np.memmap cannot map an empty file
+            if shard['n_tokens'] > 0:
+                self.tokens.append(np.memmap(path + '.bin', dtype=self.dtype, mode='r',
+                                             shape=(shard['n_tokens'],)))
+            else:
+                self.tokens.append(np.zeros(0, dtype=self.dtype))
+            self.offsets.append(np.memmap(path + '.idx', dtype='<u8', mode='r',
+                                          shape=(shard['n_docs'] + 1,)))
+        # First document of each shard, to find the shard of a document
+        self.starts = np.cumsum([0] + [shard['n_docs'] for shard in index['shards']])
+        self.n_tokens = sum(shard['n_tokens'] for shard in index['shards'])
+
+    def __len__(self) -> int:
+        return int(self.starts[-1])
+
+    def __getitem__(self,
+                    i: int
+    ) -> Any:
+        '''
+        Args:
+            i (int): document index, negative values count from the end
+        Returns:
+            Read-only numpy view of the document's token IDs
+        '''
+        n_docs = len(self)
+        if i < 0:
+            i += n_docs
+        if not 0 <= i < n_docs:
+            raise IndexError('document index out of range')
+        shard = int(self.starts.searchsorted(i, side='right')) - 1
+        local = i - int(self.starts[shard])
+        offsets = self.offsets[shard]
+        return self.tokens[shard][int(offsets[local]):int(offsets[local+1])]
+
+    def __iter__(self) -> Iterator[Any]:
+        for tokens, offsets in zip(self.tokens, self.offsets):
+            for k in range(len(offsets) - 1):
+                yield tokens[int(offsets[k]):int(offsets[k+1])]
+
+def write_token_shards(tokenizer,
+                       texts: Union[Iterable[str], str],
+                       directory: str,
+                       shard_size: int = 1 << 26,
+                       batch_size: int = 256,
+                       max_length: Optional[int] = None,
+                       num_workers: Optional[int] = 1
+) -> Dict[str, Any]:
+    '''
+    Tokenize texts as a stream and write them to token shards
+    Args:
+        tokenizer (Tokenizer): trained tokenizer
+        texts (Iterable[str], str)
+        directory (str): output directory
+        shard_size (int): maximum number of tokens per shard
+        batch_size (int): number of texts encoded at once
+        max_length (int): maximum length of list of tokens
+        num_workers (int): number of processes encoding batches,
+                           None to use all cores
+    Returns:
+        Number of documents, tokens and shards written
+    '''
+    with TokenShardWriter(directory, len(tokenizer.tokens), shard_size) as writer:
+        writer.write_batches(tokenizer.tokenize_iter(texts, batch_size, padding=False,
+                                                     max_length=max_length,
+                                                     num_workers=num_workers))
+    return {
+        'n_docs': sum(shard['n_docs'] for shard in writer.shards),
+        'n_tokens': sum(shard['n_tokens'] for shard in writer.shards),
+        'n_shards': len(writer.shards),
+    }
@@ -1,7 +1,17 @@
-from typing import Optional, Union, List
-from YBIGTA.preprocessor import Preprocessor
+from collections import Counter
+from typing import Optional, Union, Callable, Iterable, Iterator, List, Dict, Tuple, Any
+from YBIGTA.preprocessor import Preprocessor, QuoteStats
+from YBIGTA.vocabulary import Vocabulary
+from YBIGTA.trie import TokenTrie
+from YBIGTA.profiling import Profiler
+from YBIGTA.artifact import save_artifact, load_artifact
+from YBIGTA.parallel import resolve_num_workers, chunked, count_words_parallel, encode_parallel, \
+    encode_iter_parallel
 
 class Tokenizer:
+    pad_token = '*'
+    profiler = None
+
     def __init__(self, 
                  corpus: Optional[Union[List[str], str]] = None
     ) -> None:
@@ -20,7 +30,8 @@ class Tokenizer:
     def __call__(self,
                  text: Union[List[str], str],
                  padding: bool = False,
-                 max_length: Optional[int] = None
+                 max_length: Optional[int] = None,
+                 num_workers: Optional[int] = 1
     ) -> Union[List[List[int]], List[int]]:
         '''
         Tokenize the input text into a list of token IDs
@@ -28,18 +39,78 @@ class Tokenizer:
             text (List[str], str)
             padding (bool): whether or not to add padding token
             max_length (int): maximum length of list of tokens
+            num_workers (int): number of processes encoding texts,
+                               None to use all cores
         Return:
             List of token IDs from input text
         '''
-        return self.tokenize(text, padding, max_length)
+        return self.tokenize(text, padding, max_length, num_workers)
+
+    def enable_profiling(self,
+                         report_every: Optional[int] = None,
+                         report: Optional[Callable[[Dict[str, float]], None]] = None
+    ) -> Profiler:
+        '''
+        Time the stages of the pipeline from now on. The methods listed by
+        profiled_stages are replaced by timed wrappers on this instance only.
+        Args:
+            report_every (int): record training progress every this many
+                                merges, None to disable
+            report (Callable): called with every progress record, e.g. print
+        Returns:
+            Profiler collecting the timings, also kept in self.profiler
+        '''
+        self.disable_profiling()
+        profiler = self.profiler = Profiler(report_every, report)
+        for name, items in self.profiled_stages().items():
+            setattr(self, name, profiler.wrap(getattr(self, name), name, items))
+        # text_to_words reaches the regex pass through split_words, directly
+        # or via the lazy iter_words_with_rule, so that is what gets timed
+        self.preprocessor.split_words = profiler.wrap(
+            self.preprocessor.split_words, 'split_words', lambda args, result: len(result))
+        return profiler
+
+    def disable_profiling(self) -> Optional[Profiler]:
+        '''
+        Restore the plain methods
+        Returns:
+            Profiler that was collecting the timings, if any
+        '''
+        profiler, self.profiler = self.profiler, None
+        for name in self.profiled_stages():
+            self.__dict__.pop(name, None)
+        self.preprocessor.__dict__.pop('split_words', None)
+        return profiler
+
+    def profiled_stages(self) -> Dict[str, Optional[Callable[[tuple, Any], int]]]:
+        '''
+        Methods timed by enable_profiling, and how to count the items of a
+        call from its positional arguments and result
+        '''
+        return {
+            'add_corpus': None,
+            'count_words': lambda args, result: len(args[0]),     # documents
+            'text_to_words': lambda args, result: len(result),    # words
+            'tokenize': lambda args, result: len(result),         # texts
+            'text_to_tokens': lambda args, result: len(result),   # tokens
+        }
 
     def add_corpus(self, 
-                   corpus: Optional[Union[List[str], str]] = None
+                   corpus: Optional[Union[Iterable[str], str]] = None,
+                   num_workers: Optional[int] = 1,
+                   chunk_size: int = 256,
+                   keep_corpus: bool = True
     ) -> None:
         '''
-        Add corpus to self.corpus and update word_freq
+        Add corpus to self.corpus and update word_freq.
+        corpus may be any iterable, e.g. a generator reading documents
+        from disk; it is consumed chunk by chunk and never materialised.
         Args:
-            corpus (List[str], str)
+            corpus (Iterable[str], str)
+            num_workers (int): number of processes counting words,
+                               None to use all cores
+            chunk_size (int): number of documents counted at once
+            keep_corpus (bool): whether to keep the raw documents in self.corpus
         Returns:
             None
         '''
@@ -47,35 +118,65 @@ class Tokenizer:
             return 
         
         if isinstance(corpus, str):
-            # Update self.corpus
-            self.corpus.append(corpus)
-
-            # Update self.word_freq
-            words = self.text_to_words(corpus)
-            for word in words:
-                if word in self.word_freq:
-                    self.word_freq[word] += 1
-                else:
-                    self.word_freq[word] = 1
-        elif isinstance(corpus, list):
-            # Update self.corpus
-            self.corpus += corpus
-
-            # Update self.word_freq
-            for text in corpus:
-                words = self.text_to_words(text)
-                for word in words:
-                    if word in self.word_freq:
-                        self.word_freq[word] += 1
-                    else:
-                        self.word_freq[word] = 1
+            corpus = [corpus]
+        elif not isinstance(corpus, Iterable):
+            raise TypeError('corpus is neither a string nor an iterable of strings')
+
+        num_workers = resolve_num_workers(num_workers)
+        chunks = chunked(corpus, chunk_size)
+
+        # Update self.corpus
+        if keep_corpus:
+            chunks = self._keep_chunks(chunks)
+
+        # Update self.word_freq
+        if num_workers > 1 and not (isinstance(corpus, list) and len(corpus) <= chunk_size):
+            counters = self._merge_worker_stats(count_words_parallel(
+                type(self), chunks, num_workers, profile=self.profiler is not None))
         else:
-            raise TypeError('corpus is neither a string nor a list of strings')
+            counters = map(self.count_words, chunks)
+        for counter in counters:
+            for word, freq in counter.items():
+                self.word_freq[word] = self.word_freq.get(word, 0) + freq
+
+    def _merge_worker_stats(self,
+                            results: Iterator[Tuple[Counter, QuoteStats, Optional[dict]]]
+    ) -> Iterator[Counter]:
+        # Preprocessing ran in the workers; add up what they counted and timed
+        for counter, quote_stats, stages in results:
+            self.preprocessor.quote_stats.update(quote_stats)
+            if stages is not None and self.profiler is not None:
+                self.profiler.merge(stages)
+            yield counter
+
+    def _keep_chunks(self,
+                     chunks: Iterator[List[str]]
+    ) -> Iterator[List[str]]:
+        for chunk in chunks:
+            self.corpus += chunk
+            yield chunk
+
+    def count_words(self,
+                    corpus: List[str]
+    ) -> Counter:
+        '''
+        Count the words of each text in corpus
+        Args:
+            corpus (List[str])
+        Returns:
+            Counter of words, in order of first occurrence
+        '''
+        counter = Counter()
+        for text in corpus:
+            counter.update(self.text_to_words(text))
+        return counter
 
     def tokenize(self,
                  text: Union[List[str], str],
                  padding: bool = False,
-                 max_length: Optional[int] = None
+                 max_length: Optional[int] = None,
+                 num_workers: Optional[int] = 1,
+                 chunk_size: int = 64
     ) -> Union[List[List[int]], List[int]]:
         '''
         Tokenize the input text into a list of token IDs
@@ -83,36 +184,215 @@ class Tokenizer:
             text (List[str], str)
             padding (bool): whether or not to add padding token
             max_length (int): maximum length of list of tokens
+            num_workers (int): number of processes encoding texts,
+                               None to use all cores
+            chunk_size (int): number of texts sent to a worker at once
         Return:
             List of token IDs from input text
         '''
-        # Need to convert text to token and truncate if necessary
-        text_tokens = []
-        if isinstance(text, str):
-            text_tokens.append(self.text_to_tokens(text, max_length))
-        elif isinstance(text, list):
-            for curtext in text:
-                text_tokens.append(self.text_to_tokens(curtext, max_length))
-        else:
-            raise TypeError('text is neither a string nor a list of strings')
-        
-        # Need to convert from token to token ID
-        text_tokenIDs = []
-        for word_tokens in text_tokens:
-            text_tokenIDs.append(self.tokens_to_tokenIDs(word_tokens))
+        text_tokenIDs = self.encode(text, max_length, num_workers, chunk_size)
 
         # Need to add padding token if necessary
         if padding:
-            token_padding = self.tokens.index('*')
-            max_length_word_tokens = 0
-            for word_tokens in text_tokens:
-                max_length_word_tokens = max(max_length_word_tokens, len(word_tokens))
-            for i in range(len(text_tokenIDs)):
-                for _ in range(max_length_word_tokens - len(text_tokenIDs[i])):
-                    text_tokenIDs[i].append(token_padding)
+            self.pad(text_tokenIDs)
         
         return text_tokenIDs
 
+    def tokenize_iter(self,
+                      texts: Union[Iterable[str], str],
+                      batch_size: int = 256,
+                      padding: bool = True,
+                      max_length: Optional[int] = None,
+                      num_workers: Optional[int] = 1
+    ) -> Iterator[List[List[int]]]:
+        '''
+        Tokenize texts batch by batch. texts may be any iterable, e.g. a
+        generator reading documents from disk; only the batches being
+        encoded are held in memory, so the input can be larger than RAM.
+        Args:
+            texts (Iterable[str], str)
+            batch_size (int): number of texts per batch
+            padding (bool): whether to pad each batch to its own longest text;
+                            without padding, batches can be written to a
+                            token shard as they are
+            max_length (int): maximum length of list of tokens
+            num_workers (int): number of processes encoding batches,
+                               None to use all cores
+        Return:
+            Iterator over the token IDs of each batch, in input order
+        '''
+        if isinstance(texts, str):
+            texts = [texts]
+        elif not isinstance(texts, Iterable):
+            raise TypeError('texts is neither a string nor an iterable of strings')
+
+        num_workers = resolve_num_workers(num_workers)
+        batches = chunked(texts, batch_size)
+        if num_workers > 1:
+            encoded = encode_iter_parallel(self, batches, max_length, num_workers)
+        else:
+            encoded = (self.encode(batch, max_length) for batch in batches)
+
+        for batch_tokenIDs in encoded:
+            if padding:
+                self.pad(batch_tokenIDs)
+            yield batch_tokenIDs
+
+    def pad(self,
+            text_tokenIDs: List[List[int]]
+    ) -> List[List[int]]:
+        '''
+        Pad each list of token IDs in place to the longest one
+        Args:
+            text_tokenIDs (List[List[int]])
+        Return:
+            text_tokenIDs
+        '''
+        token_padding = self.pad_id
+        max_length_word_tokens = max(map(len, text_tokenIDs), default=0)
+        for word_tokenIDs in text_tokenIDs:
+            word_tokenIDs += [token_padding] * (max_length_word_tokens - len(word_tokenIDs))
+        return text_tokenIDs
+
+    def encode(self,
+               text: Union[List[str], str],
+               max_length: Optional[int] = None,
+               num_workers: Optional[int] = 1,
+               chunk_size: int = 64
+    ) -> List[List[int]]:
+        '''
+        Convert each text into a list of token IDs, without padding
+        Args:
+            text (List[str], str)
+            max_length (int): maximum length of list of tokens
+            num_workers (int): number of processes encoding texts,
+                               None to use all cores
+            chunk_size (int): number of texts sent to a worker at once
+        Return:
+            List of token IDs for each text, in input order
+        '''
+        # Need to convert text to token and truncate if necessary
+        if isinstance(text, str):
+            text = [text]
+        elif not isinstance(text, list):
+            raise TypeError('text is neither a string nor a list of strings')
+
+        num_workers = resolve_num_workers(num_workers)
+        if num_workers > 1 and len(text) > chunk_size:
+            return encode_parallel(self, text, max_length, num_workers, chunk_size)
+
+        # Need to convert from token to token ID
+        return [self.tokens_to_tokenIDs(self.text_to_tokens(curtext, max_length))
+                for curtext in text]
+
+    def encode_batch(self,
+                     text: Union[List[str], str],
+                     max_length: Optional[int] = None,
+                     return_tensors: str = 'np'
+    ) -> Dict[str, Any]:
+        '''
+        Tokenize a batch of texts into a padded int32 matrix
+        Args:
+            text (List[str], str)
+            max_length (int): maximum length of list of tokens
+            return_tensors (str): 'np' for NumPy arrays, 'pt' for torch
+                                  tensors sharing the NumPy buffers
+        Return:
+            input_ids: (batch, max_len) token IDs, padded with the pad token
+            attention_mask: (batch, max_len) 1 for real tokens, 0 for padding
+            lengths: (batch,) number of real tokens of each text
+        '''
+        if return_tensors not in ('np', 'pt'):
+            raise ValueError("return_tensors needs to be either 'np' or 'pt'")
+        try:
+            import numpy as np
+        except ImportError as e:
+            raise ImportError('encode_batch requires numpy') from e
+
+        text_tokenIDs = self.encode(text, max_length)
+        lengths = np.fromiter(map(len, text_tokenIDs), dtype=np.int32, count=len(text_tokenIDs))
+        max_len = int(lengths.max()) if len(lengths) > 0 else 0
+
+        # Preallocate the padded matrix and fill each row in place
+        input_ids = np.full((len(text_tokenIDs), max_len), self.pad_id, dtype=np.int32)
+        for i, word_tokenIDs in enumerate(text_tokenIDs):
+            input_ids[i, :len(word_tokenIDs)] = word_tokenIDs
+        attention_mask = (np.arange(max_len, dtype=np.int32) < lengths[:, None]).astype(np.int32)
+
+        batch = {
+            'input_ids': input_ids,
+            'attention_mask': attention_mask,
+            'lengths': lengths,
+        }
+        if return_tensors == 'pt':
+            import torch
+            batch = {key: torch.from_numpy(value) for key, value in batch.items()}
+        return batch
+
+    def save(self,
+             path: str
+    ) -> None:
+        '''
+        Save the trained tokenizer (vocabulary, merges and metadata)
+        Args:
+            path (str): output file
+        Returns:
+            None
+        '''
+        if not hasattr(self, 'tokens'):
+            raise RuntimeError('tokenizer needs to be trained before it is saved')
+        save_artifact(path, self.metadata(), list(self.tokens), list(getattr(self, 'merges', [])))
+
+    @classmethod
+    def load(cls,
+             path: str
+    ) -> 'Tokenizer':
+        '''
+        Load a tokenizer saved with save(), ready to tokenize. The file
+        stays memory-mapped and the vocabulary and merges are looked up in
+        it, see artifact.MappedArtifact.
+        Args:
+            path (str): artifact file
+        Returns:
+            Tokenizer of class cls
+        '''
+        meta, tokens, merges = load_artifact(path)
+        if meta.get('class') != cls.__name__:
+            raise ValueError(f"{path} holds a {meta.get('class')}, not a {cls.__name__}")
+        tokenizer = cls()
+        tokenizer.load_state(meta, tokens, merges)
+        return tokenizer
+
+    def metadata(self) -> Dict[str, Any]:
+        '''
+        Metadata stored along with the vocabulary by save()
+        '''
+        return {'class': type(self).__name__, 'pad_token': self.pad_token}
+
+    def load_state(self,
+                   meta: Dict[str, Any],
+                   tokens: Vocabulary,
+                   merges: List[Tuple[str, str]]
+    ) -> None:
+        '''
+        Restore the trained state read by load()
+        Args:
+            meta (Dict[str, Any]): metadata
+            tokens (Vocabulary): vocabulary
+            merges (List[Tuple[str, str]]): merged pairs, in rank order
+        Returns:
+            None
+        '''
+        self.tokens = tokens
+        self.pad_token = meta.get('pad_token', self.pad_token)
+
+    @property
+    def pad_id(self) -> int:
+        '''
+        Token ID of the padding token ('*')
+        '''
+        return self.tokens.index(self.pad_token)
+
     def text_to_words(self, 
                       text: str
     ) -> List[str]:
@@ -125,36 +405,40 @@ class Tokenizer:
         '''
         raise NotImplementedError
 
+    @property
+    def trie(self) -> TokenTrie:
+        '''
+        Prefix trie over self.tokens, compiled on first use after train()
+        or load() and recompiled whenever the vocabulary changes
+        '''
+        trie = getattr(self, '_trie', None)
+        if trie is None or self._trie_tokens is not self.tokens or len(trie) != len(self.tokens):
+            trie = self._trie = TokenTrie(self.tokens)
+            self._trie_tokens = self.tokens
+        return trie
+
     def text_to_tokens(self, 
                        text: str, 
                        max_length: Optional[int] = None
     ) -> List[str]:
         '''
-        Convert from text to list of tokens
+        Convert from text to list of tokens by splitting every word into
+        the longest tokens of the vocabulary
         Args:
             text (str): unpreprocessed text
             max_length (int): maximum length of list of tokens
         Returns:
             List of tokens from text
         '''
-        # Convert from text to words
-        words = self.text_to_words(text)
+        segment = self.trie.segment
 
         # Split words into tokens
         text_tokens = []
-        for word in words:
-            cur_token = ''
-            for i in range(len(word)):
-                if str(cur_token + word[i]) not in self.tokens:
-                    text_tokens.append(cur_token)
-                    cur_token = word[i]
-                else:
-                    cur_token += word[i]
-            text_tokens.append(cur_token)
-
-        # Truncate text_tokens if its length is greater than max_length
-        if max_length is not None and len(text_tokens) > max_length:
-            text_tokens = text_tokens[:max_length]
+        for word in self.text_to_words(text):
+            segment(word, text_tokens)
+            # Truncate text_tokens if its length is greater than max_length
+            if max_length is not None and len(text_tokens) >= max_length:
+                return text_tokens[:max_length]
 
         return text_tokens
     
@@ -168,11 +452,5 @@ class Tokenizer:
         Returns:
             List of their corresponding token IDs
         '''
-        word_tokenIDs = []
-        for i in range(len(word_tokens)):
-            if word_tokens[i] not in self.tokens:
-                word_tokenIDs.append(-1)
-            else:
-                word_tokenIDs.append(self.tokens.index(word_tokens[i]))
-            
-        return word_tokenIDs
\ No newline at end of file
+        get_id = self.tokens.get_id
+        return [get_id(token) for token in word_tokens]
\ No newline at end of file
@@ -1,16 +1,57 @@
-from typing import Optional, Union, List, Tuple, Dict
+from typing import Optional, Union, Callable, List, Tuple, Dict, Any
 from YBIGTA.tokenizer import Tokenizer
+from YBIGTA.bpe_trainer import BPETrainer
+from YBIGTA.bpe_checkpoint import BPECheckpoint, corpus_fingerprint
+from YBIGTA.bpe_encoder import BPEEncoder
+from YBIGTA.vocabulary import Vocabulary
+from YBIGTA.parallel import resolve_num_workers, map_shards
+
+def get_stats_range(items: List[Tuple[str, int]],
+                    start: int,
+                    stop: int
+) -> tuple[Dict[tuple[str, str], int], Dict[tuple[str, str], List[List[int]]]]:
+    '''
+    Count the pairs of items start..stop-1 of the word table, as in
+    BPETokenizer.get_stats
+    Args:
+        items (List[Tuple[str, int]]): words as space-separated symbols and their frequencies
+        start (int), stop (int): range of word indices
+    Returns:
+        pairs_freq (Dict[tuple[str, str], int]): frequency of pairs
+        pairs_idx (Dict[tuple[str, str], List[List[int]]]): indices of pairs
+    '''
+    pairs_freq, pairs_idx = {}, {}
+    for i in range(start, stop):
+        word, freq = items[i]
+        symbols = word.split()
+        for j in range(len(symbols)-1):
+            cur_pair = symbols[j], symbols[j+1]
+            if cur_pair not in pairs_freq:
+                pairs_freq[cur_pair] = 0
+                pairs_idx[cur_pair] = []
+            pairs_freq[cur_pair] += freq
+            pairs_idx[cur_pair].append([i, j])
+    return pairs_freq, pairs_idx
 
 class BPETokenizer(Tokenizer):
     def __init__(self, 
-                 corpus: Optional[Union[List[str], str]] = None):
+                 corpus: Optional[Union[List[str], str]] = None,
+                 cache_size: int = 65536,
+                 longest_match: bool = False):
         '''
         Args:
             corpus (List[str], str): preprocessed string
+            cache_size (int): number of words kept in the encoder's LRU cache
+            longest_match (bool): split words into the longest tokens of the
+                                  vocabulary instead of replaying the merges
         Returns:
             None
         '''
         self.name = 'BPETokenizer'
+        self.merges = []
+        self.encoder = None
+        self.cache_size = cache_size
+        self.longest_match = longest_match
         super().__init__(corpus)
 
     def text_to_words(self, 
@@ -23,59 +64,217 @@ class BPETokenizer(Tokenizer):
         Return:
             List of words splitted from text
         '''
-        text = self.preprocessor.split_string_with_rule(text)
-        return text[0].split()
+        words = [word for word in self.preprocessor.iter_words_with_rule(text) if word]
+        words.append('<\\w>')
+        return words
 
     def train(self, 
-              n_iter: int
+              n_iter: Optional[int] = None,
+              incremental: bool = True,
+              num_workers: Optional[int] = 1,
+              vocab_size: Optional[int] = None,
+              min_frequency: int = 1,
+              checkpoint_dir: Optional[str] = None,
+              checkpoint_every: int = 1000,
+              resume: bool = False
     ) -> None:
         '''
         Perform merge operation n_iter times in order to find
         a list of tokens
         Args:
-            n_iter (int): number of iterations
+            n_iter (int): number of iterations, None for no limit; when
+                          resuming, merges restored from the checkpoint count
+            incremental (bool): whether to use the incremental BPETrainer
+                                instead of recounting pairs on every iteration
+            num_workers (int): number of processes for the incremental
+                               trainer's initial pair count (also run when
+                               resuming from a checkpoint), None to use all
+                               cores; the legacy loop recounts after every
+                               merge and always does so serially
+            vocab_size (int): stop once self.tokens (including the padding
+                              token) would reach this size, None for no limit
+            min_frequency (int): words occurring less often are dropped before
+                                 training, and training stops once the most
+                                 frequent pair occurs less often
+            checkpoint_dir (str): directory to save the merges and the word
+                                  table to while training, None to disable
+            checkpoint_every (int): number of merges between checkpoints
+            resume (bool): continue from the checkpoint in checkpoint_dir,
+                           if there is one, instead of starting over; raises
+                           ValueError if it was written for another corpus
+                           or min_frequency
         Returns:
             None
         '''
-        if not isinstance(n_iter, int) or n_iter < 1:
+        if n_iter is None and vocab_size is None:
+            raise TypeError('either n_iter or vocab_size needs to be given')
+        if n_iter is not None and (not isinstance(n_iter, int) or n_iter < 1):
             raise TypeError('number of iterations (n_iter) needs to be a positive integer')
+        if vocab_size is not None and (not isinstance(vocab_size, int) or vocab_size < 2):
+            raise TypeError('vocab_size needs to be an integer greater than 1')
+        if not isinstance(min_frequency, int) or min_frequency < 1:
+            raise TypeError('min_frequency needs to be a positive integer')
+        if not isinstance(checkpoint_every, int) or checkpoint_every < 1:
+            raise TypeError('checkpoint_every needs to be a positive integer')
+        if checkpoint_dir is None and resume:
+            raise ValueError('resume needs a checkpoint_dir')
+        if checkpoint_dir is not None and not incremental:
+            raise ValueError('checkpoints are only supported by incremental training')
         
         # Need to intialize self.tokens by separating words into characters
-        self.tokens = []
+        # (dropping rare words, which would only add long-tail pairs)
+        self.tokens = Vocabulary()
         self.word_freq_temp = {}
         for key, value in self.word_freq.items():
-            self.word_freq_temp[" ".join(key)] = value
+            if value >= min_frequency:
+                self.word_freq_temp[" ".join(key)] = value
         self.word_freq = self.word_freq_temp
 
-        for _ in range(n_iter):
-            pairs_freq, pairs_idx = self.get_stats()
-            if len(pairs_freq) == 0:
-                break
+        # The padding token takes one slot of the vocabulary
+        max_symbols = vocab_size - 1 if vocab_size is not None else None
+
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start_training()
+
+        if incremental:
+            checkpoint = BPECheckpoint(checkpoint_dir) if checkpoint_dir is not None else None
+            if checkpoint is not None:
+                settings = {'corpus': corpus_fingerprint(self.word_freq),
+                            'min_frequency': min_frequency}
+            if resume and checkpoint.exists():
+                # The checkpoint already holds the (pruned) word table
+                trainer = checkpoint.restore(num_workers, settings)
             else:
-                max_pair = max(pairs_freq, key = pairs_freq.get)
-                self.word_freq = self.merge(max_pair, pairs_idx[max_pair])
+                trainer = BPETrainer(self.word_freq, num_workers)
+                if checkpoint is not None:
+                    checkpoint.start(trainer, settings)
+            progress = None
+            if profiler is not None:
+                trainer.merge = profiler.wrap(trainer.merge, 'merge')
+                progress = profiler.progress
+            self.merges = trainer.train(n_iter, max_symbols, min_frequency,
+                                        checkpoint, checkpoint_every, progress)
+            self.word_freq = trainer.word_freq()
+        else:
+            resolve_num_workers(num_workers)
+            self.merges = []
+            while n_iter is None or len(self.merges) < n_iter:
+                if max_symbols is not None \
+                    and len({symbol for word in self.word_freq for symbol in word.split()}) >= max_symbols:
+                    break
+                pairs_freq, pairs_idx = self.get_stats()
+                if len(pairs_freq) == 0:
+                    break
+                else:
+                    max_pair = max(pairs_freq, key = pairs_freq.get)
+                    if pairs_freq[max_pair] < min_frequency:
+                        break
+                    self.merges.append(max_pair)
+                    self.word_freq = self.merge(max_pair, pairs_idx[max_pair])
+                    if profiler is not None:
+                        profiler.progress(len(self.merges), lambda: len(
+                            {symbol for word in self.word_freq for symbol in word.split()}) + 1)
 
         self.create_tokens()
+        self.encoder = BPEEncoder(self.merges, self.cache_size)
 
-    def get_stats(self) -> tuple[Dict[tuple[str, str], int], Dict[tuple[str, str], List[List[int]]]]:
+    def profiled_stages(self) -> Dict[str, Optional[Callable[[tuple, Any], int]]]:
         '''
-        Count the number of occurrences of pairs and store their indices
+        Methods timed by enable_profiling, see Tokenizer.profiled_stages.
+        The incremental trainer's merge is timed as well.
+        '''
+        stages = super().profiled_stages()
+        stages.update({
+            'train': lambda args, result: len(self.merges),        # merges
+            'get_stats': lambda args, result: len(result[0]),      # pairs
+            'merge': lambda args, result: len(args[1]),            # occurrences
+        })
+        return stages
+
+    def metadata(self) -> Dict[str, Any]:
+        '''
+        Metadata stored along with the vocabulary by save()
+        '''
+        meta = super().metadata()
+        meta['cache_size'] = self.cache_size
+        meta['longest_match'] = self.longest_match
+        return meta
+
+    def load_state(self,
+                   meta: Dict[str, Any],
+                   tokens: Vocabulary,
+                   merges: List[Tuple[str, str]]
+    ) -> None:
+        '''
+        Restore the vocabulary and merges read by load(), and rebuild the encoder
         Args:
+            meta (Dict[str, Any]): metadata
+            tokens (Vocabulary): vocabulary
+            merges (List[Tuple[str, str]]): merged pairs, in rank order
+        Returns:
             None
+        '''
+        super().load_state(meta, tokens, merges)
+        self.cache_size = meta.get('cache_size', self.cache_size)
+        self.longest_match = meta.get('longest_match', self.longest_match)
+        self.merges = merges
+        self.encoder = BPEEncoder(self.merges, self.cache_size)
+
+    def text_to_tokens(self, 
+                       text: str, 
+                       max_length: Optional[int] = None
+    ) -> List[str]:
+        '''
+        Convert from text to list of tokens by applying the learned
+        merges in rank order. Uses the longest-match Tokenizer.text_to_tokens
+        instead if longest_match is set or the tokenizer has not been
+        trained yet.
+        Args:
+            text (str): unpreprocessed text
+            max_length (int): maximum length of list of tokens
+        Returns:
+            List of tokens from text
+        '''
+        if self.encoder is None or self.longest_match:
+            return super().text_to_tokens(text, max_length)
+
+        text_tokens = []
+        for word in self.text_to_words(text):
+            text_tokens += self.encoder.encode_word(word)
+            if max_length is not None and len(text_tokens) >= max_length:
+                return text_tokens[:max_length]
+
+        return text_tokens
+
+    def get_stats(self,
+                  num_workers: Optional[int] = 1
+    ) -> tuple[Dict[tuple[str, str], int], Dict[tuple[str, str], List[List[int]]]]:
+        '''
+        Count the number of occurrences of pairs and store their indices
+        Args:
+            num_workers (int): number of processes counting disjoint slices
+                               of word_freq, None to use all cores
         Returns:
             pairs_freq (Dict[tuple[str, str], int]): frequency of pairs
             pairs_idx (Dict[tuple[str, str], List[List[int]]]): indices of pairs
         '''
+        items = list(self.word_freq.items())
+        num_workers = resolve_num_workers(num_workers)
+        if num_workers == 1 or len(items) <= num_workers:
+            return get_stats_range(items, 0, len(items))
+
+        # Reduce shards in order, so that pairs keep their first-occurrence
+        # order and indices stay sorted, exactly as in the serial count
         pairs_freq, pairs_idx = {}, {}
-        for i, (word, freq) in enumerate(self.word_freq.items(), 0):
-            symbols = word.split()
-            for j in range(len(symbols)-1):
-                cur_pair = symbols[j], symbols[j+1]
-                if cur_pair not in pairs_freq:
-                    pairs_freq[cur_pair] = 0
-                    pairs_idx[cur_pair] = []
-                pairs_freq[cur_pair] += freq
-                pairs_idx[cur_pair].append([i, j])
+        for shard_freq, shard_idx in map_shards(get_stats_range, (items,), len(items), num_workers):
+            for cur_pair, freq in shard_freq.items():
+                if cur_pair in pairs_freq:
+                    pairs_freq[cur_pair] += freq
+                    pairs_idx[cur_pair] += shard_idx[cur_pair]
+                else:
+                    pairs_freq[cur_pair] = freq
+                    pairs_idx[cur_pair] = shard_idx[cur_pair]
         return pairs_freq, pairs_idx
     
     def merge(self, 
@@ -98,6 +297,10 @@ class BPETokenizer(Tokenizer):
                 new_word = []
                 prev_idx = 0
                 while idx < len(indices) and i == indices[idx][0]:
+                    # Skip overlapping occurrences (e.g. the second 'a a' in 'a a a')
+                    if indices[idx][1] < prev_idx:
+                        idx += 1
+                        continue
                     new_word += symbols[prev_idx:indices[idx][1]]
                     new_word.append(max_pair[0] + max_pair[1])
                     prev_idx = indices[idx][1] + 2
@@ -118,13 +321,11 @@ class BPETokenizer(Tokenizer):
         Returns:
             None
         '''
-        self.tokens = []
+        self.tokens = Vocabulary()
         for word in self.word_freq:
-            symbols = word.split()
-            for symbol in symbols:
-                if symbol not in self.tokens:
-                    self.tokens.append(symbol)
-        self.tokens.append('*')
+            for symbol in word.split():
+                self.tokens.add(symbol)
+        self.tokens.add(self.pad_token)
 
 
 class WordTokenizer(Tokenizer):
@@ -150,8 +351,7 @@ class WordTokenizer(Tokenizer):
         Return:
             List of words splitted from text
         '''
-        text = self.preprocessor.split_string(text)
-        return text[0]
+        return self.preprocessor.split_words(text)
 
     def train(self, *args, **kwargs) -> None:
         '''
@@ -161,5 +361,5 @@ class WordTokenizer(Tokenizer):
         Returns:
             None
         '''
-        self.tokens = list(self.word_freq.keys())
-        self.tokens.append('*')
\ No newline at end of file
+        self.tokens = Vocabulary(self.word_freq.keys())
+        self.tokens.add(self.pad_token)
\ No newline at end of file
@@ -0,0 +1,91 @@
+from typing import Iterable, List, Dict, Any
+
+# Key under which a node stores the token ending there. Trie edges are
+# single characters, so the empty string can never clash with an edge.
+TOKEN = ''
+
+class TokenTrie:
+    def __init__(self,
+                 tokens: Iterable[str]
+    ) -> None:
+        '''
+        Prefix trie over a vocabulary for longest-match segmentation.
+        Nodes are nested dicts keyed by character, and the node where a
+        token ends holds that token, so segmenting a word walks it once per
+        emitted token and never builds intermediate prefix strings.
+        Args:
+            tokens (Iterable[str]): vocabulary, e.g. Tokenizer.tokens
+        Returns:
+            None
+        '''
+        self.root: Dict[str, Any] = {}
+        self.n_tokens = 0
+        for token in tokens:
+            self.add(token)
+
+    def add(self,
+            token: str
+    ) -> None:
+        '''
+        Args:
+            token (str): non-empty token
+        Returns:
+            None
+        '''
+        node = self.root
+        for char in token:
+            child = node.get(char)
+            if child is None:
+                child = node[char] = {}
+            node = child
+        if TOKEN not in node:
+            node[TOKEN] = token
+            self.n_tokens += 1
+
+    def __len__(self) -> int:
+        return self.n_tokens
+
+    def __contains__(self,
+                     token: str
+    ) -> bool:
+        node = self.root
+        for char in token:
+            node = node.get(char)
+            if node is None:
+                return False
+        return TOKEN in node
+
+    def segment(self,
+                word: str,
+                out: List[str]
+    ) -> None:
+        '''
+        Split a word into the longest tokens of the vocabulary, from left
+        to right. A character that starts no token is emitted on its own.
+        Args:
+            word (str)
+            out (List[str]): list the tokens are appended to
+        Returns:
+            None
+        '''
+        root = self.root
+        n = len(word)
+        pos = 0
+        while pos < n:
+            node = root
+            match = None
+            end = i = pos
+            while i < n:
+                node = node.get(word[i])
+                if node is None:
+                    break
+                i += 1
+                token = node.get(TOKEN)
+                if token is not None:
+                    match = token
+                    end = i
+            if match is None:
+                match = word[pos]
+                end = pos + 1
+            out.append(match)
+            pos = end
@@ -0,0 +1,102 @@
+from typing import Optional, Iterable, Iterator, List, Dict
+
+class Vocabulary:
+    def __init__(self,
+                 tokens: Optional[Iterable[str]] = None
+    ) -> None:
+        '''
+        Hash-indexed vocabulary shared by the tokenizers.
+        Keeps a token -> id dict for O(1) lookups and an id -> token list,
+        and otherwise behaves like the list of tokens it replaces.
+        Args:
+            tokens (Iterable[str]): initial tokens, duplicates are ignored
+        Returns:
+            None
+        '''
+        self.token_to_id: Dict[str, int] = {}
+        self.id_to_token: List[str] = []
+        if tokens is not None:
+            for token in tokens:
+                self.add(token)
+
+    def add(self,
+            token: str
+    ) -> int:
+        '''
+        Add a token if it is not in the vocabulary yet
+        Args:
+            token (str)
+        Returns:
+            ID of the token
+        '''
+        token_id = self.token_to_id.get(token)
+        if token_id is None:
+            token_id = len(self.id_to_token)
+            self.token_to_id[token] = token_id
+            self.id_to_token.append(token)
+        return token_id
+
+    def append(self,
+               token: str
+    ) -> None:
+        '''
+        Alias of add, for code written against the list of tokens
+        Args:
+            token (str)
+        Returns:
+            None
+        '''
+        self.add(token)
+
+    def index(self,
+              token: str
+    ) -> int:
+        '''
+        Find the ID of a token
+        Args:
+            token (str)
+        Returns:
+            ID of the token
+        Raises:
+            ValueError: if the token is not in the vocabulary
+        '''
+        token_id = self.token_to_id.get(token)
+        if token_id is None:
+            raise ValueError(f'{token!r} is not in vocabulary')
+        return token_id
+
+    def get_id(self,
+               token: str,
+               default: int = -1
+    ) -> int:
+        '''
+        Find the ID of a token, or default if it is unknown
+        Args:
+            token (str)
+            default (int): ID returned for unknown tokens
+        Returns:
+            ID of the token
+        '''
+        return self.token_to_id.get(token, default)
+
+    def __contains__(self, token: str) -> bool:
+        return token in self.token_to_id
+
+    def __getitem__(self, token_id: int) -> str:
+        return self.id_to_token[token_id]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.id_to_token)
+
+    def __len__(self) -> int:
+        return len(self.id_to_token)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Vocabulary):
+            return self.id_to_token == other.id_to_token
+        if isinstance(other, list):
+            return self.id_to_token == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f'Vocabulary({self.id_to_token!r})'
@@ -0,0 +1,424 @@
+import argparse
+import json
+import platform
+import random
+import re
+import string
+import sys
+import time
+import tracemalloc
+from typing import Optional, Callable, List, Dict, Tuple, Any
+
+from YBIGTA.preprocessor import Preprocessor
+from YBIGTA.tokenizers import BPETokenizer, WordTokenizer
+from YBIGTA.vocabulary import Vocabulary
+
+
+class LegacyPreprocessor(Preprocessor):
+    '''
+    The multi-pass split_string/split_string_with_rule and the
+    slice-and-print single_quote_handle that the compiled Preprocessor
+    replaced, kept as a reference for parity and throughput.
+    '''
+    def split_string(self, input_string):
+        if isinstance(input_string, list):
+            pass
+        elif isinstance(input_string, str):
+            input_string = [input_string]
+        else:
+            raise TypeError('input_string is neither a string nor a list of strings')
+
+        for i in range(len(input_string)):
+            input_string[i] = input_string[i].lower()
+
+        for i in range(len(input_string)):
+            input_string[i] = input_string[i].split()
+            input_string[i] = " ".join(input_string[i])
+            input_string[i] = re.split(r'[' + re.escape(self.complement_alphabet) + ']', input_string[i])
+
+        temp_string = []
+        for i in range(len(input_string)):
+            temp_string.append([])
+            for s in input_string[i]:
+                if s != '':
+                    temp_string[i].append(s)
+        return temp_string
+
+    def split_string_with_rule(self, input_string):
+        input_string = self.split_string(input_string)
+        preprocess_list = []
+        for i in range(len(input_string)):
+            preprocess_list.append([])
+            for word in input_string[i]:
+                if "'" in word:
+                    first, second = self.single_quote_handle(word)
+                    preprocess_list[i].append(first)
+                    if second is not None:
+                        preprocess_list[i].append(second)
+                else:
+                    preprocess_list[i].append(word)
+            preprocess_list[i] = " ".join(list(preprocess_list[i]))
+            preprocess_list[i] += ' <\\w>'
+        return preprocess_list
+
+    @staticmethod
+    def single_quote_handle(single_string):
+        first = single_string
+        second = None
+        while "'" in single_string:
+            if single_string.startswith("'"):
+                single_string = single_string[1:]
+            elif (single_string.endswith("'") \
+                and not single_string.endswith("s'")):
+                single_string = single_string[:-1]
+            else:
+                break
+        if "'" in single_string:
+            if single_string.endswith("n't") \
+                or single_string.endswith("'ve") \
+                or single_string.endswith("'ll") \
+                or single_string.endswith("'re"):
+                first = single_string[:-3]
+                second = single_string[-3:]
+            elif single_string.endswith("'d") \
+                or single_string.endswith("'m") \
+                or single_string.endswith("'s") \
+                or single_string.endswith("s'"):
+                first = single_string[:-2]
+                second = single_string[-2:]
+            else:
+                print(f'special case that does not fit in ordinary cases: \
+                        {single_string}')
+        else:
+            first = single_string
+            second = None
+        return first, second
+
+
+class ListVocabulary(list):
+    '''
+    The list of tokens used before Vocabulary, with linear-scan lookups.
+    '''
+    def get_id(self, token: str, default: int = -1) -> int:
+        return self.index(token) if token in self else default
+
+
+def legacy_text_to_tokens(self, text: str, max_length: Optional[int] = None) -> List[str]:
+    '''
+    The prefix-growing Tokenizer.text_to_tokens that the longest-match
+    trie replaced, kept as a reference for throughput. It builds a new
+    string per character and is not a longest match, so its output differs.
+    '''
+    words = self.text_to_words(text)
+    text_tokens = []
+    for word in words:
+        cur_token = ''
+        for i in range(len(word)):
+            if str(cur_token + word[i]) not in self.tokens:
+                text_tokens.append(cur_token)
+                cur_token = word[i]
+            else:
+                cur_token += word[i]
+        text_tokens.append(cur_token)
+    if max_length is not None and len(text_tokens) > max_length:
+        text_tokens = text_tokens[:max_length]
+    return text_tokens
+
+
+class LegacyBPETokenizer(BPETokenizer):
+    text_to_tokens = legacy_text_to_tokens
+
+
+class LegacyWordTokenizer(WordTokenizer):
+    text_to_tokens = legacy_text_to_tokens
+
+
+def synthetic_corpus(
+    n_docs: int = 1000,
+    words_per_doc: int = 300,
+    vocab_size: int = 5000,
+    seed: int = 0
+) -> List[str]:
+    '''
+    Generate news-like documents whose word frequencies follow a Zipf
+    distribution, so benchmarks can run without downloading cnn_stories.
+    '''
+    rng = random.Random(seed)
+    vocab = []
+    for _ in range(vocab_size):
+        word = ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10)))
+        if rng.random() < 0.05:
+            word += rng.choice(["'s", "n't", "'ll", "'re"])
+        if rng.random() < 0.1:
+            word = word.capitalize()
+        vocab.append(word)
+    weights = [1 / (rank + 1) for rank in range(vocab_size)]
+    punctuation = ['', '', '', '', ',', '.', '"', ':', '(', ')', '-']
+
+    corpus = []
+    for _ in range(n_docs):
+        words = rng.choices(vocab, weights=weights, k=words_per_doc)
+        corpus.append(' '.join(word + rng.choice(punctuation) for word in words))
+    return corpus
+
+
+def measure(run: Callable[[], Any],
+            memory: bool = True
+) -> Tuple[Any, Dict[str, float]]:
+    '''
+    Time run(), then run it again under tracemalloc for its peak memory.
+    run needs to be repeatable, i.e. it must not depend on state it mutates.
+    '''
+    start = time.perf_counter()
+    result = run()
+    metrics = {'seconds': time.perf_counter() - start}
+
+    if memory:
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        metrics['peak_mb'] = peak / 1e6
+    return result, metrics
+
+
+def throughput(metrics: Dict[str, float], n_docs: int, n_bytes: int) -> Dict[str, float]:
+    metrics['docs_per_s'] = n_docs / metrics['seconds']
+    metrics['mb_per_s'] = n_bytes / 1e6 / metrics['seconds']
+    return metrics
+
+
+def spaced_word_freq(word_freq: Dict[str, int]) -> Dict[str, int]:
+    '''
+    Word table in the format BPETokenizer.train feeds to get_stats/merge
+    '''
+    return {" ".join(word): freq for word, freq in word_freq.items()}
+
+
+# Repetitions of the 1 KB document of the encode stage
+ENCODE_REPEAT = 20
+
+
+class Benchmark:
+    def __init__(self,
+                 corpus: List[str],
+                 n_iter: int,
+                 memory: bool = True,
+                 num_workers: int = 1
+    ) -> None:
+        '''
+        Tokenizer benchmarks over a fixed corpus. Every bench_* method
+        returns a dict of metrics; legacy_* methods measure the code paths
+        that the current ones replaced and check that outputs still match.
+        '''
+        self.corpus = corpus
+        self.n_iter = n_iter
+        self.memory = memory
+        self.num_workers = num_workers
+        self.n_docs = len(corpus)
+        self.n_bytes = sum(len(text.encode('utf-8')) for text in corpus)
+
+        self.base = BPETokenizer(corpus)
+        self.trained = BPETokenizer()
+        self.trained.word_freq = dict(self.base.word_freq)
+        self.trained.train(n_iter=n_iter)
+        self.words = WordTokenizer()
+        self.words.word_freq = dict(self.base.word_freq)
+        self.words.train()
+
+    def bench_preprocess(self) -> Dict[str, float]:
+        preprocessor = Preprocessor()
+        _, metrics = measure(lambda: [preprocessor.split_string_with_rule(text) for text in self.corpus],
+                             self.memory)
+        return throughput(metrics, self.n_docs, self.n_bytes)
+
+    def bench_add_corpus(self) -> Dict[str, float]:
+        def run():
+            tokenizer = BPETokenizer()
+            tokenizer.add_corpus(self.corpus, keep_corpus=False)
+            return tokenizer
+        tokenizer, metrics = measure(run, self.memory)
+        metrics['distinct_words'] = len(tokenizer.word_freq)
+        return throughput(metrics, self.n_docs, self.n_bytes)
+
+    def bench_get_stats(self) -> Dict[str, float]:
+        tokenizer = BPETokenizer()
+        tokenizer.word_freq = spaced_word_freq(self.base.word_freq)
+        (pairs_freq, _), metrics = measure(lambda: tokenizer.get_stats(self.num_workers), self.memory)
+        metrics['pairs'] = len(pairs_freq)
+        return metrics
+
+    def bench_merge(self) -> Dict[str, float]:
+        tokenizer = BPETokenizer()
+        tokenizer.word_freq = spaced_word_freq(self.base.word_freq)
+        pairs_freq, pairs_idx = tokenizer.get_stats()
+        max_pair = max(pairs_freq, key=pairs_freq.get)
+        _, metrics = measure(lambda: tokenizer.merge(max_pair, pairs_idx[max_pair]), self.memory)
+        metrics['words_touched'] = len({i for i, _ in pairs_idx[max_pair]})
+        return metrics
+
+    def _train(self, incremental: bool = True) -> BPETokenizer:
+        tokenizer = BPETokenizer()
+        tokenizer.word_freq = dict(self.base.word_freq)
+        tokenizer.train(n_iter=self.n_iter, incremental=incremental, num_workers=self.num_workers)
+        return tokenizer
+
+    def bench_train(self) -> Dict[str, float]:
+        tokenizer, metrics = measure(self._train, self.memory)
+        metrics['merges'] = len(tokenizer.merges)
+        metrics['merges_per_s'] = len(tokenizer.merges) / metrics['seconds']
+        metrics['vocab_size'] = len(tokenizer.tokens)
+        return metrics
+
+    def bench_tokenize(self) -> Dict[str, float]:
+        encoder = self.trained.encoder
+        def run():
+            encoder.clear_cache()
+            return self.trained.tokenize(self.corpus)
+        text_tokenIDs, metrics = measure(run, self.memory)
+        n_tokens = sum(map(len, text_tokenIDs))
+        metrics['tokens_per_s'] = n_tokens / metrics['seconds']
+        metrics['cache_hit_rate'] = encoder.cache_info()['hit_rate']
+        return throughput(metrics, self.n_docs, self.n_bytes)
+
+    def _encode(self, tokens) -> Tuple[List[List[int]], Dict[str, float]]:
+        # Encode a 1 KB document with the trained merges, so that only the
+        # token -> ID lookups differ between vocabularies
+        tokenizer = BPETokenizer()
+        tokenizer.load_state(self.trained.metadata(), tokens, self.trained.merges)
+        document = ' '.join(self.corpus)[:1024]
+        tokenizer.tokenize(document)  # fill the encoder's word cache
+        def run():
+            for _ in range(ENCODE_REPEAT):
+                text_tokenIDs = tokenizer.tokenize(document)
+            return text_tokenIDs
+        text_tokenIDs, metrics = measure(run, self.memory)
+        seconds = metrics['seconds'] / ENCODE_REPEAT
+        metrics['ms_per_doc'] = seconds * 1e3
+        metrics['us_per_word'] = seconds / len(tokenizer.text_to_words(document)) * 1e6
+        metrics['vocab_size'] = len(tokens)
+        return text_tokenIDs, metrics
+
+    def bench_encode(self) -> Dict[str, float]:
+        _, metrics = self._encode(Vocabulary(self.trained.tokens))
+        return metrics
+
+    def _longest_match(self, tokenizer) -> Dict[str, float]:
+        text_tokenIDs, metrics = measure(lambda: tokenizer.tokenize(self.corpus), self.memory)
+        n_tokens = sum(map(len, text_tokenIDs))
+        metrics['tokens_per_s'] = n_tokens / metrics['seconds']
+        return throughput(metrics, self.n_docs, self.n_bytes)
+
+    def bench_word_tokenize(self) -> Dict[str, float]:
+        self.words.trie  # compiled once after train(), not per call
+        return self._longest_match(self.words)
+
+    def bench_longest_match(self) -> Dict[str, float]:
+        tokenizer = BPETokenizer(longest_match=True)
+        tokenizer.tokens = self.trained.tokens
+        tokenizer.trie
+        return self._longest_match(tokenizer)
+
+    def legacy_preprocess(self) -> Dict[str, float]:
+        preprocessor = LegacyPreprocessor()
+        output, metrics = measure(lambda: [preprocessor.split_string_with_rule(text) for text in self.corpus],
+                                  self.memory)
+        assert output == [Preprocessor().split_string_with_rule(text) for text in self.corpus], \
+            'compiled Preprocessor changed the output'
+        return throughput(metrics, self.n_docs, self.n_bytes)
+
+    def legacy_train(self) -> Dict[str, float]:
+        tokenizer, metrics = measure(lambda: self._train(incremental=False), self.memory)
+        assert tokenizer.tokens == self.trained.tokens, 'incremental trainer diverged from get_stats/merge'
+        metrics['merges'] = len(tokenizer.merges)
+        metrics['merges_per_s'] = len(tokenizer.merges) / metrics['seconds']
+        return metrics
+
+    def legacy_encode(self) -> Dict[str, float]:
+        text_tokenIDs, metrics = self._encode(ListVocabulary(self.trained.tokens))
+        assert text_tokenIDs == self._encode(Vocabulary(self.trained.tokens))[0], \
+            'Vocabulary changed the token IDs'
+        return metrics
+
+    def legacy_tokenize(self) -> Dict[str, float]:
+        tokenizer = LegacyBPETokenizer()
+        tokenizer.tokens = ListVocabulary(self.trained.tokens)
+        return self._longest_match(tokenizer)
+
+    def legacy_word_tokenize(self) -> Dict[str, float]:
+        tokenizer = LegacyWordTokenizer()
+        tokenizer.tokens = self.words.tokens
+        return self._longest_match(tokenizer)
+
+    def legacy_longest_match(self) -> Dict[str, float]:
+        tokenizer = LegacyBPETokenizer()
+        tokenizer.tokens = self.trained.tokens
+        return self._longest_match(tokenizer)
+
+    def run(self,
+            stages: List[str],
+            compare: bool = False
+    ) -> Dict[str, Dict[str, float]]:
+        results = {}
+        for stage in stages:
+            results[stage] = getattr(self, f'bench_{stage}')()
+            if compare and hasattr(self, f'legacy_{stage}'):
+                results[f'{stage}_legacy'] = getattr(self, f'legacy_{stage}')()
+        return results
+
+
+STAGES = ['preprocess', 'add_corpus', 'get_stats', 'merge', 'train', 'encode', 'tokenize',
+          'word_tokenize', 'longest_match']
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-c", "--n_corpus", type=int, default=1000)
+    parser.add_argument("-w", "--words_per_doc", type=int, default=300)
+    parser.add_argument("-v", "--vocab_size", type=int, default=5000)
+    parser.add_argument("-i", "--n_iter", type=int, default=500)
+    parser.add_argument("-b", "--bench", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--compare", action="store_true",
+                        help="also measure the legacy code paths and check their outputs match")
+    parser.add_argument("--no_memory", action="store_true",
+                        help="skip the tracemalloc pass that measures peak memory")
+    parser.add_argument("-n", "--num_workers", type=int, default=1,
+                        help="processes counting pairs in get_stats and in the incremental trainer's initial count")
+    parser.add_argument("-o", "--output", type=str, default=None, help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(n_docs=args.n_corpus, words_per_doc=args.words_per_doc,
+                              vocab_size=args.vocab_size)
+    benchmark = Benchmark(corpus, args.n_iter, memory=not args.no_memory, num_workers=args.num_workers)
+    report = {
+        'config': {
+            'n_corpus': args.n_corpus,
+            'words_per_doc': args.words_per_doc,
+            'vocab_size': args.vocab_size,
+            'n_iter': args.n_iter,
+            'num_workers': args.num_workers,
+            'corpus_mb': benchmark.n_bytes / 1e6,
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'results': benchmark.run(args.bench, compare=args.compare),
+    }
+    report['environment']['peak_rss_mb'] = peak_rss_mb()
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
@@ -0,0 +1,63 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+
+from YBIGTA.tokenizers import BPETokenizer
+from YBIGTA.service import TokenizerService, UnixClient, serve_unix, generate_load
+from benchmark import synthetic_corpus
+
+
+async def run(tokenizer: BPETokenizer,
+              texts: list,
+              args: argparse.Namespace
+) -> dict:
+    service = TokenizerService(tokenizer, max_batch_size=args.max_batch_size,
+                               max_delay=args.max_delay_ms / 1e3, num_workers=args.num_workers)
+    async with service:
+        if args.mode == 'inproc':
+            result = await generate_load([service] * args.concurrency, texts, args.n_requests)
+        else:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, 'tokenizer.sock')
+                server = await serve_unix(service, path)
+                clients = [UnixClient(path) for _ in range(args.concurrency)]
+                try:
+                    for client in clients:
+                        await client.__aenter__()
+                    result = await generate_load(clients, texts, args.n_requests)
+                finally:
+                    for client in clients:
+                        if client.writer is not None:
+                            await client.__aexit__()
+                    server.close()
+                    await server.wait_closed()
+        result.update(service.stats())
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="load generator for the asyncio tokenizer service")
+    parser.add_argument("--mode", choices=["inproc", "unix"], default="inproc")
+    parser.add_argument("-n", "--n_requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max_batch_size", type=int, default=64)
+    parser.add_argument("--max_delay_ms", type=float, default=2.0)
+    parser.add_argument("-w", "--num_workers", type=int, default=1)
+    parser.add_argument("-c", "--n_corpus", type=int, default=500)
+    parser.add_argument("-i", "--n_iter", type=int, default=500)
+    parser.add_argument("-o", "--tokenizer_path", type=str, default=None,
+                        help="serve this saved tokenizer instead of training one on a synthetic corpus")
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(n_docs=args.n_corpus, words_per_doc=200)
+    if args.tokenizer_path is not None:
+        tokenizer = BPETokenizer.load(args.tokenizer_path)
+    else:
+        tokenizer = BPETokenizer(corpus)
+        tokenizer.train(n_iter=args.n_iter)
+
+    # Requests are single sentences rather than whole documents
+    texts = [" ".join(doc.split()[:20]) for doc in corpus]
+    print(json.dumps(asyncio.run(run(tokenizer, texts, args)), indent=2))
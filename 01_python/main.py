@@ -1,10 +1,37 @@
 import argparse
 import os, tarfile
 from urllib.request import urlretrieve
-from typing import Optional
+from itertools import islice
+from typing import Optional, Iterator
 
 from YBIGTA.preprocessor import Preprocessor
 from YBIGTA.tokenizers import BPETokenizer, WordTokenizer
+from YBIGTA.token_shards import write_token_shards
+
+
+def iter_corpus(
+    url: str = "https://huggingface.co/datasets/cnn_dailymail/resolve/main/data/cnn_stories.tgz",
+    dl_name: str = "dataset.tgz",
+    text_dir: str = "cnn/stories/",
+    n: Optional[int] = None
+) -> Iterator[str]:
+    """
+    Yield stories one at a time, from text_dir if it has been extracted,
+    otherwise straight out of the tarball without extracting it.
+    """
+    if os.path.exists(text_dir):
+        with os.scandir(text_dir) as it:
+            for entry in islice(it, n):
+                with open(entry.path, encoding='utf-8') as f:
+                    yield f.read()
+        return
+
+    if not os.path.exists(dl_name):
+        urlretrieve(url, dl_name)
+    with tarfile.open(dl_name, mode='r|gz') as tar:
+        members = (m for m in tar if m.isfile() and m.name.startswith(text_dir))
+        for member in islice(members, n):
+            yield tar.extractfile(member).read().decode('utf-8')
 
 
 def load_corpus(
@@ -18,10 +45,7 @@ def load_corpus(
             urlretrieve(url, dl_name)
         tarfile.open(dl_name).extractall()
 
-    ls = os.listdir(text_dir)[:n]
-    dir_to_text = lambda f: open(text_dir + f, encoding='utf-8').read()
-    dataset = [*map(dir_to_text, ls)]
-    return dataset
+    return list(iter_corpus(url, dl_name, text_dir, n))
 
 
 if __name__ == "__main__":
@@ -29,22 +53,72 @@ if __name__ == "__main__":
     parser.add_argument("-t", "--use_bpe", type=bool, default=True)
     parser.add_argument("-c", "--n_corpus", type=int, default=40000)
     parser.add_argument("-i", "--n_iter", type=int, default=30000)
+    parser.add_argument("-v", "--vocab_size", type=int, default=None)
+    parser.add_argument("-m", "--min_frequency", type=int, default=1)
+    parser.add_argument("-w", "--num_workers", type=int, default=None)
+    parser.add_argument("-s", "--stream", action="store_true",
+                        help="count words while reading the dataset, without keeping it in memory")
+    parser.add_argument("-o", "--tokenizer_path", type=str, default=None,
+                        help="load the tokenizer from this file if it exists, otherwise train and save it there")
+    parser.add_argument("--checkpoint_dir", type=str, default=None,
+                        help="save BPE training progress to this directory")
+    parser.add_argument("--checkpoint_every", type=int, default=1000)
+    parser.add_argument("--resume", action="store_true",
+                        help="continue BPE training from the checkpoint in --checkpoint_dir")
+    parser.add_argument("--shard_dir", type=str, default=None,
+                        help="tokenize the corpus into binary token shards in this directory")
+    parser.add_argument("--shard_size", type=int, default=1 << 26,
+                        help="maximum number of tokens per shard")
+    parser.add_argument("--profile", type=str, default=None,
+                        help="time each pipeline stage and write the report to this JSON file")
+    parser.add_argument("--report_every", type=int, default=1000,
+                        help="with --profile, print training progress every this many merges")
     args = parser.parse_args()
 
     use_bpe = args.use_bpe
     n_corpus = args.n_corpus
     n_iter = args.n_iter
 
-    corpus = load_corpus(n=n_corpus)
-
     SelectedTokenizer = BPETokenizer if use_bpe else WordTokenizer
-    tokenizer = SelectedTokenizer(corpus[:n_corpus//2])
-    tokenizer.add_corpus(corpus[n_corpus//2:])
-    tokenizer.train(n_iter=n_iter)
-
-    input_ids = tokenizer.tokenize(
-        corpus[:10],
-        padding=True,
-        max_length=1024
-    )
-    print(input_ids)
+    if args.tokenizer_path is not None and os.path.exists(args.tokenizer_path):
+        tokenizer = SelectedTokenizer.load(args.tokenizer_path)
+        if args.profile is not None:
+            tokenizer.enable_profiling(args.report_every, print)
+        samples = list(iter_corpus(n=10))
+    else:
+        tokenizer = SelectedTokenizer()
+        if args.profile is not None:
+            tokenizer.enable_profiling(args.report_every, print)
+        if args.stream:
+            tokenizer.add_corpus(iter_corpus(n=n_corpus), num_workers=args.num_workers, keep_corpus=False)
+            samples = list(iter_corpus(n=10))
+        else:
+            corpus = load_corpus(n=n_corpus)
+            tokenizer.add_corpus(corpus[:n_corpus//2], num_workers=args.num_workers)
+            tokenizer.add_corpus(corpus[n_corpus//2:], num_workers=args.num_workers)
+            samples = corpus[:10]
+        checkpoint_kwargs = {}
+        if use_bpe and args.checkpoint_dir is not None:
+            checkpoint_kwargs = dict(checkpoint_dir=args.checkpoint_dir,
+                                     checkpoint_every=args.checkpoint_every,
+                                     resume=args.resume)
+        tokenizer.train(n_iter=n_iter, num_workers=args.num_workers,
+                        vocab_size=args.vocab_size, min_frequency=args.min_frequency,
+                        **checkpoint_kwargs)
+        if args.tokenizer_path is not None:
+            tokenizer.save(args.tokenizer_path)
+
+    if args.shard_dir is not None:
+        stats = write_token_shards(tokenizer, iter_corpus(n=n_corpus), args.shard_dir,
+                                   shard_size=args.shard_size, num_workers=args.num_workers)
+        print(stats)
+    else:
+        input_ids = tokenizer.tokenize(
+            samples,
+            padding=True,
+            max_length=1024
+        )
+        print(input_ids)
+
+    if args.profile is not None:
+        tokenizer.profiler.to_json(args.profile)
@@ -0,0 +1,85 @@
+import unittest
+import os
+import tempfile
+import shutil
+from YBIGTA.tokenizers import BPETokenizer, WordTokenizer
+from YBIGTA.artifact import MappedVocabulary
+from YBIGTA.parallel import encoder_initargs
+from benchmark import synthetic_corpus
+
+class TestArtifact(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "tokenizer.bin")
+        self.corpus = synthetic_corpus(n_docs=30, words_per_doc=80)
+        self.corpus.append("Ünïcödé wörds — and CJK 한국어 text")
+
+    def test_round_trip(self):
+        for tokenizer_class in [BPETokenizer, WordTokenizer]:
+            tokenizer = tokenizer_class(self.corpus)
+            tokenizer.train(n_iter=200)
+            tokenizer.save(self.path)
+
+            loaded = tokenizer_class.load(self.path)
+            self.assertEqual(list(loaded.tokens), list(tokenizer.tokens))
+            self.assertEqual(loaded.tokenize(self.corpus[:5], padding=True),
+                             tokenizer.tokenize(self.corpus[:5], padding=True))
+            if tokenizer_class is BPETokenizer:
+                self.assertEqual(loaded.merges, tokenizer.merges)
+
+    def test_mapped_lookups(self):
+        tokenizer = BPETokenizer(self.corpus)
+        tokenizer.train(n_iter=200)
+        tokenizer.save(self.path)
+        loaded = BPETokenizer.load(self.path)
+
+        # Tokens and merges are looked up in the mapped file, not copied
+        self.assertIsInstance(loaded.tokens, MappedVocabulary)
+        self.assertEqual(loaded.tokens.token_to_id, {})
+        for token_id, token in enumerate(tokenizer.tokens):
+            self.assertEqual(loaded.tokens.get_id(token), token_id)
+            self.assertEqual(loaded.tokens[token_id], token)
+        self.assertEqual(loaded.tokens.get_id("not a token"), -1)
+        self.assertNotIn("not a token", loaded.tokens)
+        self.assertEqual(loaded.tokens[-1], tokenizer.tokens[-1])
+        with self.assertRaises(IndexError):
+            loaded.tokens[len(tokenizer.tokens)]
+        with self.assertRaises(TypeError):
+            loaded.tokens.add("not a token")
+        for pair in tokenizer.merges:
+            self.assertEqual(loaded.encoder.ranks.get(pair), tokenizer.encoder.ranks[pair])
+        self.assertIsNone(loaded.encoder.ranks.get(("not", "merged")))
+
+        # Workers map the file themselves rather than receiving the vocabulary
+        self.assertEqual(encoder_initargs(loaded)[2], self.path)
+        self.assertEqual(loaded.tokenize(self.corpus, num_workers=2),
+                         tokenizer.tokenize(self.corpus))
+
+        # Training again replaces the mapped vocabulary
+        loaded.add_corpus(self.corpus)
+        loaded.train(n_iter=10)
+        self.assertNotIsInstance(loaded.tokens, MappedVocabulary)
+
+    def test_wrong_class(self):
+        tokenizer = WordTokenizer(self.corpus)
+        tokenizer.train()
+        tokenizer.save(self.path)
+        with self.assertRaises(ValueError):
+            BPETokenizer.load(self.path)
+
+    def test_not_an_artifact(self):
+        with open(self.path, 'wb') as f:
+            f.write(b"not a tokenizer at all")
+        with self.assertRaises(ValueError):
+            BPETokenizer.load(self.path)
+
+    def test_untrained(self):
+        with self.assertRaises(RuntimeError):
+            BPETokenizer(self.corpus).save(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from YBIGTA.tokenizers import BPETokenizer
+from YBIGTA.bpe_encoder import BPEEncoder
+
+class TestBPEEncoder(unittest.TestCase):
+
+    def setUp(self):
+        self.corpus = [
+            "The quick brown fox jumps over the lazy dog.",
+            "The lazy dog doesn't care; the fox's den is far away.",
+            "Aaaa! said the bookkeeper, as the committee's meeting went on.",
+        ]
+
+    def test_replays_training_merges(self):
+        # Every training word must be segmented exactly as in word_freq
+        for n_iter in [1, 10, 50, 1000]:
+            tokenizer = BPETokenizer(self.corpus)
+            tokenizer.train(n_iter=n_iter)
+            for word in tokenizer.word_freq:
+                self.assertEqual(tokenizer.encoder.encode_word(word.replace(" ", "")),
+                                 tuple(word.split()))
+
+    def test_merges_recorded_by_both_paths(self):
+        rescan = BPETokenizer(self.corpus)
+        rescan.train(n_iter=30, incremental=False)
+        incremental = BPETokenizer(self.corpus)
+        incremental.train(n_iter=30)
+        self.assertEqual(rescan.merges, incremental.merges)
+        self.assertEqual(len(incremental.merges), 30)
+
+    def test_lru_cache(self):
+        encoder = BPEEncoder([('a', 'b'), ('ab', 'c')], cache_size=2)
+        self.assertEqual(encoder.encode_word("abcab"), ('abc', 'ab'))
+        encoder.encode_word("abcab")
+        encoder.encode_word("x")
+        encoder.encode_word("y")
+        self.assertNotIn("abcab", encoder.cache)
+        info = encoder.cache_info()
+        self.assertEqual((info['hits'], info['misses'], info['size']), (1, 3, 2))
+
+    def test_tokenize_max_length(self):
+        tokenizer = BPETokenizer(self.corpus)
+        tokenizer.train(n_iter=20)
+        ids = tokenizer.tokenize(self.corpus[0], max_length=5)
+        self.assertEqual(len(ids[0]), 5)
+        self.assertNotIn(-1, tokenizer.tokenize(self.corpus[1])[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from YBIGTA.tokenizers import BPETokenizer
+from YBIGTA.bpe_trainer import BPETrainer
+from YBIGTA.bpe_checkpoint import BPECheckpoint
+from benchmark import synthetic_corpus
+
+class TestBPETrainer(unittest.TestCase):
+
+    def setUp(self):
+        self.corpus = [
+            "The quick brown fox jumps over the lazy dog.",
+            "The lazy dog doesn't care; the fox's den is far away.",
+            "Aaaa! said the bookkeeper, as the committee's meeting went on.",
+        ]
+
+    def test_same_tokens_as_rescan(self):
+        # The incremental engine must reproduce the get_stats/merge path
+        for n_iter in [1, 5, 20, 100, 1000]:
+            rescan = BPETokenizer(self.corpus)
+            rescan.train(n_iter=n_iter, incremental=False)
+
+            incremental = BPETokenizer(self.corpus)
+            incremental.train(n_iter=n_iter)
+
+            self.assertEqual(rescan.word_freq, incremental.word_freq)
+            self.assertEqual(rescan.tokens, incremental.tokens)
+
+    def test_parallel_pair_counting(self):
+        tokenizer = BPETokenizer(self.corpus * 3)
+        tokenizer.word_freq = {" ".join(word): freq for word, freq in tokenizer.word_freq.items()}
+        serial = tokenizer.get_stats()
+        parallel = tokenizer.get_stats(num_workers=3)
+        self.assertEqual(list(serial[0].items()), list(parallel[0].items()))
+        self.assertEqual(serial[1], parallel[1])
+
+        trainer = BPETrainer(tokenizer.word_freq)
+        parallel_trainer = BPETrainer(tokenizer.word_freq, num_workers=3)
+        self.assertEqual(trainer.pairs_freq, parallel_trainer.pairs_freq)
+        self.assertEqual(trainer.pairs_words, parallel_trainer.pairs_words)
+        self.assertEqual(trainer.train(100), parallel_trainer.train(100))
+
+    def test_legacy_loop_counts_serially(self):
+        # Recounting after every merge must not start a process pool per merge
+        serial = BPETokenizer(self.corpus)
+        serial.train(n_iter=20, incremental=False)
+        tokenizer = BPETokenizer(self.corpus)
+        with mock.patch('YBIGTA.tokenizers.map_shards') as map_shards:
+            tokenizer.train(n_iter=20, incremental=False, num_workers=3)
+        map_shards.assert_not_called()
+        self.assertEqual(tokenizer.tokens, serial.tokens)
+
+    def test_vocab_size_target(self):
+        corpus = synthetic_corpus(n_docs=20, words_per_doc=50)
+        merges = {}
+        for incremental in [True, False]:
+            tokenizer = BPETokenizer(corpus)
+            tokenizer.train(vocab_size=60, incremental=incremental)
+            self.assertEqual(len(tokenizer.tokens), 60)
+            merges[incremental] = tokenizer.merges
+        self.assertEqual(merges[True], merges[False])
+
+    def test_min_frequency(self):
+        for incremental in [True, False]:
+            tokenizer = BPETokenizer(self.corpus)
+            tokenizer.train(n_iter=1000, min_frequency=2, incremental=incremental)
+            self.assertTrue(all(freq >= 2 for freq in tokenizer.word_freq.values()))
+
+            pairs_freq, _ = tokenizer.get_stats()
+            self.assertTrue(all(freq < 2 for freq in pairs_freq.values()))
+            self.assertNotIn("b o o k k e e p e r", tokenizer.word_freq)
+
+        with self.assertRaises(TypeError):
+            BPETokenizer(self.corpus).train()
+
+    def test_ties_follow_first_occurrence(self):
+        # Every pair occurs once, so the first pair seen must win
+        trainer = BPETrainer({"x y": 1, "a b": 1, "c d": 1})
+        self.assertEqual(trainer.train(3), [('x', 'y'), ('a', 'b'), ('c', 'd')])
+
+        # Merges move first occurrences: "a b" merged shifts "c d" in "a b c d"
+        trainer = BPETrainer({"e f c d": 1, "a b c d": 1, "a b e f": 1})
+        self.assertEqual(trainer.train(3), [('e', 'f'), ('c', 'd'), ('a', 'b')])
+
+    def test_first_occurrences_are_maintained(self):
+        tokenizer = BPETokenizer(synthetic_corpus(n_docs=20, words_per_doc=50))
+        trainer = BPETrainer({" ".join(word): freq for word, freq in tokenizer.word_freq.items()})
+        for _ in range(60):
+            trainer.merge(trainer.best_pair())
+            for pair in trainer.pairs_freq:
+                i = min(trainer.pairs_words[pair])
+                self.assertEqual(trainer.pairs_first[pair], (i, trainer.word_pairs(i).index(pair)))
+
+    def test_overlapping_pairs(self):
+        trainer = BPETrainer({"a a a": 2})
+        trainer.train(1)
+        self.assertEqual(trainer.word_freq(), {"aa a": 2})
+
+        tokenizer = BPETokenizer()
+        tokenizer.word_freq = {"aaa": 2}
+        tokenizer.train(n_iter=1, incremental=False)
+        self.assertEqual(tokenizer.word_freq, {"aa a": 2})
+
+    def test_resume_from_checkpoint(self):
+        corpus = synthetic_corpus(n_docs=20, words_per_doc=50)
+        uninterrupted = BPETokenizer(corpus)
+        uninterrupted.train(n_iter=100)
+
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            # Stop after 30 merges, as if the run had been killed
+            interrupted = BPETokenizer(corpus)
+            interrupted.train(n_iter=30, checkpoint_dir=checkpoint_dir, checkpoint_every=7)
+            self.assertEqual(BPECheckpoint(checkpoint_dir).restore().merges, interrupted.merges)
+
+            resumed = BPETokenizer(corpus)
+            resumed.train(n_iter=100, checkpoint_dir=checkpoint_dir, checkpoint_every=7, resume=True)
+            self.assertEqual(resumed.merges, uninterrupted.merges)
+            self.assertEqual(resumed.word_freq, uninterrupted.word_freq)
+            self.assertEqual(resumed.tokens, uninterrupted.tokens)
+
+            # Without resume, training starts over and replaces the checkpoint
+            restarted = BPETokenizer(corpus)
+            restarted.train(n_iter=10, checkpoint_dir=checkpoint_dir)
+            self.assertEqual(BPECheckpoint(checkpoint_dir).restore().merges, uninterrupted.merges[:10])
+
+        with self.assertRaises(ValueError):
+            BPETokenizer(corpus).train(n_iter=10, resume=True)
+        with self.assertRaises(ValueError):
+            BPETokenizer(corpus).train(n_iter=10, incremental=False, checkpoint_dir='checkpoint')
+
+    def test_resume_checks_settings(self):
+        corpus = synthetic_corpus(n_docs=20, words_per_doc=50)
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            BPETokenizer(corpus).train(n_iter=10, checkpoint_dir=checkpoint_dir)
+            for other, min_frequency in [(corpus[1:], 1), (corpus, 2)]:
+                with self.assertRaises(ValueError):
+                    BPETokenizer(other).train(n_iter=20, min_frequency=min_frequency,
+                                              checkpoint_dir=checkpoint_dir, resume=True)
+            # The checkpoint is left as it was
+            resumed = BPETokenizer(corpus)
+            resumed.train(n_iter=20, checkpoint_dir=checkpoint_dir, resume=True)
+            self.assertEqual(len(resumed.merges), 20)
+
+    def test_torn_checkpoint_record(self):
+        corpus = synthetic_corpus(n_docs=20, words_per_doc=50)
+        word_freq = {" ".join(word): freq for word, freq in BPETokenizer(corpus).word_freq.items()}
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            checkpoint = BPECheckpoint(checkpoint_dir)
+            trainer = BPETrainer(word_freq)
+            checkpoint.start(trainer)
+            trainer.train(20, checkpoint=checkpoint, checkpoint_every=10)
+
+            # Cut the last record short, as a crash in the middle of a save would
+            log_path = os.path.join(checkpoint_dir, 'log.bin')
+            os.truncate(log_path, os.path.getsize(log_path) - 3)
+            restored = BPECheckpoint(checkpoint_dir).restore()
+            self.assertEqual(restored.merges, trainer.merges[:10])
+
+            expected = BPETrainer(word_freq)
+            expected.train(10)
+            self.assertEqual(restored.word_freq(), expected.word_freq())
+            self.assertEqual(restored.train(20), trainer.merges)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from io import StringIO
+from itertools import product
+import sys
+from YBIGTA.preprocessor import Preprocessor
+from benchmark import LegacyPreprocessor, synthetic_corpus
+
+class TestPreprocessor(unittest.TestCase):
+
+    def setUp(self):
+        self.held, sys.stdout = sys.stdout, StringIO()
+        self.preprocessor = Preprocessor()
+        self.legacy = LegacyPreprocessor()
+        self.texts = [
+            "",
+            "   ",
+            "Hello, World!",
+            "Tabs\tand\nnew\r\nlines\x0b\x0c and nbsp em　space",
+            "back\\slash [brackets] {braces} a-b c_d e+f g=h 'quoted' \"double\"",
+            "He doesn't know; they'll see, we're here, I'd go, I'm in, it's Bob's, the boys' toys.",
+            "'''triple''' rock'n'roll o'neill ' '' 'tis",
+            "ÀÉÎ Straße İstanbul ﬁ",
+        ] + synthetic_corpus(n_docs=20, words_per_doc=100)
+
+    def test_split_string_parity(self):
+        for text in self.texts:
+            self.assertEqual(self.preprocessor.split_string(text),
+                             self.legacy.split_string(text))
+        self.assertEqual(self.preprocessor.split_string(list(self.texts)),
+                         self.legacy.split_string(list(self.texts)))
+
+    def test_split_string_with_rule_parity(self):
+        for text in self.texts:
+            self.assertEqual(self.preprocessor.split_string_with_rule(text),
+                             self.legacy.split_string_with_rule(text))
+
+    def test_single_quote_handle_parity(self):
+        # Every word up to 5 characters over quotes and contraction letters
+        alphabet = "'sntdvelrmx"
+        for length in range(1, 6):
+            for chars in product(alphabet, repeat=length):
+                word = "".join(chars)
+                if "'" in word:
+                    self.assertEqual(self.preprocessor.single_quote_handle(word),
+                                     self.legacy.single_quote_handle(word), word)
+
+    def test_quote_stats(self):
+        sys.stdout = StringIO()
+        self.preprocessor.split_string_with_rule("rock'n'roll o'neill don't ''quoted'' boys' 'tis")
+        stats = self.preprocessor.quote_stats.as_dict()
+        self.assertEqual(sys.stdout.getvalue(), "")
+        self.assertEqual(stats['n_quoted'], 6)
+        self.assertEqual(stats['n_contractions'], 2)
+        self.assertEqual(stats['n_unknown'], 2)
+        self.assertEqual(stats['unknown'], {"rock'n'roll": 1, "o'neill": 1})
+
+    def test_type_error(self):
+        with self.assertRaises(TypeError):
+            self.preprocessor.split_string(3)
+        with self.assertRaises(TypeError):
+            self.preprocessor.split_string_with_rule(None)
+
+    def tearDown(self):
+        sys.stdout = self.held
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import json
+import os
+import tempfile
+import unittest
+from YBIGTA.tokenizers import BPETokenizer, WordTokenizer
+from benchmark import synthetic_corpus
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.corpus = synthetic_corpus(n_docs=20, words_per_doc=50)
+
+    def test_stages(self):
+        for incremental in [True, False]:
+            tokenizer = BPETokenizer()
+            profiler = tokenizer.enable_profiling()
+            tokenizer.add_corpus(self.corpus, chunk_size=8)
+            tokenizer.train(n_iter=30, incremental=incremental)
+            tokenizer.tokenize(self.corpus[:5])
+
+            stages = profiler.as_dict()['stages']
+            self.assertEqual(stages['count_words']['items'], len(self.corpus))
+            self.assertEqual(stages['count_words']['calls'], 3)
+            self.assertEqual(stages['train']['items'], 30)
+            self.assertEqual(stages['merge']['calls'], 30)
+            self.assertEqual(stages['tokenize']['items'], 5)
+            self.assertGreater(stages['text_to_words']['items'], 0)
+            self.assertEqual(stages['split_words']['calls'], stages['text_to_words']['calls'])
+            self.assertGreater(stages['split_words']['items'], 0)
+            self.assertEqual('get_stats' in stages, not incremental)
+            for stats in stages.values():
+                self.assertGreaterEqual(stats['seconds'], 0)
+
+    def test_preprocessing_stage(self):
+        # The word split used by add_corpus is timed, for both tokenizers
+        for tokenizer in [BPETokenizer(), WordTokenizer()]:
+            profiler = tokenizer.enable_profiling()
+            tokenizer.add_corpus(self.corpus)
+            stages = profiler.as_dict()['stages']
+            self.assertEqual(stages['split_words']['calls'], len(self.corpus))
+            self.assertGreater(stages['split_words']['items'], len(self.corpus))
+
+    def test_parallel_add_corpus(self):
+        # Stages timed in the worker processes are merged into the profile
+        stages = []
+        for num_workers in [1, 2]:
+            tokenizer = BPETokenizer()
+            profiler = tokenizer.enable_profiling()
+            tokenizer.add_corpus(self.corpus, num_workers=num_workers, chunk_size=8)
+            stages.append(profiler.as_dict()['stages'])
+        for stage in ['count_words', 'text_to_words', 'split_words']:
+            self.assertGreater(stages[1][stage]['items'], 0)
+            for key in ['calls', 'items']:
+                self.assertEqual(stages[1][stage][key], stages[0][stage][key])
+
+    def test_progress_report(self):
+        reports = []
+        for incremental in [True, False]:
+            tokenizer = BPETokenizer(self.corpus)
+            profiler = tokenizer.enable_profiling(report_every=10, report=reports.append)
+            tokenizer.train(n_iter=35, incremental=incremental)
+            progress = profiler.as_dict()['progress']
+            self.assertEqual([record['merges'] for record in progress], [10, 20, 30])
+            self.assertEqual(reports[-3:], progress)
+            for record in progress:
+                self.assertGreater(record['merges_per_s'], 0)
+            # Vocabulary size includes the padding token, as len(tokens) does
+            stopped = BPETokenizer(self.corpus)
+            stopped.train(n_iter=30, incremental=incremental)
+            self.assertEqual(progress[-1]['vocab_size'], len(stopped.tokens))
+
+    def test_disable_and_export(self):
+        tokenizer = WordTokenizer(self.corpus)
+        profiler = tokenizer.enable_profiling()
+        tokenizer.train()
+        tokenizer(self.corpus[:2])
+        self.assertIs(tokenizer.disable_profiling(), profiler)
+        self.assertNotIn('tokenize', tokenizer.__dict__)
+        self.assertNotIn('split_words', tokenizer.preprocessor.__dict__)
+        self.assertIsNone(tokenizer.profiler)
+
+        # Once disabled, nothing is recorded
+        tokenizer.tokenize(self.corpus[:2])
+        self.assertEqual(profiler.as_dict()['stages']['tokenize']['calls'], 1)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'profile.json')
+            profiler.to_json(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f), json.loads(profiler.to_json()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from YBIGTA.tokenizers import BPETokenizer
+from YBIGTA.service import TokenizerService, UnixClient, serve_unix, generate_load
+from benchmark import synthetic_corpus
+
+class TestTokenizerService(unittest.TestCase):
+
+    def setUp(self):
+        self.corpus = synthetic_corpus(n_docs=40, words_per_doc=30)
+        self.tokenizer = BPETokenizer(self.corpus)
+        self.tokenizer.train(n_iter=50)
+        self.expected = self.tokenizer.encode(self.corpus)
+
+    def test_in_process(self):
+        async def main():
+            async with TokenizerService(self.tokenizer, max_batch_size=8, max_delay=0.01) as service:
+                results = await asyncio.gather(*(service.encode(text) for text in self.corpus))
+                return results, service.stats()
+        results, stats = asyncio.run(main())
+        self.assertEqual(results, self.expected)
+        # Concurrent requests are coalesced into full batches
+        self.assertEqual(stats['requests'], len(self.corpus))
+        self.assertEqual(stats['batches'], len(self.corpus) // 8)
+
+    def test_worker_pool(self):
+        async def main():
+            async with TokenizerService(self.tokenizer, max_batch_size=8, num_workers=2) as service:
+                return await asyncio.gather(*(service.encode(text) for text in self.corpus))
+        self.assertEqual(asyncio.run(main()), self.expected)
+
+    def test_errors(self):
+        async def main():
+            service = TokenizerService(self.tokenizer)
+            with self.assertRaises(RuntimeError):
+                await service.encode("not started")
+            async with service:
+                with self.assertRaises(TypeError):
+                    await service.encode(42)
+        asyncio.run(main())
+        with self.assertRaises(ValueError):
+            TokenizerService(self.tokenizer, max_batch_size=0)
+
+    @unittest.skipUnless(hasattr(asyncio, 'start_unix_server'), "no Unix sockets")
+    def test_unix_socket(self):
+        async def main():
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, 'tokenizer.sock')
+                async with TokenizerService(self.tokenizer, max_batch_size=8) as service:
+                    server = await serve_unix(service, path)
+                    try:
+                        async with UnixClient(path) as client:
+                            results = [await client.encode(text) for text in self.corpus[:5]]
+                        clients = [UnixClient(path) for _ in range(4)]
+                        for client in clients:
+                            await client.__aenter__()
+                        report = await generate_load(clients, self.corpus, 40)
+                        for client in clients:
+                            await client.__aexit__()
+                    finally:
+                        server.close()
+                        await server.wait_closed()
+            return results, report
+        results, report = asyncio.run(main())
+        self.assertEqual(results, self.expected[:5])
+        self.assertEqual(report['requests'], 40)
+        self.assertLessEqual(report['p50_ms'], report['p99_ms'])
+        self.assertGreater(report['requests_per_s'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import unittest
+from YBIGTA.tokenizers import BPETokenizer, WordTokenizer
+from YBIGTA.token_shards import TokenShardWriter, TokenShardReader, write_token_shards
+from benchmark import synthetic_corpus
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class TestTokenShards(unittest.TestCase):
+
+    def setUp(self):
+        self.corpus = synthetic_corpus(n_docs=40, words_per_doc=30)
+        self.tokenizer = BPETokenizer(self.corpus)
+        self.tokenizer.train(n_iter=50)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_round_trip(self):
+        stats = write_token_shards(self.tokenizer, iter(self.corpus), self.directory,
+                                   shard_size=500, batch_size=8)
+        expected = self.tokenizer.tokenize(self.corpus)
+        self.assertEqual(stats['n_docs'], len(self.corpus))
+        self.assertEqual(stats['n_tokens'], sum(map(len, expected)))
+        self.assertGreater(stats['n_shards'], 1)
+
+        reader = TokenShardReader(self.directory)
+        self.assertEqual(reader.dtype, np.dtype('<u2'))
+        self.assertEqual(len(reader), len(self.corpus))
+        self.assertEqual([doc.tolist() for doc in reader], expected)
+        for i in [0, 17, len(expected) - 1, -1]:
+            self.assertEqual(reader[i].tolist(), expected[i])
+        with self.assertRaises(IndexError):
+            reader[len(expected)]
+
+        # Documents are views of the mapped shard, not copies
+        self.assertIsInstance(reader[3].base, np.memmap)
+        self.assertFalse(reader[3].flags.writeable)
+
+    def test_shard_size(self):
+        with TokenShardWriter(self.directory, vocab_size=100, shard_size=4) as writer:
+            for doc in [[1, 2], [3], [4, 5, 6], [], [7, 8, 9, 10, 11]]:
+                writer.write(doc)
+        with open(os.path.join(self.directory, 'index.json')) as f:
+            shards = json.load(f)['shards']
+        # Documents never straddle shards; a long one gets a shard of its own
+        self.assertEqual([(s['n_docs'], s['n_tokens']) for s in shards], [(2, 3), (2, 3), (1, 5)])
+        reader = TokenShardReader(self.directory)
+        self.assertEqual([doc.tolist() for doc in reader], [[1, 2], [3], [4, 5, 6], [], [7, 8, 9, 10, 11]])
+
+    def test_failed_write_leaves_no_index(self):
+        with self.assertRaises(ValueError):
+            with TokenShardWriter(self.directory, vocab_size=100, shard_size=4) as writer:
+                for doc in [[1, 2], [3], [4, 5, 6], [7, -1]]:
+                    writer.write(doc)
+        # The shards written before the error are removed with the index
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_dtype_and_unknown_tokens(self):
+        with TokenShardWriter(self.directory, vocab_size=70000) as writer:
+            writer.write([69999, 0])
+        self.assertEqual(TokenShardReader(self.directory)[0].tolist(), [69999, 0])
+        self.assertEqual(TokenShardReader(self.directory).dtype, np.dtype('<u4'))
+
+        tokenizer = WordTokenizer(self.corpus[:5])
+        tokenizer.train()
+        with self.assertRaises(ValueError):
+            write_token_shards(tokenizer, ["an unseenword"], self.directory)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import unittest
+import os
+import tarfile
+import tempfile
+import shutil
+from YBIGTA.tokenizers import BPETokenizer, WordTokenizer
+from benchmark import synthetic_corpus
+from main import iter_corpus
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class TestTokenizer(unittest.TestCase):
+
+    def setUp(self):
+        self.corpus = synthetic_corpus(n_docs=50, words_per_doc=50)
+
+    def test_add_corpus_parallel(self):
+        # word_freq must match the serial path, including insertion order
+        for tokenizer_class in [BPETokenizer, WordTokenizer]:
+            serial = tokenizer_class()
+            serial.add_corpus(self.corpus)
+
+            parallel = tokenizer_class()
+            parallel.add_corpus(self.corpus, num_workers=3, chunk_size=7)
+
+            self.assertEqual(list(serial.word_freq.items()), list(parallel.word_freq.items()))
+            self.assertEqual(serial.corpus, parallel.corpus)
+
+    def test_quote_stats_parallel(self):
+        corpus = ["don't stop 'til o'neill's rock'n'roll", "the boys' ''quoted'' words"] * 300
+        stats = []
+        for num_workers in [1, 2]:
+            tokenizer = BPETokenizer()
+            tokenizer.add_corpus(corpus, num_workers=num_workers, chunk_size=64)
+            stats.append(tokenizer.preprocessor.quote_stats.as_dict())
+        self.assertGreater(stats[0]['n_contractions'], 0)
+        self.assertGreater(stats[0]['n_unknown'], 0)
+        self.assertEqual(stats[0], stats[1])
+
+    def test_add_corpus_stream(self):
+        serial = BPETokenizer(self.corpus)
+        for num_workers in [1, 2]:
+            streamed = BPETokenizer()
+            streamed.add_corpus((text for text in self.corpus), num_workers=num_workers,
+                                chunk_size=8, keep_corpus=False)
+            self.assertEqual(list(serial.word_freq.items()), list(streamed.word_freq.items()))
+            self.assertEqual(streamed.corpus, [])
+
+    def test_iter_corpus(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            text_dir = os.path.join(temp_dir, "cnn", "stories")
+            os.makedirs(text_dir)
+            for i, text in enumerate(self.corpus[:5]):
+                with open(os.path.join(text_dir, f"{i}.story"), 'w', encoding='utf-8') as f:
+                    f.write(text)
+            dl_name = os.path.join(temp_dir, "dataset.tgz")
+            with tarfile.open(dl_name, 'w:gz') as tar:
+                tar.add(text_dir, arcname="cnn/stories")
+
+            from_dir = list(iter_corpus(dl_name=dl_name, text_dir=text_dir + "/"))
+            from_tar = list(iter_corpus(dl_name=dl_name, text_dir="cnn/stories/", n=3))
+            self.assertEqual(sorted(from_dir), sorted(self.corpus[:5]))
+            self.assertEqual(len(from_tar), 3)
+            self.assertTrue(set(from_tar) <= set(self.corpus[:5]))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_tokenize_padding(self):
+        tokenizer = BPETokenizer(self.corpus)
+        tokenizer.train(n_iter=50)
+        ids = tokenizer.tokenize(self.corpus[:3], padding=True, max_length=40)
+        unpadded = tokenizer.tokenize(self.corpus[:3], max_length=40)
+        self.assertEqual(len({len(row) for row in ids}), 1)
+        for row, raw in zip(ids, unpadded):
+            self.assertEqual(row[:len(raw)], raw)
+            self.assertTrue(all(i == tokenizer.pad_id for i in row[len(raw):]))
+
+    def test_tokenize_parallel(self):
+        for tokenizer_class in [BPETokenizer, WordTokenizer]:
+            tokenizer = tokenizer_class(self.corpus)
+            tokenizer.train(n_iter=50)
+            for padding in [False, True]:
+                self.assertEqual(
+                    tokenizer.tokenize(self.corpus, padding=padding, max_length=30),
+                    tokenizer.tokenize(self.corpus, padding=padding, max_length=30,
+                                       num_workers=3, chunk_size=4))
+
+    def test_tokenize_iter(self):
+        tokenizer = BPETokenizer(self.corpus)
+        tokenizer.train(n_iter=50)
+        texts = [text[:n] for text in self.corpus for n in (10, 60, 200)]
+
+        batches = list(tokenizer.tokenize_iter(texts, batch_size=4, max_length=30))
+        self.assertEqual(len(batches), (len(texts) + 3) // 4)
+        for k, batch in enumerate(batches):
+            # Each batch is padded to its own longest text only
+            self.assertEqual(batch, tokenizer.tokenize(texts[4*k:4*k+4], padding=True, max_length=30))
+        self.assertEqual([ids for batch in tokenizer.tokenize_iter(texts, batch_size=4, padding=False)
+                          for ids in batch], tokenizer.tokenize(texts))
+        self.assertEqual(list(tokenizer.tokenize_iter(texts, batch_size=4, num_workers=2)),
+                         list(tokenizer.tokenize_iter(texts, batch_size=4)))
+
+        # The input is consumed one batch at a time
+        pulled = []
+        def stream():
+            for text in texts:
+                pulled.append(text)
+                yield text
+        batches = tokenizer.tokenize_iter(stream(), batch_size=2)
+        next(batches)
+        self.assertEqual(len(pulled), 2)
+
+        with self.assertRaises(TypeError):
+            next(tokenizer.tokenize_iter(42))
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_encode_batch(self):
+        tokenizer = BPETokenizer(self.corpus)
+        tokenizer.train(n_iter=50)
+        texts = [self.corpus[0][:100], self.corpus[1][:30], ""]
+        batch = tokenizer.encode_batch(texts)
+        expected = tokenizer.tokenize(texts, padding=True)
+
+        self.assertEqual(batch['input_ids'].dtype, np.int32)
+        self.assertEqual(batch['input_ids'].tolist(), expected)
+        self.assertEqual(batch['lengths'].tolist(), [len(ids) for ids in tokenizer.tokenize(texts)])
+        self.assertEqual(batch['attention_mask'].sum(axis=1).tolist(), batch['lengths'].tolist())
+
+    def test_add_corpus_str(self):
+        tokenizer = WordTokenizer()
+        tokenizer.add_corpus("the cat and the hat")
+        self.assertEqual(tokenizer.word_freq, {'the': 2, 'cat': 1, 'and': 1, 'hat': 1})
+        with self.assertRaises(TypeError):
+            tokenizer.add_corpus(3)
+        tokenizer.add_corpus(("a cat", "a hat"))
+        self.assertEqual(tokenizer.word_freq['a'], 2)
+        with self.assertRaises(ValueError):
+            tokenizer.add_corpus(["a"], num_workers=0)
+
+if __name__ == '__main__':
+    unittest.main()
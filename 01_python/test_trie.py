@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from YBIGTA.tokenizers import BPETokenizer, WordTokenizer
+from YBIGTA.trie import TokenTrie
+
+class TestTokenTrie(unittest.TestCase):
+
+    def setUp(self):
+        self.corpus = [
+            "The quick brown fox jumps over the lazy dog.",
+            "The lazy dog doesn't care; the fox's den is far away.",
+            "Aaaa! said the bookkeeper, as the committee's meeting went on.",
+        ]
+
+    def segment(self, trie, word):
+        tokens = []
+        trie.segment(word, tokens)
+        return tokens
+
+    def test_longest_match(self):
+        trie = TokenTrie(['a', 'abc', 'b', 'c', 'cd'])
+        self.assertEqual(len(trie), 5)
+        self.assertIn('abc', trie)
+        self.assertNotIn('ab', trie)
+        # 'ab' is not a token, but 'abc' is still found
+        self.assertEqual(self.segment(trie, 'abcd'), ['abc', 'd'])
+        self.assertEqual(self.segment(trie, 'abd'), ['a', 'b', 'd'])
+        self.assertEqual(self.segment(trie, 'xcd'), ['x', 'cd'])
+        self.assertEqual(self.segment(trie, ''), [])
+
+    def test_word_tokenizer_keeps_words(self):
+        tokenizer = WordTokenizer(self.corpus)
+        tokenizer.train()
+        self.assertEqual(tokenizer.text_to_tokens("The lazy dog went on"),
+                         ["the", "lazy", "dog", "went", "on"])
+        self.assertEqual(tokenizer.tokenize("the cat"),
+                         [[tokenizer.tokens.index("the"), -1, -1, -1]])
+        self.assertEqual(tokenizer.text_to_tokens("the lazy dog", max_length=2), ["the", "lazy"])
+
+    def test_bpe_longest_match(self):
+        tokenizer = BPETokenizer(self.corpus, longest_match=True)
+        tokenizer.train(n_iter=1000)
+        # Once every word is a single token, both segmentations agree
+        for text in self.corpus:
+            tokenizer.longest_match = False
+            merged = tokenizer.text_to_tokens(text)
+            tokenizer.longest_match = True
+            self.assertEqual(tokenizer.text_to_tokens(text), merged)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'bpe.ybtk')
+            tokenizer.save(path)
+            self.assertTrue(BPETokenizer.load(path).longest_match)
+
+    def test_rebuilt_when_vocabulary_changes(self):
+        tokenizer = WordTokenizer("the cat")
+        tokenizer.train()
+        self.assertEqual(tokenizer.text_to_tokens("cats"), ["cat", "s"])
+        tokenizer.tokens.add("cats")
+        self.assertEqual(tokenizer.text_to_tokens("cats"), ["cats"])
+
+if __name__ == '__main__':
+    unittest.main()
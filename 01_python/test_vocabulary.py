@@ -0,0 +1,38 @@
+import unittest
+from YBIGTA.vocabulary import Vocabulary
+from YBIGTA.tokenizers import BPETokenizer, WordTokenizer
+
+class TestVocabulary(unittest.TestCase):
+
+    def test_lookup(self):
+        vocab = Vocabulary(['a', 'b', 'a', 'c'])
+        self.assertEqual(len(vocab), 3)
+        self.assertEqual(vocab.index('c'), 2)
+        self.assertEqual(vocab[1], 'b')
+        self.assertEqual(vocab.get_id('z'), -1)
+        self.assertIn('a', vocab)
+        self.assertNotIn('z', vocab)
+        with self.assertRaises(ValueError):
+            vocab.index('z')
+
+    def test_add_keeps_first_id(self):
+        vocab = Vocabulary()
+        self.assertEqual(vocab.add('x'), 0)
+        self.assertEqual(vocab.add('y'), 1)
+        self.assertEqual(vocab.add('x'), 0)
+        self.assertEqual(vocab, ['x', 'y'])
+
+    def test_tokenizers_use_vocabulary(self):
+        corpus = "the cat sat on the mat"
+        for tokenizer_class in [BPETokenizer, WordTokenizer]:
+            tokenizer = tokenizer_class(corpus)
+            tokenizer.train(n_iter=10)
+            self.assertIsInstance(tokenizer.tokens, Vocabulary)
+            self.assertEqual(tokenizer.tokens[len(tokenizer.tokens)-1], '*')
+
+        tokenizer = WordTokenizer(corpus)
+        tokenizer.train()
+        self.assertEqual(tokenizer.tokens_to_tokenIDs(["the", "mat", "dog"]), [0, 4, -1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+
+from utils.grep_engine import AhoCorasickMatcher, RegexMatcher, StringSetMatcher, make_matcher, search_files
+
+
+def make_logs(directory: str, n_files: int, mb_per_file: float, seed: int = 0) -> List[str]:
+    """
+    Write synthetic log files of roughly mb_per_file megabytes each.
+    """
+    rng = random.Random(seed)
+    levels = ['DEBUG', 'INFO', 'INFO', 'INFO', 'WARN', 'ERROR']
+    words = ['request', 'user', 'cache', 'miss', 'hit', 'timeout', 'db', 'query', 'ok', 'retry']
+    paths = []
+    for k in range(n_files):
+        path = os.path.join(directory, f'app_{k}.log')
+        lines = []
+        size = 0
+        while size < mb_per_file * 1e6:
+            line = (f"2024-01-{rng.randint(1, 28):02d} {rng.choice(levels)} "
+                    f"req-{rng.randrange(16**8):08x} " + " ".join(rng.choices(words, k=8)) + "\n")
+            lines.append(line)
+            size += len(line)
+        with open(path, 'w') as f:
+            f.writelines(lines)
+        paths.append(path)
+    return paths
+
+
+def legacy_grep(paths: List[str], pattern: str) -> int:
+    """
+    The line-by-line loop GrepCommand used before the mmap engine.
+    """
+    regex = re.compile(pattern)
+    n_matches = 0
+    for path in paths:
+        with open(path, 'r') as file:
+            for line in file:
+                if regex.search(line):
+                    n_matches += 1
+    return n_matches
+
+
+def engine_grep(paths: List[str], pattern: str, num_workers: int, line_numbers: bool = False,
+                matcher=None) -> int:
+    matcher = matcher or RegexMatcher(pattern)
+    return sum(len(matches) for _, matches, _ in
+               search_files(paths, matcher, num_workers, line_numbers))
+
+
+def sample_ids(paths: List[str], n_ids: int, seed: int = 0) -> List[str]:
+    """
+    Request ids to search for, half of them taken from the logs and half random.
+    """
+    rng = random.Random(seed)
+    with open(paths[0], 'r') as f:
+        present = sorted(set(re.findall(r'req-[0-9a-f]{8}', f.read())))
+    ids = rng.sample(present, min(n_ids // 2, len(present)))
+    return ids + [f"req-{rng.randrange(16**8):08x}" for _ in range(n_ids - len(ids))]
+
+
+def measure(run) -> Dict[str, float]:
+    start = time.perf_counter()
+    n_matches = run()
+    return {'seconds': time.perf_counter() - start, 'matches': n_matches}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="compare the grep engine against the line loop")
+    parser.add_argument("-f", "--n_files", type=int, default=4)
+    parser.add_argument("-s", "--mb_per_file", type=float, default=50)
+    parser.add_argument("-p", "--patterns", nargs="+", default=["ERROR", "timeout retry", "^2024-01-0[1-3] WARN"])
+    parser.add_argument("-i", "--n_ids", type=int, nargs="+", default=[10, 100, 1000],
+                        help="numbers of request ids to search for at once")
+    parser.add_argument("-j", "--num_workers", type=int, default=os.cpu_count())
+    parser.add_argument("-o", "--output", type=str, default=None, help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        paths = make_logs(directory, args.n_files, args.mb_per_file)
+        total_mb = sum(os.path.getsize(path) for path in paths) / 1e6
+        results = {}
+        for pattern in args.patterns:
+            legacy = measure(lambda: legacy_grep(paths, pattern))
+            serial = measure(lambda: engine_grep(paths, pattern, 1, matcher=make_matcher([pattern])))
+            numbered = measure(lambda: engine_grep(paths, pattern, 1, line_numbers=True))
+            parallel = measure(lambda: engine_grep(paths, pattern, args.num_workers))
+            assert legacy['matches'] == serial['matches'] == numbered['matches'] == parallel['matches'], \
+                'grep engine changed the output'
+            results[pattern] = {'legacy': legacy, 'mmap': serial, 'mmap_n': numbered,
+                                f'mmap_{args.num_workers}_workers': parallel}
+            for result in results[pattern].values():
+                result['mb_per_s'] = total_mb / result['seconds']
+
+        # Many fixed strings at once: a flat regex alternation, the trie
+        # regex and the automaton, each including the time to build it
+        for n_ids in args.n_ids:
+            ids = sample_ids(paths, n_ids)
+            alternation = '|'.join(re.escape(request_id) for request_id in ids)
+            runs = {
+                'regex_alternation': lambda: engine_grep(paths, alternation, 1),
+                'string_set': lambda: engine_grep(paths, '', 1, matcher=StringSetMatcher(ids)),
+                'aho_corasick': lambda: engine_grep(paths, '', 1, matcher=AhoCorasickMatcher(ids)),
+            }
+            results[f'{n_ids} ids'] = {name: measure(run) for name, run in runs.items()}
+            assert len({result['matches'] for result in results[f'{n_ids} ids'].values()}) == 1, \
+                'the multi-string matchers disagree'
+            for result in results[f'{n_ids} ids'].values():
+                result['mb_per_s'] = total_mb / result['seconds']
+    finally:
+        shutil.rmtree(directory)
+
+    report = {'config': {'n_files': args.n_files, 'total_mb': total_mb, 'num_workers': args.num_workers},
+              'results': results}
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
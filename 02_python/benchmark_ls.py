@@ -0,0 +1,155 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from io import StringIO
+from typing import Dict
+from unittest import mock
+
+from commands.list_command import ListCommand
+from utils import walker
+from utils.output import OutputBuffer
+
+
+def make_directory(directory: str, n_files: int, seed: int = 0) -> None:
+    """
+    Create n_files small files with random sizes and modification times.
+    """
+    rng = random.Random(seed)
+    for k in range(n_files):
+        path = os.path.join(directory, f'file_{k:07d}.dat')
+        with open(path, 'wb') as f:
+            f.write(b'x' * rng.randrange(64))
+        mtime = rng.randrange(1_600_000_000, 1_700_000_000) * 10**9 + rng.randrange(10**9)
+        os.utime(path, ns=(mtime, mtime))
+
+
+def legacy_list_detailed(dir_path: str, sort_by_modified_time: bool) -> int:
+    """
+    The loop ListCommand._list_files_detailed used before the list engine,
+    sorting on the formatted time string.
+    """
+    files = []
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            stats = entry.stat()
+            files.append((entry.name, time.ctime(stats.st_mtime), stats.st_size))
+    if sort_by_modified_time:
+        files.sort(key=lambda x: x[1], reverse=True)
+    output = StringIO()
+    for name, last_modified, size in files:
+        print(f"{name:20} {last_modified:20} {size:10}", file=output)
+    return len(output.getvalue())
+
+
+def engine_list(dir_path: str, options) -> int:
+    command = ListCommand(options=options, args=[dir_path])
+    command.output = OutputBuffer(StringIO())
+    command.execute()
+    return len(command.output.stream.getvalue())
+
+
+def make_tree(directory: str, depth: int, fanout: int, files_per_dir: int) -> None:
+    """
+    Create a tree of directories, fanout subdirectories per level, each
+    holding files_per_dir small files.
+    """
+    for k in range(files_per_dir):
+        with open(os.path.join(directory, f'file_{k}.dat'), 'wb') as f:
+            f.write(b'x' * k)
+    if depth > 0:
+        for k in range(fanout):
+            subdir = os.path.join(directory, f'dir_{k}')
+            os.mkdir(subdir)
+            make_tree(subdir, depth - 1, fanout, files_per_dir)
+
+
+def legacy_du(root: str) -> int:
+    """
+    Total size of the files under root with os.walk, one directory at a time.
+    """
+    total = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            total += os.lstat(os.path.join(dirpath, name)).st_size
+    return total
+
+
+def walker_du(root: str, num_workers: int) -> int:
+    tree_walker = walker.TreeWalker(num_workers, follow_symlinks=False)
+    return sum(scan.size for scan in tree_walker.walk(root))
+
+
+def measure(run) -> Dict[str, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    n_chars = run()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': seconds, 'peak_mb': peak / 1e6, 'output_chars': n_chars}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="compare ls -l against the legacy listing loop")
+    parser.add_argument("-n", "--n_files", type=int, default=100000)
+    parser.add_argument("-k", "--limit", type=int, default=20)
+    parser.add_argument("-d", "--depth", type=int, default=4, help="depth of the tree for the walker")
+    parser.add_argument("-w", "--fanout", type=int, default=6, help="subdirectories per directory of the tree")
+    parser.add_argument("-j", "--num_workers", type=int, default=16)
+    parser.add_argument("-L", "--latency", type=float, default=0.001,
+                        help="seconds added to every scandir call, to mimic a network filesystem")
+    parser.add_argument("-o", "--output", type=str, default=None, help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        make_directory(directory, args.n_files)
+        # Warm the dentry and inode caches so every run stats from memory
+        legacy_list_detailed(directory, False)
+        results = {
+            'legacy -l': measure(lambda: legacy_list_detailed(directory, False)),
+            'legacy -l -t': measure(lambda: legacy_list_detailed(directory, True)),
+            'ls -l': measure(lambda: engine_list(directory, ['-l'])),
+            'ls -l -t': measure(lambda: engine_list(directory, ['-l', '-t'])),
+            f'ls -l -t --limit={args.limit}': measure(lambda: engine_list(directory, ['-l', '-t', f'--limit={args.limit}'])),
+            f'ls -l --limit={args.limit}': measure(lambda: engine_list(directory, ['-l', f'--limit={args.limit}'])),
+        }
+    finally:
+        shutil.rmtree(directory)
+
+    # Recursive totals over a tree, with scandir slowed down by the latency
+    directory = tempfile.mkdtemp()
+    scandir = os.scandir
+
+    def slow_scandir(path):
+        time.sleep(args.latency)
+        return scandir(path)
+
+    try:
+        make_tree(directory, args.depth, args.fanout, 10)
+        with mock.patch.object(os, 'scandir', slow_scandir):
+            tree_results = {
+                'os.walk': measure(lambda: legacy_du(directory)),
+                'walker_1_worker': measure(lambda: walker_du(directory, 1)),
+                f'walker_{args.num_workers}_workers': measure(lambda: walker_du(directory, args.num_workers)),
+            }
+        assert len({result['output_chars'] for result in tree_results.values()}) == 1, \
+            'the walker changed the totals'
+        results.update({f'du {name}': result for name, result in tree_results.items()})
+    finally:
+        shutil.rmtree(directory)
+
+    report = {'config': {'n_files': args.n_files, 'limit': args.limit, 'depth': args.depth,
+                         'fanout': args.fanout, 'num_workers': args.num_workers,
+                         'latency': args.latency},
+              'results': results}
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
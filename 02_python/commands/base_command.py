@@ -1,6 +1,8 @@
 # commands/base_command.py
+import functools
 import os
-from typing import List
+from typing import List, Optional
+from utils.output import OutputBuffer
 
 """
 TODO 3-1: The BaseCommand class has a show_usage method implemented, but the execute method is not 
@@ -34,9 +36,29 @@ class BaseCommand:
 
     Attributes:
         current_path (str): The current path. Usefull for commands like ls, cd, etc.
+        output (OutputBuffer): The sink commands print to. It is shared by all
+            commands and flushed when execute() returns; assign another
+            OutputBuffer to a command (or the class) to capture its output.
     """
 
     current_path = os.getcwd()
+    output = OutputBuffer()
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        """
+        Make the execute() method of every command flush the output when it
+        returns, so commands can write to self.output without flushing it.
+        """
+        super().__init_subclass__(**kwargs)
+        execute = cls.__dict__.get('execute')
+        if execute is not None:
+            @functools.wraps(execute)
+            def execute_and_flush(self, *args, **kwargs):
+                try:
+                    return execute(self, *args, **kwargs)
+                finally:
+                    self.output.flush()
+            cls.execute = execute_and_flush
 
     @classmethod
     def update_current_path(cls, new_path: str):
@@ -66,11 +88,38 @@ class BaseCommand:
         """
         Show the command usage.
         """
-        print(self.description)
-        print(self.usage)
+        self.output.write_line(self.description)
+        self.output.write_line(self.usage)
+        self.output.flush()
 
     def execute(self) -> None:
         """
         Execute the command. This method should be overridden by each subclass.
         """
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    def num_workers(self) -> Optional[int]:
+        """
+        Number of workers given with -jN, or None for the default.
+        """
+        for option in self.options:
+            if option.startswith('-j') and option[2:].isdigit() and int(option[2:]) > 0:
+                return int(option[2:])
+        return None
+
+    def human_readable_size(self, size: int, decimal_places: int = 2) -> str:
+        """
+        Converts the given size in bytes to a human-readable format.
+
+        Args:
+            size (int): The size in bytes.
+            decimal_places (int, optional): The number of decimal places to round the size. Defaults to 2.
+
+        Returns:
+            str: The human-readable size.
+        """
+        for unit in ['B', 'KB', 'MB', 'GB', 'TB', 'PB']:
+            if size < 1024.0:
+                break
+            size /= 1024.0
+        return f"{size:.{decimal_places}f} {unit}"
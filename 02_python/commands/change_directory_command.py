@@ -38,11 +38,11 @@ class ChangeDirectoryCommand(BaseCommand):
         verbose = '-v' in self.options
 
         if verbose:
-            print(f"cd: changing directory to '{self.destination_dir}'")
+            self.output.write_line(f"cd: changing directory to '{self.destination_dir}'")
 
         # Change working directory
         try:
             os.chdir(os.path.join(self.path, self.destination_dir))
             BaseCommand.update_current_path(os.getcwd())
         except FileNotFoundError as e:
-            print(f"cd: cannot change directory to '{self.destination_dir}': {e}")
+            self.output.write_line(f"cd: cannot change directory to '{self.destination_dir}': {e}")
@@ -47,26 +47,28 @@ class CopyCommand(BaseCommand):
         verbose = '-v' in self.options
 
         if verbose:
-            print(f"cp: copying '{self.source_dir}' to '{self.destination_dir}'")
+            self.output.write_line(f"cp: copying '{self.source_dir}' to '{self.destination_dir}'")
 
         # Check if source_dir is valid
         if not os.path.exists(self.source_dir):
-            print(f"[Errno 2] No such file or directory: '{self.source_dir}'")
+            self.output.write_line(f"[Errno 2] No such file or directory: '{self.source_dir}'")
             return
         if not os.path.exists(self.destination_dir):
-            print(f"[Errno 2] No such file or directory: '{self.destination_dir}'")
+            self.output.write_line(f"[Errno 2] No such file or directory: '{self.destination_dir}'")
             return
         
         # Copy file
         if self.file_exists(self.destination_dir, self.file_name):
             target_path = os.path.join(self.destination_dir, self.file_name)
             if prompt_overwrite:
+                self.output.flush()
                 overwrite = input(f"cp: overwrite '{target_path}'? (y/n) ")
                 while True:
                     if overwrite == 'y' or overwrite == 'n':
                         break
                     else:
-                        print('Enter y or n')
+                        self.output.write_line('Enter y or n')
+                        self.output.flush()
                         overwrite = input(f"cp: overwrite '{target_path}'? (y/n) ")
 
                 if overwrite == 'y':
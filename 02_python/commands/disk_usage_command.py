@@ -0,0 +1,71 @@
+from .base_command import BaseCommand
+import os
+from typing import List
+from utils.walker import TreeWalker, directory_totals
+
+class DiskUsageCommand(BaseCommand):
+    def __init__(self, options: List[str], args: List[str]) -> None:
+        """
+        Initialize the DiskUsageCommand object.
+
+        Args:
+            options (List[str]): List of command options.
+            args (List[str]): List of command arguments (the directory to summarize).
+        """
+        super().__init__(options, args)
+
+        # Override the attributes inherited from BaseCommand
+        self.description = 'Summarize the size of a directory and its subdirectories'
+        self.usage = 'Usage: du [-h] [-s] [-jN] [--stats] [path]'
+
+        # Command-specific attributes go here
+        self.name = 'du'
+        self.options = options
+        self.target_path = self.args[0] if self.args else self.current_path
+
+    def execute(self) -> None:
+        """
+        Execute the du command.
+        Prints the total size of the files under each directory, subdirectories
+        before their parent, in name order. Sizes are the sizes of the files
+        in bytes; symbolic links count as themselves and are not followed.
+        Directories are read on a thread pool.
+        Supported options:
+            -h: Display sizes in human-readable format
+            -s: Display only the total of the directory itself
+            -jN: Read directories with N threads
+            --stats: Print the number of entries read per second
+        """
+        # Check if target_path is valid
+        if not os.path.exists(self.target_path):
+            self.output.write_line(f"du: cannot access '{self.target_path}': No such file or directory")
+            return
+        if not os.path.isdir(self.target_path):
+            self.print_size(os.lstat(self.target_path).st_size, self.target_path)
+            return
+
+        summarize = '-s' in self.options
+        walker = TreeWalker(self.num_workers(), follow_symlinks=False)
+        for path, total in directory_totals(self._report_errors(walker.walk(self.target_path))):
+            if not summarize or path == self.target_path:
+                self.print_size(total, path)
+        if '--stats' in self.options:
+            self.output.write_line(f"du: {walker.format_stats()}")
+
+    def _report_errors(self, scans):
+        """
+        Pass the scans on, printing an error for each directory or entry that could not be read.
+        """
+        for scan in scans:
+            if scan.error is not None:
+                self.output.write_line(f"du: cannot read directory '{scan.path}': {scan.error}")
+            for name, error in scan.entry_errors:
+                self.output.write_line(f"du: cannot access '{os.path.join(scan.path, name)}': {error}")
+            yield scan
+
+    def print_size(self, size: int, path: str) -> None:
+        """
+        Print a size and the path it belongs to, separated by a tab.
+        """
+        size = self.human_readable_size(size) if '-h' in self.options else size
+        self.output.write_line(f"{size}\t{path}")
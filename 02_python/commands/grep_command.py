@@ -1,6 +1,7 @@
 import re
 from typing import List
 from .base_command import BaseCommand
+from utils.grep_engine import iter_files, make_matcher, search_files
 
 """
 TODO 9-1: Fix the bug of grep not printing the matched line.
@@ -21,48 +22,107 @@ class GrepCommand(BaseCommand):
 
         Args:
             options (List[str]): List of command options.
-            args (List[str]): List of command arguments (pattern and file name).
+            args (List[str]): List of command arguments (pattern, then files and directories).
+                The values of -e and -f come first, in the order of the options.
         """
         super().__init__(options, args)
 
         # Override the attributes inherited from BaseCommand
-        self.description = 'Search for a pattern in a file'
-        self.usage = 'Usage: grep [OPTION]... PATTERN FILE'
+        self.description = 'Search for a pattern in files'
+        self.usage = 'Usage: grep [OPTION]... PATTERN [FILE]...'
         
         # Command-specific attributes go here
         self.name = 'grep'
-        self.pattern = args[0] if args else ''
-        self.file = args[1] if len(args) > 1 else ''
+        # The parser separates options from their values, so -e PATTERN and
+        # -f FILE take their values from the front of args, in order
+        args = list(args)
+        self.patterns = []
+        self.pattern_files = []
+        for option in options:
+            if option.startswith('-e'):
+                value = option[2:] or (args.pop(0) if args else '')
+                self.patterns.append(value)
+            elif option.startswith('-f'):
+                value = option[2:] or (args.pop(0) if args else '')
+                self.pattern_files.append(value)
+        if not self.patterns and not self.pattern_files:
+            self.patterns.append(args.pop(0) if args else '')
+        self.pattern = self.patterns[0] if self.patterns else ''
+        self.files = args or ['']
+        self.file = self.files[0]
         self.options = options
 
     def execute(self) -> None:
         """
         Execute the grep command.
+        Each file is memory-mapped and searched as a whole with a bytes
+        regular expression; several files are searched on a worker pool,
+        and the output keeps the order of the files.
         Supported options:
             -n: Prefix each line of output with the line number within its input file.
+            -r: Search directories recursively.
+            -jN: Search files with N worker processes (default: number of CPUs).
+            -F: Interpret the patterns as fixed strings, not regular expressions.
+            -e PATTERN: Use PATTERN; may be given several times to match any of them.
+            -f FILE: Read patterns from FILE, one per line.
+        Literal strings are found with bytes.find, and many of them at once
+        with a regex compiled from a prefix trie of the strings (an
+        Aho-Corasick automaton if the trie is too deep for re to compile).
         """
         show_line_number = '-n' in self.options
+        recursive = '-r' in self.options or '-R' in self.options
 
-        # Compile the pattern
-        pattern = re.compile(self.pattern)
-
-        # Process the file
+        # Collect and compile the patterns
+        patterns = list(self.patterns)
+        for pattern_file in self.pattern_files:
+            try:
+                with open(pattern_file, 'r', encoding='utf-8') as file:
+                    patterns += file.read().splitlines()
+            except FileNotFoundError:
+                self.output.write_line(f"grep: {pattern_file}: No such file or directory")
+                return
+            except IsADirectoryError:
+                self.output.write_line(f"grep: {pattern_file}: Is a directory")
+                return
         try:
-            with open(self.file, 'r') as file:
-                for line_number, line in enumerate(file, start=1):
-                    result = pattern.search(line)
-                    if result:
-                        self.print_line(line_number, line, show_line_number)
-                    # print(result)
-                        
-        except FileNotFoundError:
-            print(f"grep: {self.file}: No such file or directory")
+            matcher = make_matcher(patterns, '-F' in self.options)
+        except re.error as e:
+            self.output.write_line(f"grep: invalid pattern '{e.pattern}': {e}")
+            return
+
+        # Process the files, printing errors in their place in the output
+        entries = list(iter_files(self.files, recursive))
+        show_file_name = recursive or len(entries) > 1
+        results = search_files([path for path, error in entries if error is None],
+                               matcher, self.num_workers(), show_line_number)
+        for path, error in entries:
+            if error is None:
+                path, matches, error = next(results)
+            if error is not None:
+                self.output.write_line(error)
+                continue
+            self.print_lines(matches, show_line_number, path if show_file_name else None)
+
+    def print_line(self, line_number, line, show_line_number, file_name=None):
+        """
+        Print the matched line with or without the line number,
+        prefixed with the file name when several files are searched.
+        """
+        prefix = f"{file_name}:" if file_name is not None else ''
+        if show_line_number:
+            self.output.write_line(f"{prefix}{line_number}:{line.strip()}")
+        else:
+            self.output.write_line(f"{prefix}{line.strip()}")
 
-    def print_line(self, line_number, line, show_line_number):
+    def print_lines(self, matches, show_line_number, file_name=None):
         """
-        Print the matched line with or without the line number.
+        Print the matched lines of a file like print_line, formatting and
+        writing them to the output in bulk.
         """
+        prefix = f"{file_name}:" if file_name is not None else ''
         if show_line_number:
-            print(f"{line_number}:{line.strip()}")
+            self.output.write_lines(f"{prefix}{line_number}:{line.decode('utf-8', 'replace').strip()}"
+                                    for line_number, line in matches)
         else:
-            print(line.strip())
+            self.output.write_lines(f"{prefix}{line.decode('utf-8', 'replace').strip()}"
+                                    for _, line in matches)
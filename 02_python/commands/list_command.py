@@ -2,7 +2,10 @@
 from .base_command import BaseCommand
 import os
 import time
-from typing import List
+from itertools import islice
+from typing import Iterator, List, Optional
+from utils.list_engine import DirectoryListing, Row, stream_rows
+from utils.walker import TreeWalker
 
 # TODO 4-1: Debug and fix the AttributeError
 # TODO 4-2: Fix the bug of ls -l -t -h now showing the file in order of modified time.
@@ -17,12 +20,22 @@ class ListCommand(BaseCommand):
 
         # Override the attributes inherited from BaseCommand
         self.description = 'List the contents of the current directory or specified path'
-        self.usage = 'Usage: ls [path]'
+        self.usage = 'Usage: ls [-l] [-h] [-t | -S] [-R] [--limit N] [path]'
 
         # Command-specific attributes go here
         self.name = 'ls'
         self.options = options
-        self.target_path = self.args[0] if self.args else self.current_path
+
+        # The parser separates --limit from its value, which then comes
+        # before the path in args; --limit=N works too
+        args = list(self.args)
+        self.limit_value = None
+        for option in options:
+            if option == '--limit':
+                self.limit_value = args.pop(0) if args else ''
+            elif option.startswith('--limit='):
+                self.limit_value = option[len('--limit='):]
+        self.target_path = args[0] if args else self.current_path
 
     def execute(self) -> None:
         """
@@ -30,72 +43,128 @@ class ListCommand(BaseCommand):
         Supported options:
             -l: Display files in long format
             -h: Display file sizes in human-readable format
-            -t: Sort files by modified time
+            -t: Sort files by modified time, newest first
+            -S: Sort files by size, largest first
+            --limit N: List only the first N files (of each directory with -R)
+            -R: List subdirectories recursively, reading them on a thread pool
+            -jN: Read directories with N threads (with -R)
+            --stats: Print the number of entries read per second (with -R)
+        Without -t or -S, entries are listed in directory order as they are read,
+        or in name order with -R.
         """
         # Check if target_path is valid
         if not os.path.exists(self.target_path):
-            print(f"[Errno 2] No such file or directory: '{self.target_path}'")
+            self.output.write_line(f"[Errno 2] No such file or directory: '{self.target_path}'")
             return
+        limit = None
+        if self.limit_value is not None:
+            if not self.limit_value.isdigit():
+                self.output.write_line(f"ls: invalid limit: '{self.limit_value}'")
+                return
+            limit = int(self.limit_value)
 
         # Handle options like -l, -a, etc.
         # List the current directory or specified path
         human_readable = '-h' in self.options
         sort_by_modified_time = '-t' in self.options
-        if '-l' in self.options:
-            self._list_files_detailed(self.target_path, human_readable, sort_by_modified_time)
+        sort_by_size = '-S' in self.options
+        if '-R' in self.options and os.path.isdir(self.target_path):
+            self._list_tree(self.target_path, '-l' in self.options, human_readable,
+                            sort_by_modified_time, sort_by_size, limit)
+        elif '-l' in self.options:
+            self._list_files_detailed(self.target_path, human_readable, sort_by_modified_time,
+                                      sort_by_size, limit)
         else:
-            self._list_files(self.target_path)
+            self._list_files(self.target_path, sort_by_modified_time, sort_by_size, limit)
 
-    def _list_files(self, dir_path: str) -> None:
+    def _list_files(self, dir_path: str, sort_by_modified_time: bool = False,
+                    sort_by_size: bool = False, limit: Optional[int] = None) -> None:
         """
         Lists the files in the specified directory.
 
         Args:
             dir_path (str): The path of the directory to list files from.
+            sort_by_modified_time (bool, optional): Whether to sort files by modified time. Defaults to False.
+            sort_by_size (bool, optional): Whether to sort files by size. Defaults to False.
+            limit (int, optional): Maximum number of files to list. Defaults to all of them.
         """
-        with os.scandir(dir_path) as it:
-            for entry in it:
-                print(entry.name)
+        rows = self._rows(dir_path, sort_by_modified_time, sort_by_size, limit, need_stat=False)
+        self.output.write_lines(name for name, _, _ in rows)
 
     def _list_files_detailed(self, dir_path: str, human_readable: bool = False,
-                             sort_by_modified_time: bool = False) -> None:
+                             sort_by_modified_time: bool = False, sort_by_size: bool = False,
+                             limit: Optional[int] = None) -> None:
         """
         Lists the files in the specified directory with detailed information.
+        Rows are formatted as they are printed, so only listed files are formatted.
 
         Args:
             dir_path (str): The path of the directory to list files from.
             human_readable (bool, optional): Whether to display file sizes in human-readable format. Defaults to False.
             sort_by_modified_time (bool, optional): Whether to sort files by modified time. Defaults to False.
+            sort_by_size (bool, optional): Whether to sort files by size. Defaults to False.
+            limit (int, optional): Maximum number of files to list. Defaults to all of them.
         """
-        files = []
-        with os.scandir(dir_path) as it:
-            for entry in it:
-                name = entry.name
-                stats = entry.stat()
-                last_modified = time.ctime(stats.st_mtime)
-                size = self.human_readable_size(stats.st_size) if human_readable else stats.st_size
-                files.append((name, last_modified, size))
-
-        if sort_by_modified_time:
-            # Sort by modified time
-            files.sort(key=lambda x: x[1], reverse=True)
+        rows = self._rows(dir_path, sort_by_modified_time, sort_by_size, limit, need_stat=True)
+        self.output.write_lines(self._format_rows(rows, human_readable))
 
-        for name, last_modified, size in files:
-            print(f"{name:20} {last_modified:20} {size:10}")
-
-    def human_readable_size(self, size: int, decimal_places: int = 2) -> str:
+    def _list_tree(self, dir_path: str, detailed: bool = False, human_readable: bool = False,
+                   sort_by_modified_time: bool = False, sort_by_size: bool = False,
+                   limit: Optional[int] = None) -> None:
         """
-        Converts the given size in bytes to a human-readable format.
+        Lists the files in the specified directory and all its subdirectories,
+        each directory under a "path:" header, in a fixed order.
 
         Args:
-            size (int): The size in bytes.
-            decimal_places (int, optional): The number of decimal places to round the size. Defaults to 2.
+            dir_path (str): The path of the directory to list files from.
+            detailed (bool, optional): Whether to display files in long format. Defaults to False.
+            human_readable (bool, optional): Whether to display file sizes in human-readable format. Defaults to False.
+            sort_by_modified_time (bool, optional): Whether to sort files by modified time. Defaults to False.
+            sort_by_size (bool, optional): Whether to sort files by size. Defaults to False.
+            limit (int, optional): Maximum number of files to list per directory. Defaults to all of them.
+        """
+        need_stat = detailed or sort_by_modified_time or sort_by_size
+        walker = TreeWalker(self.num_workers(), need_stat=need_stat)
+        for k, scan in enumerate(walker.walk(dir_path)):
+            if k > 0:
+                self.output.write_line()
+            self.output.write_line(f"{scan.path}:")
+            if scan.error is not None:
+                self.output.write_line(f"ls: cannot open directory '{scan.path}': {scan.error}")
+                continue
+            for name, error in scan.entry_errors:
+                self.output.write_line(f"ls: cannot access '{os.path.join(scan.path, name)}': {error}")
+            listing = scan.listing
+            if sort_by_modified_time or sort_by_size:
+                indices = listing.order('mtime' if sort_by_modified_time else 'size', limit)
+            else:
+                indices = range(len(listing) if limit is None else min(limit, len(listing)))
+            rows = listing.rows(indices)
+            if detailed:
+                self.output.write_lines(self._format_rows(rows, human_readable))
+            else:
+                self.output.write_lines(name for name, _, _ in rows)
+        if '--stats' in self.options:
+            self.output.write_line(f"ls: {walker.format_stats()}")
+
+    def _format_rows(self, rows: Iterator[Row], human_readable: bool) -> Iterator[str]:
+        """
+        Format entries in long format, as they are printed.
+        """
+        human_readable_size = self.human_readable_size
+        for name, mtime, size in rows:
+            yield (f"{name:20} {time.ctime(mtime // 1_000_000_000):20} "
+                   f"{human_readable_size(size) if human_readable else size:10}")
 
-        Returns:
-            str: The human-readable size.
+    def _rows(self, dir_path: str, sort_by_modified_time: bool, sort_by_size: bool,
+              limit: Optional[int], need_stat: bool) -> Iterator[Row]:
+        """
+        The entries to list, as (name, st_mtime_ns, st_size). Unsorted listings
+        stream from os.scandir; sorted ones read the whole directory into a
+        DirectoryListing first.
         """
-        for unit in ['B', 'KB', 'MB', 'GB', 'TB', 'PB']:
-            if size < 1024.0:
-                break
-            size /= 1024.0
-        return f"{size:.{decimal_places}f} {unit}"
\ No newline at end of file
+        if not sort_by_modified_time and not sort_by_size:
+            rows = stream_rows(dir_path, need_stat)
+            return rows if limit is None else islice(rows, limit)
+        listing = DirectoryListing(stream_rows(dir_path))
+        return listing.rows(listing.order('mtime' if sort_by_modified_time else 'size', limit))
@@ -0,0 +1,125 @@
+import unittest
+import errno
+import os
+import random
+import shutil
+import tempfile
+import time
+from io import StringIO
+import sys
+from unittest import mock
+from commands.disk_usage_command import DiskUsageCommand
+from utils import walker
+
+class TestDiskUsageCommand(unittest.TestCase):
+
+    def setUp(self):
+        self.held, sys.stdout = sys.stdout, StringIO()
+
+        # dir/a.txt (10), dir/sub/b.txt (20), dir/sub/deep/c.txt (30), dir/empty/
+        self.temp_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.temp_dir, "sub", "deep"))
+        os.makedirs(os.path.join(self.temp_dir, "empty"))
+        for name, size in [("a.txt", 10), ("sub/b.txt", 20), ("sub/deep/c.txt", 30)]:
+            with open(os.path.join(self.temp_dir, name), 'w') as f:
+                f.write("x" * size)
+
+    def test_du_command(self):
+        DiskUsageCommand(options=[], args=[self.temp_dir]).execute()
+        join = os.path.join
+        self.assertEqual(sys.stdout.getvalue().splitlines(), [
+            f"0\t{join(self.temp_dir, 'empty')}",
+            f"30\t{join(self.temp_dir, 'sub', 'deep')}",
+            f"50\t{join(self.temp_dir, 'sub')}",
+            f"60\t{self.temp_dir}",
+        ])
+
+    def test_du_summary(self):
+        DiskUsageCommand(options=['-s', '-h', '-j4'], args=[self.temp_dir]).execute()
+        self.assertEqual(sys.stdout.getvalue(), f"60.00 B\t{self.temp_dir}\n")
+
+    def test_du_missing_path(self):
+        DiskUsageCommand(options=[], args=["missing"]).execute()
+        self.assertEqual(sys.stdout.getvalue(), "du: cannot access 'missing': No such file or directory\n")
+
+    def mock_scandir(self, fail_reading=False, fail_stat=None):
+        # os.scandir for the root that fails after reading all its entries,
+        # or whose entry named fail_stat cannot be stat'ed
+        scandir = os.scandir
+        root = self.temp_dir
+
+        class Entry:
+            def __init__(self, entry):
+                self.entry, self.name = entry, entry.name
+
+            def is_dir(self, **kwargs):
+                return self.entry.is_dir(**kwargs)
+
+            def stat(self, **kwargs):
+                if self.name == fail_stat:
+                    raise PermissionError(errno.EACCES, "Permission denied")
+                return self.entry.stat(**kwargs)
+
+        class Scandir:
+            def __init__(self, path):
+                self.path = path
+
+            def __enter__(self):
+                with scandir(self.path) as it:
+                    self.entries = [Entry(entry) for entry in it]
+                return self
+
+            def __exit__(self, *exc):
+                pass
+
+            def __iter__(self):
+                yield from self.entries
+                if fail_reading and self.path == root:
+                    raise OSError(errno.EIO, "Input/output error")
+
+        return mock.patch.object(walker.os, 'scandir', Scandir)
+
+    def test_du_unreadable_directory(self):
+        # Entries read before the error are neither descended into nor counted
+        with self.mock_scandir(fail_reading=True):
+            DiskUsageCommand(options=['-j2'], args=[self.temp_dir]).execute()
+        self.assertEqual(sys.stdout.getvalue().splitlines(), [
+            f"du: cannot read directory '{self.temp_dir}': Input/output error",
+            f"0\t{self.temp_dir}",
+        ])
+
+    def test_du_entry_error(self):
+        with self.mock_scandir(fail_stat="a.txt"):
+            DiskUsageCommand(options=['-s'], args=[self.temp_dir]).execute()
+        self.assertEqual(sys.stdout.getvalue().splitlines(), [
+            f"du: cannot access '{os.path.join(self.temp_dir, 'a.txt')}': Permission denied",
+            f"50\t{self.temp_dir}",
+        ])
+
+    def test_walk_order_is_deterministic(self):
+        # Directories read at random speeds are still yielded depth-first in name order
+        for k in range(3):
+            os.makedirs(os.path.join(self.temp_dir, f"wide{k}", "x", "y"))
+        serial = [scan.path for scan in walker.TreeWalker(1).walk(self.temp_dir)]
+        self.assertEqual(serial[:4], [self.temp_dir, os.path.join(self.temp_dir, "empty"),
+                                      os.path.join(self.temp_dir, "sub"),
+                                      os.path.join(self.temp_dir, "sub", "deep")])
+
+        scandir = os.scandir
+        def slow_scandir(path):
+            time.sleep(random.random() * 0.002)
+            return scandir(path)
+
+        with mock.patch.object(walker.os, 'scandir', slow_scandir):
+            for max_pending in [1, 3, None]:
+                tree_walker = walker.TreeWalker(4, max_pending)
+                self.assertEqual([scan.path for scan in tree_walker.walk(self.temp_dir)], serial)
+                self.assertEqual(tree_walker.stats()['directories'], len(serial))
+                self.assertEqual(tree_walker.stats()['entries'], len(serial) - 1 + 3)
+
+    def tearDown(self):
+        sys.stdout = self.held
+        shutil.rmtree(self.temp_dir)
+
+if __name__ == '__main__':
+    unittest.main()
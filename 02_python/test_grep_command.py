@@ -3,7 +3,11 @@ import os
 import tempfile
 from io import StringIO
 import sys
+import re
+import shutil
+from unittest import mock
 from commands.grep_command import GrepCommand
+from utils import grep_engine
 
 class TestGrepCommand(unittest.TestCase):
 
@@ -35,6 +39,147 @@ class TestGrepCommand(unittest.TestCase):
         output = sys.stdout.getvalue().strip()
         self.assertIn("3:Grep test line", output)
 
+    def make_tree(self):
+        # dir/a.txt, dir/sub/b.txt, dir/c.txt
+        self.temp_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.temp_dir, "sub"))
+        for name, text in [("a.txt", "error one\nfine\n"), ("sub/b.txt", "ok\nerror two\n"),
+                           ("c.txt", "no match\n")]:
+            with open(os.path.join(self.temp_dir, name), 'w') as f:
+                f.write(text)
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+    def test_grep_multiple_files(self):
+        self.make_tree()
+        a, c = os.path.join(self.temp_dir, "a.txt"), os.path.join(self.temp_dir, "c.txt")
+        command = GrepCommand(options=['-n'], args=["error|no", a, self.temp_dir, "missing.txt", c])
+        command.execute()
+        self.assertEqual(sys.stdout.getvalue().splitlines(), [
+            f"{a}:1:error one",
+            f"grep: {self.temp_dir}: Is a directory",
+            "grep: missing.txt: No such file or directory",
+            f"{c}:1:no match",
+        ])
+
+    def test_grep_recursive(self):
+        self.make_tree()
+        command = GrepCommand(options=['-r'], args=["error", self.temp_dir])
+        command.execute()
+        self.assertEqual(sys.stdout.getvalue().splitlines(), [
+            f"{os.path.join(self.temp_dir, 'a.txt')}:error one",
+            f"{os.path.join(self.temp_dir, 'sub', 'b.txt')}:error two",
+        ])
+
+    def test_grep_worker_pool_keeps_file_order(self):
+        self.make_tree()
+        serial = GrepCommand(options=['-r', '-n', '-j1'], args=["e", self.temp_dir])
+        serial.execute()
+        expected = sys.stdout.getvalue()
+        sys.stdout = StringIO()
+        with mock.patch.object(grep_engine, 'MIN_PARALLEL_BYTES', 0):
+            GrepCommand(options=['-r', '-n', '-j2'], args=["e", self.temp_dir]).execute()
+        self.assertEqual(sys.stdout.getvalue(), expected)
+
+    def test_search_buffer_matches_line_loop(self):
+        text = b"alpha\n\nbeta gamma\n  gamma\nalpha beta\nend"
+        patterns = ["a", "^a", "a$", "^$", "gamma\\s+gamma", "a\\nb", "\\s", "^", "x", "ta g|^e",
+                    "\\Aalpha", "a\\Z", "a(?!\\n)", "(?<=\\n)b"]
+        # Blocks of a whole buffer, and blocks of one or two lines
+        for block_size in [1 << 20, 1, 12]:
+            with mock.patch.object(grep_engine, 'BLOCK_SIZE', block_size):
+                for pattern in patterns:
+                    regex = re.compile(pattern.encode())
+                    expected = [(i, line) for i, line in enumerate(text.split(b"\n"), start=1)
+                                if regex.search(line)]
+                    self.assertEqual(grep_engine.search_buffer(text, grep_engine.RegexMatcher(pattern)),
+                                     expected, pattern)
+        # A trailing newline ends the last line rather than starting an empty one
+        self.assertEqual(grep_engine.search_buffer(b"a\n\n", grep_engine.RegexMatcher("^$")), [(2, b"")])
+        self.assertEqual(grep_engine.search_buffer(b"a\n", grep_engine.RegexMatcher("$")), [(1, b"a")])
+
+    def test_non_ascii_text(self):
+        # Patterns match characters, not bytes, like a str regex over the decoded lines
+        text = "café\n한국어 문장\nnaïve\nplain ascii\nCRLF a\r\nlone\rcr a\n".encode('utf-8')
+        lines = text.decode('utf-8').replace("\r\n", "\n").replace("\r", "\n").split("\n")[:-1]
+        for pattern in ["caf.$", "^\\w", "\\w+$", "[é]", "[éï]", "na.ve", "^[^a-z ]+ ", "\\u00e9",
+                        "(?i)CAFÉ", "a$", "^cr", "é", "\\s\\w{2}$", "ascii"]:
+            regex = re.compile(pattern)
+            expected = [(i + 1, line.encode('utf-8')) for i, line in enumerate(lines) if regex.search(line)]
+            for block_size in [1, 1 << 20]:
+                with mock.patch.object(grep_engine, 'BLOCK_SIZE', block_size):
+                    self.assertEqual(grep_engine.search_buffer(text, grep_engine.make_matcher([pattern])),
+                                     expected, pattern)
+
+        with open(self.temp_file.name, 'wb') as f:
+            f.write(text)
+        GrepCommand(options=['-n'], args=["^\\w", self.temp_file.name]).execute()
+        self.assertEqual(sys.stdout.getvalue().splitlines(),
+                         ["1:café", "2:한국어 문장", "3:naïve", "4:plain ascii", "5:CRLF a", "6:lone", "7:cr a"])
+
+    def test_line_endings(self):
+        # Blocks with \r are converted one at a time; literal matchers skip
+        # blocks without a match before converting them, yet keep counting lines
+        text = b"one\r\ntwo\rthree\r\n\r\nfour x\rfive\nsix x\r\nseven\r"
+        lines = text.decode().replace("\r\n", "\n").replace("\r", "\n").split("\n")[:-1]
+        for patterns in [["x"], ["five", "seven"], ["x$"], ["^f", "^s"], ["e$"]]:
+            expected = [(i + 1, line.encode()) for i, line in enumerate(lines)
+                        if any(re.search(pattern, line) for pattern in patterns)]
+            for block_size in [1, 8, 1 << 20]:
+                with mock.patch.object(grep_engine, 'BLOCK_SIZE', block_size):
+                    self.assertEqual(grep_engine.search_buffer(text, grep_engine.make_matcher(patterns)),
+                                     expected, (patterns, block_size))
+
+    def test_grep_fixed_strings(self):
+        # -F searches for the pattern as it is, special characters included
+        with open(self.temp_file.name, 'ab') as f:
+            f.write(b"a.b (c)\naxb c\n")
+        command = GrepCommand(options=['-F', '-n'], args=["a.b (c", self.temp_file.name])
+        command.execute()
+        self.assertEqual(sys.stdout.getvalue().splitlines(), ["4:a.b (c)"])
+
+    def test_grep_multiple_patterns(self):
+        patterns_file = os.path.join(tempfile.mkdtemp(), "patterns.txt")
+        self.addCleanup(shutil.rmtree, os.path.dirname(patterns_file))
+        with open(patterns_file, 'w') as f:
+            f.write("Hello\nnot there\n")
+        command = GrepCommand(options=['-n', '-e', '-e', '-f'],
+                              args=["^Grep", "Another", patterns_file, self.temp_file.name])
+        command.execute()
+        self.assertEqual(sys.stdout.getvalue().splitlines(),
+                         ["1:Hello World", "2:Another line", "3:Grep test line"])
+
+    def test_grep_invalid_pattern(self):
+        # The pattern that fails to compile is reported, not the first one
+        for options, args in [(['-e', '-e'], ["Hello", "a(b"]), ([], ["a(b"]),
+                              (['-e', '-e'], ["(x)", "\\1"])]:
+            sys.stdout = StringIO()
+            GrepCommand(options=options, args=args + [self.temp_file.name]).execute()
+            self.assertTrue(sys.stdout.getvalue().startswith(f"grep: invalid pattern '{args[-1]}': "),
+                            sys.stdout.getvalue())
+
+    def test_matchers_agree(self):
+        text = b"req-1 ok\nreq-12 fail\n\nxreq-123\nother\nreq-2\nhers she\n"
+        for patterns in [["req-12"], ["req-1", "req-2"], ["he", "she", "his", "hers"],
+                         ["123", "req-123", "q-"], ["nothing"], ["she", ""], []]:
+            expected = [(i + 1, line) for i, line in enumerate(text.split(b"\n")[:-1])
+                        if any(pattern.encode() in line for pattern in patterns)]
+            for matcher in [grep_engine.make_matcher(patterns, fixed_strings=True),
+                            grep_engine.StringSetMatcher(patterns),
+                            grep_engine.AhoCorasickMatcher(patterns)]:
+                for block_size in [1, 1 << 20]:
+                    with mock.patch.object(grep_engine, 'BLOCK_SIZE', block_size):
+                        self.assertEqual(grep_engine.search_buffer(text, matcher), expected,
+                                         (patterns, type(matcher).__name__))
+        self.assertIsInstance(grep_engine.make_matcher(["a", "b"]), grep_engine.StringSetMatcher)
+        # re cannot compile the trie of these, so the automaton takes over
+        deep = ["a" * i + "b" for i in range(2000)]
+        matcher = grep_engine.make_matcher(deep)
+        self.assertIsInstance(matcher, grep_engine.AhoCorasickMatcher)
+        self.assertEqual(grep_engine.search_buffer(b"aab\nc\n" + b"a" * 2001 + b"\n", matcher),
+                         [(1, b"aab")])
+        self.assertIsInstance(grep_engine.make_matcher(["plain"]), grep_engine.FixedStringMatcher)
+        self.assertIsInstance(grep_engine.make_matcher(["a+"]), grep_engine.RegexMatcher)
+
     def tearDown(self):
         sys.stdout = self.held
         os.remove(self.temp_file.name)  # Remove the temporary file
@@ -1,6 +1,8 @@
 import unittest
 import os
+import shutil
 import tempfile
+import time
 from commands.list_command import ListCommand
 from io import StringIO
 import sys
@@ -34,6 +36,72 @@ class TestListCommand(unittest.TestCase):
 
         print(output)
 
+    def make_dir(self):
+        # Sizes and modification times in different orders; b.txt and d.txt
+        # were modified in the same second, 1 ns apart
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        base = 1_700_000_000 * 10**9
+        for name, size, mtime in [("a.txt", 30, base), ("b.txt", 10, base + 2 * 10**9),
+                                  ("c.txt", 20, base + 10**9), ("d.txt", 40, base + 2 * 10**9 + 1)]:
+            path = os.path.join(temp_dir, name)
+            with open(path, 'w') as f:
+                f.write("x" * size)
+            os.utime(path, ns=(mtime, mtime))
+        return temp_dir
+
+    def test_sorted_listing(self):
+        temp_dir = self.make_dir()
+        ListCommand(options=['-t'], args=[temp_dir]).execute()
+        self.assertEqual(sys.stdout.getvalue().split(), ["d.txt", "b.txt", "c.txt", "a.txt"])
+
+        sys.stdout = StringIO()
+        ListCommand(options=['-S', '--limit'], args=["2", temp_dir]).execute()
+        self.assertEqual(sys.stdout.getvalue().split(), ["d.txt", "a.txt"])
+
+        sys.stdout = StringIO()
+        ListCommand(options=['-l', '-t', '--limit=1'], args=[temp_dir]).execute()
+        ctime = time.ctime(1_700_000_002)
+        self.assertEqual(sys.stdout.getvalue(), f"{'d.txt':20} {ctime:20} {40:10}\n")
+
+    def test_unsorted_listing(self):
+        temp_dir = self.make_dir()
+        with os.scandir(temp_dir) as it:
+            entries = [(entry.name, entry.stat()) for entry in it]
+        ListCommand(options=['-l', '-h'], args=[temp_dir]).execute()
+        command = ListCommand(options=[], args=[])
+        self.assertEqual(sys.stdout.getvalue(), "".join(
+            f"{name:20} {time.ctime(stats.st_mtime):20} {command.human_readable_size(stats.st_size):10}\n"
+            for name, stats in entries))
+
+        sys.stdout = StringIO()
+        ListCommand(options=['--limit=3'], args=[temp_dir]).execute()
+        self.assertEqual(sys.stdout.getvalue().split(), [name for name, _ in entries[:3]])
+
+        sys.stdout = StringIO()
+        ListCommand(options=['--limit'], args=["many", temp_dir]).execute()
+        self.assertEqual(sys.stdout.getvalue(), "ls: invalid limit: 'many'\n")
+
+    def test_recursive_listing(self):
+        temp_dir = self.make_dir()
+        os.makedirs(os.path.join(temp_dir, "sub", "deep"))
+        with open(os.path.join(temp_dir, "sub", "e.txt"), 'w') as f:
+            f.write("e")
+        os.utime(os.path.join(temp_dir, "sub", "e.txt"), ns=(0, 0))
+        ListCommand(options=['-R', '-j2'], args=[temp_dir]).execute()
+        sub = os.path.join(temp_dir, "sub")
+        self.assertEqual(sys.stdout.getvalue(), (
+            f"{temp_dir}:\na.txt\nb.txt\nc.txt\nd.txt\nsub\n\n"
+            f"{sub}:\ndeep\ne.txt\n\n"
+            f"{os.path.join(sub, 'deep')}:\n"))
+
+        sys.stdout = StringIO()
+        ListCommand(options=['-R', '-t', '--limit=1', '--stats'], args=[temp_dir]).execute()
+        lines = sys.stdout.getvalue().splitlines()
+        self.assertEqual(lines[:-1], [f"{temp_dir}:", "sub", "", f"{sub}:", "deep", "",
+                                      f"{os.path.join(sub, 'deep')}:"])
+        self.assertRegex(lines[-1], r"^ls: 7 entries in 3 directories, .* entries/s\)$")
+
     def tearDown(self):
         # Restore the output buffer
         sys.stdout = self.held
@@ -0,0 +1,81 @@
+import unittest
+import os
+import tempfile
+import shutil
+import sys
+from io import StringIO
+from commands.base_command import BaseCommand
+from commands.grep_command import GrepCommand
+from commands.list_command import ListCommand
+from utils.output import OutputBuffer
+
+class TestOutputBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.held, sys.stdout = sys.stdout, StringIO()
+
+    def test_flushes_when_full(self):
+        stream = StringIO()
+        output = OutputBuffer(stream, buffer_size=8)
+        output.write_line("abc")
+        self.assertEqual(stream.getvalue(), "")
+        output.write_lines(["defg", "h"])
+        self.assertEqual(stream.getvalue(), "abc\ndefg\nh\n")
+        output.write_lines([])
+        output.write_line()
+        output.flush()
+        self.assertEqual(stream.getvalue(), "abc\ndefg\nh\n\n")
+
+    def test_writes_to_current_stdout(self):
+        output = OutputBuffer()
+        output.write_line("first")
+        output.flush()
+        first, sys.stdout = sys.stdout, StringIO()
+        output.write_line("second")
+        output.flush()
+        self.assertEqual(first.getvalue(), "first\n")
+        self.assertEqual(sys.stdout.getvalue(), "second\n")
+
+    def test_capture(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        with open(os.path.join(temp_dir, "a.txt"), 'w') as f:
+            f.write("x\n")
+        command = ListCommand(options=[], args=[temp_dir])
+        command.output = OutputBuffer(StringIO())
+        command.execute()
+        self.assertEqual(command.output.stream.getvalue(), "a.txt\n")
+        self.assertEqual(sys.stdout.getvalue(), "")
+
+    def test_flushes_when_execute_fails(self):
+        class FailingCommand(BaseCommand):
+            def execute(self):
+                self.output.write_line("before")
+                raise RuntimeError("failed")
+
+        with self.assertRaises(RuntimeError):
+            FailingCommand([], []).execute()
+        self.assertEqual(sys.stdout.getvalue(), "before\n")
+
+    def test_output_unchanged(self):
+        # The same text as printing every line, across buffer flushes
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        path = os.path.join(temp_dir, "log.txt")
+        lines = [f"  line {i} café " + ("match" if i % 3 else "") for i in range(3000)]
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        expected = "".join(f"{path}:{i + 1}:{line.strip()}\n"
+                           for i, line in enumerate(lines) if "match" in line)
+
+        command = GrepCommand(options=['-n'], args=["match", path, temp_dir])
+        command.output = OutputBuffer(StringIO(), buffer_size=100)
+        command.execute()
+        self.assertEqual(command.output.stream.getvalue(),
+                         expected + f"grep: {temp_dir}: Is a directory\n")
+
+    def tearDown(self):
+        sys.stdout = self.held
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,7 @@ from commands.copy_command import CopyCommand
 from commands.change_directory_command import ChangeDirectoryCommand
 from commands.print_working_directory_command import PrintWorkingDirectoryCommand
 from commands.grep_command import GrepCommand
+from commands.disk_usage_command import DiskUsageCommand
 from utils.command_parser import CommandParser
 
 class CommandHandler:
@@ -28,7 +29,8 @@ class CommandHandler:
             'cp': CopyCommand,
             'cd': ChangeDirectoryCommand,
             'pwd': PrintWorkingDirectoryCommand,
-            'grep': GrepCommand
+            'grep': GrepCommand,
+            'du': DiskUsageCommand
         }
 
     def execute(self, command: str) -> None:
@@ -0,0 +1,489 @@
+# utils/grep_engine.py
+import mmap
+import os
+import re
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Files smaller than this in total are searched in-process; starting a
+# worker pool costs more than it saves
+MIN_PARALLEL_BYTES = 1 << 23
+
+# Buffers are searched in blocks of about this many bytes, cut at line ends
+BLOCK_SIZE = 1 << 20
+
+# Constructs that behave differently at the start or end of a line than
+# inside a block of lines, and a leading ^, which re cannot scan a block
+# for quickly; patterns using them skip the block-level search
+LINE_ANCHORED = re.compile(r'^\^|\\[AZz]|\(\?<?[=!]')
+
+# Escapes, ., [ and inline flags, to tell whether a regex can match bytes
+BYTE_UNSAFE = re.compile(r'\\.|\(\?[aiLmsux-]|[.\[]')
+
+# Characters that make a pattern more than a literal string
+REGEX_SPECIAL = re.compile(r'[.^$*+?{}\[\]\\|()]')
+
+# Trie key marking that a string ends at a node; edges are bytes 0-255
+END = -1
+
+Match = Tuple[Optional[int], bytes]
+
+
+class RegexMatcher:
+    """
+    Matches a regular expression against blocks of lines at once.
+
+    The pattern is compiled twice, once with re.MULTILINE for blocks, so ^
+    and $ match at line boundaries inside a block, and once without for
+    single lines, where re can anchor ^ at the start.
+
+    Matching bytes is faster than decoding the text first, but only gives
+    the same result as a str regex when the text is ASCII or the pattern is
+    byte_safe. Otherwise, a block that is not ASCII is decoded and matched
+    with str regexes, so . and \\w match a whole character, é in a class is
+    one character, and so on.
+    """
+
+    # $, ^ and lookarounds see a \r, so blocks with one are converted to
+    # universal newlines before they are searched
+    cr_safe = False
+
+    def __init__(self, pattern: str) -> None:
+        self.text_regex = re.compile(pattern, re.MULTILINE)
+        self.match_text_line = re.compile(pattern).search
+        try:
+            self.regex = re.compile(pattern.encode('ascii'), re.MULTILINE)
+            # Truthy for a line (without its newline) that matches
+            self.match_line = re.compile(pattern.encode('ascii')).search
+            self.byte_safe = is_byte_safe(pattern)
+        except (UnicodeEncodeError, re.error):
+            # Not ASCII, or an escape such as \\u00e9 that only str regexes
+            # have; every block is decoded
+            self.regex = self.match_line = None
+            self.byte_safe = False
+        self.block_search = LINE_ANCHORED.search(pattern) is None
+
+    def find(self, block: bytes) -> int:
+        """
+        Find where the first matching line of a block of lines can start.
+        May point at a line that does not match, but never past one that does.
+
+        Returns:
+            int: Offset in block of the first possible match, or -1 if no
+            line of the block matches.
+        """
+        if not self.block_search:
+            return 0
+        match = self.regex.search(block)
+        return match.start() if match else -1
+
+    def find_text(self, block: str) -> int:
+        """
+        Like find, for a decoded block.
+        """
+        if not self.block_search:
+            return 0
+        match = self.text_regex.search(block)
+        return match.start() if match else -1
+
+
+def is_byte_safe(pattern: str) -> bool:
+    """
+    Whether a pattern matches UTF-8 text encoded as bytes exactly where it
+    matches the decoded text. ASCII literals, anchors, groups, alternations
+    and repetitions do, since the bytes of a multi-byte character are never
+    ASCII; ., classes, letter escapes such as \\w, \\s or \\xe9, and inline
+    flags such as (?i) do not.
+    """
+    if not pattern.isascii():
+        return False
+    for token in BYTE_UNSAFE.findall(pattern):
+        if token in '.[' or token.startswith('(?') or token[1].isalnum():
+            return False
+    return True
+
+
+class FixedStringMatcher:
+    """
+    Matches a literal string, scanning blocks with bytes.find.
+    """
+
+    # UTF-8 strings match the encoded text exactly where they match the text
+    byte_safe = True
+    # Line endings do not change where a literal string is found, so
+    # blocks with \r are only converted to universal newlines on a match
+    cr_safe = True
+
+    def __init__(self, pattern: str) -> None:
+        self.pattern = pattern.encode('utf-8')
+        # re searches a pattern without special characters as a plain string
+        self.match_line = re.compile(re.escape(self.pattern)).search
+
+    def find(self, block: bytes) -> int:
+        """
+        Find the first occurrence of the string in a block of lines.
+
+        Returns:
+            int: Offset in block of the first match, or -1 if there is none.
+        """
+        return block.find(self.pattern)
+
+
+class StringSetMatcher:
+    """
+    Matches any of a set of literal strings. The strings are put in a
+    prefix trie, which is written out as a single regex with an alternation
+    at every branch, e.g. req-1(?:2|3) for req-12 and req-13. re then walks
+    the trie in C, so the work at each position of a block is bounded by the
+    length of the strings rather than by their number.
+    """
+
+    # UTF-8 strings match the encoded text exactly where they match the text
+    byte_safe = True
+    # Line endings do not change where a literal string is found, so
+    # blocks with \r are only converted to universal newlines on a match
+    cr_safe = True
+
+    def __init__(self, patterns: List[str]) -> None:
+        trie: Dict[int, dict] = {}
+        for pattern in patterns:
+            node = trie
+            for byte in pattern.encode('utf-8'):
+                node = node.setdefault(byte, {})
+            node[END] = {}
+        # Without strings, no line matches
+        self.regex = re.compile(_trie_regex(trie) if patterns else b'(?!)')
+        self.match_line = self.regex.search
+
+    def find(self, block: bytes) -> int:
+        """
+        Find the first occurrence of any of the strings in a block of lines.
+
+        Returns:
+            int: Offset in block of the first match, or -1 if there is none.
+        """
+        match = self.regex.search(block)
+        return match.start() if match else -1
+
+
+def _trie_regex(node: Dict[int, dict]) -> bytes:
+    """
+    Write out the trie below a node as a regex matching any of its strings.
+    """
+    branches = []
+    for byte, child in sorted(item for item in node.items() if item[0] != END):
+        literal = bytearray([byte])
+        # Follow the chain of nodes with one child and no string ending there
+        while len(child) == 1 and END not in child:
+            (byte, child), = child.items()
+            literal.append(byte)
+        branches.append(re.escape(bytes(literal)) + _trie_regex(child))
+    if not branches:
+        return b''
+    if len(branches) == 1 and END not in node:
+        return branches[0]
+    regex = b'(?:' + b'|'.join(branches) + b')'
+    # A string ending here makes the rest optional
+    return regex + b'?' if END in node else regex
+
+
+class AhoCorasickMatcher:
+    """
+    Matches any of a set of literal strings with an Aho-Corasick automaton,
+    so a block is scanned once whatever the number of strings. The scan runs
+    in Python, so it is slower than StringSetMatcher, but it has no limit on
+    the depth of the trie, where re fails to compile deeply nested patterns.
+
+    The automaton is a trie of the strings, with states numbered in
+    insertion order: goto[state] maps a byte to the next state, fail[state]
+    is the state of the longest proper suffix of the state's string that is
+    also in the trie, and out[state] tells whether a string ends at the
+    state or at one of its suffixes. While in the root state, the scan
+    jumps ahead with a regex to the next byte that starts a string.
+    """
+
+    # UTF-8 strings match the encoded text exactly where they match the text
+    byte_safe = True
+    # Line endings do not change where a literal string is found, so
+    # blocks with \r are only converted to universal newlines on a match
+    cr_safe = True
+
+    def __init__(self, patterns: List[str]) -> None:
+        self.goto: List[Dict[int, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[bool] = [False]
+        for pattern in patterns:
+            state = 0
+            for byte in pattern.encode('utf-8'):
+                next_state = self.goto[state].get(byte)
+                if next_state is None:
+                    next_state = self.goto[state][byte] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(False)
+                state = next_state
+            self.out[state] = True
+
+        # Breadth-first, so the failure state of a state's parent is known
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for byte, next_state in self.goto[state].items():
+                fail = self.fail[state]
+                while fail and byte not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[next_state] = self.goto[fail].get(byte, 0)
+                self.out[next_state] = self.out[next_state] or self.out[self.fail[next_state]]
+                queue.append(next_state)
+
+        first_bytes = b''.join(re.escape(bytes([byte])) for byte in sorted(self.goto[0]))
+        self.skip = re.compile(b'[' + first_bytes + b']').search if first_bytes else None
+
+    def find(self, block: bytes) -> int:
+        """
+        Find the first occurrence of any of the strings in a block of lines.
+
+        Returns:
+            int: Offset in block of the last byte of the first match, or -1
+            if there is none.
+        """
+        if self.out[0]:
+            # The empty string matches every line
+            return 0
+        if self.skip is None:
+            return -1
+        goto, fail, out, skip = self.goto, self.fail, self.out, self.skip
+        state = 0
+        i = 0
+        size = len(block)
+        while i < size:
+            if not state:
+                match = skip(block, i)
+                if match is None:
+                    return -1
+                i = match.start()
+            byte = block[i]
+            while state and byte not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(byte, 0)
+            if out[state]:
+                return i
+            i += 1
+        return -1
+
+    def match_line(self, line: bytes) -> bool:
+        """
+        Whether a line (without its newline) contains any of the strings.
+        """
+        return self.find(line) != -1
+
+
+def make_matcher(patterns: List[str], fixed_strings: bool = False):
+    """
+    Choose the matcher for the patterns given to grep. Patterns without
+    special characters are literal strings whether or not fixed_strings
+    is set, and get the same fast paths: bytes.find for one string, and a
+    trie of the strings for several.
+
+    Args:
+        patterns (List[str]): The patterns; a line matches if any of them does.
+        fixed_strings (bool, optional): Whether the patterns are literal strings.
+
+    Returns:
+        A matcher for search_buffer.
+
+    Raises:
+        re.error: If a pattern is not a valid regular expression. Its
+            pattern attribute is the pattern that failed, not the combined one.
+    """
+    if not fixed_strings and not any(REGEX_SPECIAL.search(pattern) for pattern in patterns):
+        fixed_strings = True
+    if fixed_strings:
+        if len(patterns) == 1:
+            return FixedStringMatcher(patterns[0])
+        try:
+            return StringSetMatcher(patterns)
+        except RecursionError:
+            return AhoCorasickMatcher(patterns)
+    if len(patterns) == 1:
+        return RegexMatcher(patterns[0])
+    # Each pattern has to be valid on its own, e.g. a backreference cannot
+    # refer to a group of another pattern
+    for pattern in patterns:
+        re.compile(pattern)
+    return RegexMatcher('|'.join(f'(?:{pattern})' for pattern in patterns))
+
+
+def search_buffer(buf, matcher, line_numbers: bool = True) -> List[Match]:
+    """
+    Find the lines of buf that match, as when the file is read as UTF-8
+    text with universal newlines. The buffer is scanned a block of
+    lines at a time, and only blocks the matcher finds a match in are
+    split into lines and checked line by line. When a block has matching
+    lines, the next one is likely to have some too, so it goes straight
+    to the line-by-line check.
+
+    Args:
+        buf (bytes, mmap): The buffer to search.
+        matcher: A matcher from make_matcher. It has find(block), returning
+            the offset of the first possible match or -1, and match_line(line),
+            truthy for a matching line. Unless byte_safe is set, they are only
+            used on ASCII blocks, and find_text and match_text_line on the
+            others, decoded. If cr_safe is set, find is also used on blocks
+            before their line endings are converted.
+        line_numbers (bool, optional): Whether to number the lines. Without
+            numbers, lines are filtered without a Python-level loop.
+
+    Returns:
+        List[Tuple[Optional[int], bytes]]: The line number (None if not
+        requested) and content (without the newline) of each matching
+        line, in order.
+    """
+    matches = []
+    size = len(buf)
+    pos = 0
+    line_number = 1
+    dense = False
+    while pos < size:
+        # Cut the block after the first newline past BLOCK_SIZE
+        newline = buf.find(b'\n', min(pos + BLOCK_SIZE, size) - 1)
+        end = size if newline == -1 else newline + 1
+        block = buf[pos:end]
+        pos = end
+
+        # Lines end at \n, \r\n or \r, as when the file is read as text.
+        # Only blocks with a \r are converted, and with a matcher that is
+        # cr_safe only those it finds a match in.
+        if b'\r' in block:
+            if matcher.cr_safe and not dense and matcher.find(block) == -1:
+                line_number += block.count(b'\n') + block.count(b'\r') - block.count(b'\r\n')
+                continue
+            block = block.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+
+        if matcher.byte_safe or (matcher.match_line is not None and block.isascii()):
+            newline, find, match_line = b'\n', matcher.find, matcher.match_line
+        else:
+            # Blocks are cut at newlines, so no character is split
+            block = block.decode('utf-8', 'replace')
+            newline, find, match_line = '\n', matcher.find_text, matcher.match_text_line
+
+        first = 0 if dense else find(block)
+        if first == -1:
+            line_number += block.count(newline)
+            continue
+
+        # Lines before the first possible match cannot match
+        skip = block.rfind(newline, 0, first) + 1
+        line_number += block.count(newline, 0, skip)
+        lines = block[skip:].split(newline)
+        if block.endswith(newline):
+            lines.pop()
+        n_matches = len(matches)
+        if line_numbers:
+            matches += [(line_number + i, line) for i, line in enumerate(lines) if match_line(line)]
+        else:
+            matches += [(None, line) for line in filter(match_line, lines)]
+        if newline == '\n':
+            matches[n_matches:] = [(i, line.encode('utf-8')) for i, line in matches[n_matches:]]
+        dense = len(matches) > n_matches
+        line_number += len(lines)
+    return matches
+
+
+def search_file(path: str, matcher, line_numbers: bool = True) -> Tuple[str, List[Match], Optional[str]]:
+    """
+    Memory-map a file and search it.
+
+    Args:
+        path (str): The file to search.
+        matcher: A matcher such as RegexMatcher.
+        line_numbers (bool, optional): Whether to number the lines.
+
+    Returns:
+        Tuple[str, List[Tuple[Optional[int], bytes]], Optional[str]]: The path, the
+        matching lines, and an error message if the file could not be read.
+    """
+    try:
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return path, [], None
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                return path, search_buffer(buf, matcher, line_numbers), None
+    except FileNotFoundError:
+        return path, [], f"grep: {path}: No such file or directory"
+    except IsADirectoryError:
+        return path, [], f"grep: {path}: Is a directory"
+    except PermissionError:
+        return path, [], f"grep: {path}: Permission denied"
+
+
+def iter_files(paths: List[str], recursive: bool) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    Expand the paths given to grep into the files to search.
+
+    Args:
+        paths (List[str]): Files and directories.
+        recursive (bool): Whether to search directories recursively.
+
+    Yields:
+        Tuple[str, Optional[str]]: A file to search, or a path and the
+        error message to print instead. Directories are walked in sorted
+        order, so the output order does not depend on the filesystem.
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path, None
+        elif not recursive:
+            yield path, f"grep: {path}: Is a directory"
+        else:
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    yield os.path.join(root, name), None
+
+
+_worker_matcher = None
+_worker_line_numbers = True
+
+
+def _init_worker(matcher, line_numbers: bool) -> None:
+    global _worker_matcher, _worker_line_numbers
+    _worker_matcher = matcher
+    _worker_line_numbers = line_numbers
+
+
+def _search_in_worker(path: str) -> Tuple[str, List[Match], Optional[str]]:
+    return search_file(path, _worker_matcher, _worker_line_numbers)
+
+
+def search_files(paths: List[str], matcher, num_workers: Optional[int] = None,
+                 line_numbers: bool = True) -> Iterator[Tuple[str, List[Match], Optional[str]]]:
+    """
+    Search files, spreading them over a process pool when there is enough
+    data to make it worthwhile.
+
+    Args:
+        paths (List[str]): The files to search.
+        matcher: A picklable matcher such as RegexMatcher.
+        num_workers (int, optional): Number of worker processes. Defaults
+            to the number of CPUs.
+        line_numbers (bool, optional): Whether to number the lines.
+
+    Yields:
+        Tuple[str, List[Tuple[Optional[int], bytes]], Optional[str]]: The results of
+        search_file for each file, in the order of paths.
+    """
+    num_workers = min(num_workers or os.cpu_count() or 1, len(paths))
+    total_bytes = 0
+    for path in paths:
+        try:
+            total_bytes += os.path.getsize(path)
+        except OSError:
+            pass
+
+    if num_workers <= 1 or total_bytes < MIN_PARALLEL_BYTES:
+        for path in paths:
+            yield search_file(path, matcher, line_numbers)
+        return
+
+    with Pool(num_workers, initializer=_init_worker, initargs=(matcher, line_numbers)) as pool:
+        yield from pool.imap(_search_in_worker, paths)
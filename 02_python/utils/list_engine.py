@@ -0,0 +1,93 @@
+# utils/list_engine.py
+import heapq
+import os
+from array import array
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# An entry to list: name, modification time in nanoseconds and size in bytes
+Row = Tuple[str, int, int]
+
+
+def entry_stat(entry: os.DirEntry) -> os.stat_result:
+    """
+    Stat a directory entry, falling back to the link itself for a symbolic
+    link whose target does not exist.
+    """
+    try:
+        return entry.stat()
+    except FileNotFoundError:
+        return entry.stat(follow_symlinks=False)
+
+
+def stream_rows(dir_path: str, need_stat: bool = True) -> Iterator[Row]:
+    """
+    List a directory in the order os.scandir returns its entries, without
+    holding on to them.
+
+    Args:
+        dir_path (str): The directory to list.
+        need_stat (bool, optional): Whether to stat the entries. Without it,
+            modification times and sizes are 0 and only names are read.
+
+    Yields:
+        Tuple[str, int, int]: The name, st_mtime_ns and st_size of each entry.
+    """
+    with os.scandir(dir_path) as it:
+        if not need_stat:
+            for entry in it:
+                yield entry.name, 0, 0
+            return
+        for entry in it:
+            stats = entry_stat(entry)
+            yield entry.name, stats.st_mtime_ns, stats.st_size
+
+
+class DirectoryListing:
+    """
+    The entries of a directory, for sorting. Names are kept in a list and
+    modification times and sizes in int64 arrays, in the order given, so a
+    large directory costs one string and 16 bytes per entry rather than a
+    tuple of objects, and sorts compare plain integers.
+
+    Args:
+        rows (Iterable[Tuple[str, int, int]]): The entries, e.g. stream_rows(dir_path).
+    """
+
+    def __init__(self, rows: Iterable[Row]) -> None:
+        self.names: List[str] = []
+        self.mtimes = array('q')
+        self.sizes = array('q')
+        for name, mtime, size in rows:
+            self.names.append(name)
+            self.mtimes.append(mtime)
+            self.sizes.append(size)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def order(self, key: str, limit: Optional[int] = None) -> List[int]:
+        """
+        Sort the entries, largest first. Entries with equal keys keep their
+        order in the listing.
+
+        Args:
+            key (str): 'mtime' or 'size'.
+            limit (int, optional): Only return the first limit entries, found
+                with a heap instead of sorting all of them.
+
+        Returns:
+            List[int]: Indices of the entries, in sorted order.
+        """
+        values = {'mtime': self.mtimes, 'size': self.sizes}[key]
+        if limit is not None and limit < len(values):
+            return heapq.nlargest(limit, range(len(values)), key=values.__getitem__)
+        return sorted(range(len(values)), key=values.__getitem__, reverse=True)
+
+    def rows(self, indices: List[int]) -> Iterator[Row]:
+        """
+        Yields:
+            Tuple[str, int, int]: The name, st_mtime_ns and st_size of the
+            entries at indices, in that order.
+        """
+        for i in indices:
+            yield self.names[i], self.mtimes[i], self.sizes[i]
@@ -0,0 +1,79 @@
+# utils/output.py
+import sys
+from itertools import islice
+from typing import Iterable, List, Optional, TextIO
+
+# Characters collected before the buffer is written out
+BUFFER_SIZE = 1 << 18
+
+# Lines joined into one string at a time by write_lines
+LINES_PER_CHUNK = 1024
+
+
+class OutputBuffer:
+    """
+    Collects the lines a command prints and writes them to a stream in
+    large chunks, instead of one write per print() call. The text written
+    is the same as with print(), only batched.
+
+    Args:
+        stream (TextIO, optional): Where to write. Defaults to whatever
+            sys.stdout is when the buffer is flushed, so output redirected
+            by swapping sys.stdout still ends up in the right place.
+        buffer_size (int, optional): Number of characters collected before
+            the buffer is flushed.
+
+    Example:
+        Capture the output of a command in memory:
+
+        >>> command.output = OutputBuffer(StringIO())
+        >>> command.execute()
+        >>> command.output.stream.getvalue()
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None, buffer_size: int = BUFFER_SIZE) -> None:
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.parts: List[str] = []
+        self.size = 0
+
+    def write(self, text: str) -> None:
+        """
+        Add text to the buffer, flushing it if it is full.
+        """
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def write_line(self, line: str = '') -> None:
+        """
+        Add a line, like print(line).
+        """
+        self.write(line + '\n')
+
+    def write_lines(self, lines: Iterable[str]) -> None:
+        """
+        Add several lines, like print(line) for each of them.
+        """
+        lines = iter(lines)
+        while True:
+            chunk = list(islice(lines, LINES_PER_CHUNK))
+            if not chunk:
+                return
+            # The empty string adds the newline after the last line
+            chunk.append('')
+            self.write('\n'.join(chunk))
+
+    def flush(self) -> None:
+        """
+        Write the buffered text out.
+        """
+        if not self.parts:
+            return
+        stream = self.stream if self.stream is not None else sys.stdout
+        text = ''.join(self.parts)
+        self.parts = []
+        self.size = 0
+        stream.write(text)
+        stream.flush()
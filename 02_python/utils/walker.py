@@ -0,0 +1,232 @@
+# utils/walker.py
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from utils.list_engine import DirectoryListing, entry_stat
+
+
+class DirectoryScan:
+    """
+    One directory read by TreeWalker.
+
+    Attributes:
+        path (str): The directory.
+        depth (int): 0 for the root of the walk, 1 for its subdirectories, etc.
+        listing (DirectoryListing): All entries, sorted by name.
+        subdirs (List[str]): Names of the subdirectories, sorted. Symbolic
+            links to directories are listed but not followed.
+        size (int): Total size of the entries that are not directories.
+        error (str, optional): Why the directory could not be read. The
+            scan is then empty, even if some entries were read before the error.
+        entry_errors (List[Tuple[str, str]]): Names of the entries that could
+            not be stat'ed, and why. They are left out of the scan.
+    """
+
+    def __init__(self, path: str, depth: int) -> None:
+        self.path = path
+        self.depth = depth
+        self.listing = DirectoryListing([])
+        self.subdirs: List[str] = []
+        self.size = 0
+        self.error: Optional[str] = None
+        self.entry_errors: List[Tuple[str, str]] = []
+
+
+def scan_directory(path: str, depth: int = 0, need_stat: bool = True,
+                   follow_symlinks: bool = True) -> DirectoryScan:
+    """
+    Read one directory.
+
+    Args:
+        path (str): The directory to read.
+        depth (int, optional): Depth of the directory in the walk.
+        need_stat (bool, optional): Whether to stat the entries. Without it,
+            modification times and sizes are 0 and only names are read.
+        follow_symlinks (bool, optional): Whether a symbolic link gets the
+            size and time of its target (as ls does) or its own (as du does).
+
+    Returns:
+        DirectoryScan: The entries of the directory, or the error reading it.
+    """
+    scan = DirectoryScan(path, depth)
+    rows = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    if need_stat:
+                        stats = entry_stat(entry) if follow_symlinks else entry.stat(follow_symlinks=False)
+                except OSError as e:
+                    scan.entry_errors.append((entry.name, e.strerror))
+                    continue
+                if is_dir:
+                    scan.subdirs.append(entry.name)
+                if not need_stat:
+                    rows.append((entry.name, 0, 0))
+                    continue
+                rows.append((entry.name, stats.st_mtime_ns, stats.st_size))
+                if not is_dir:
+                    scan.size += stats.st_size
+    except OSError as e:
+        # Do not descend into or count a directory that was only partly read
+        scan.error = e.strerror
+        scan.subdirs = []
+        scan.size = 0
+        scan.entry_errors = []
+        rows = []
+    rows.sort()
+    scan.subdirs.sort()
+    scan.listing = DirectoryListing(rows)
+    return scan
+
+
+class TreeWalker:
+    """
+    Walks a directory tree, reading directories concurrently on a thread
+    pool. Reading a directory is mostly waiting for scandir and stat calls,
+    so threads overlap that latency, which dominates on network filesystems.
+
+    Directories are yielded in a fixed order whatever the scheduling:
+    depth-first, each directory before its subdirectories, which are taken
+    in name order. Scans are started ahead of time for the directories next
+    in that order, but at most max_pending of them are started or waiting
+    to be yielded at once, which bounds memory on very wide trees.
+
+    Args:
+        num_workers (int, optional): Number of threads reading directories.
+            Defaults to 4 per CPU, at most 32. With 1, directories are read
+            in the calling thread.
+        max_pending (int, optional): Directories read ahead at most. Defaults
+            to 4 per worker.
+        need_stat (bool, optional): Whether to stat the entries.
+        follow_symlinks (bool, optional): Whether symbolic links get the
+            size and time of their target.
+    """
+
+    def __init__(self, num_workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 need_stat: bool = True, follow_symlinks: bool = True) -> None:
+        self.num_workers = num_workers or min(32, 4 * (os.cpu_count() or 1))
+        self.max_pending = max(1, max_pending or 4 * self.num_workers)
+        self.need_stat = need_stat
+        self.follow_symlinks = follow_symlinks
+        self.n_directories = 0
+        self.n_entries = 0
+        self.seconds = 0.0
+
+    def walk(self, root: str) -> Iterator[DirectoryScan]:
+        """
+        Walk the tree under root.
+
+        Args:
+            root (str): The directory to start from.
+
+        Yields:
+            DirectoryScan: Each directory of the tree, root first.
+        """
+        start = time.perf_counter()
+        # Directories still to yield, the next one last, with their depths
+        stack: List[Tuple[str, int]] = [(root, 0)]
+        pending: Dict[str, Future] = {}
+        pool = ThreadPoolExecutor(self.num_workers) if self.num_workers > 1 else None
+        try:
+            while stack:
+                path, depth = stack[-1]
+                if pool is not None:
+                    # Wait for the next directory, reading ahead whenever
+                    # another one is read and its subdirectories are known
+                    self._read_ahead(stack, pending, pool)
+                    while path in pending and not pending[path].done():
+                        wait([future for future in pending.values() if not future.done()],
+                             return_when=FIRST_COMPLETED)
+                        self._read_ahead(stack, pending, pool)
+                stack.pop()
+                future = pending.pop(path, None)
+                if future is not None:
+                    scan = future.result()
+                else:
+                    scan = scan_directory(path, depth, self.need_stat, self.follow_symlinks)
+                stack.extend((os.path.join(path, name), depth + 1) for name in reversed(scan.subdirs))
+
+                self.n_directories += 1
+                self.n_entries += len(scan.listing)
+                self.seconds = time.perf_counter() - start
+                yield scan
+        finally:
+            for future in pending.values():
+                future.cancel()
+            if pool is not None:
+                pool.shutdown()
+            self.seconds = time.perf_counter() - start
+
+    def _read_ahead(self, stack: List[Tuple[str, int]], pending: Dict[str, Future],
+                    pool: ThreadPoolExecutor) -> None:
+        """
+        Start reading the next directories to yield, up to max_pending read
+        or being read. Subdirectories of directories already read count,
+        so reading spreads over the tree rather than one directory at a time.
+        """
+        # The next directories in walk order, the next one last
+        upcoming = stack[-self.max_pending:]
+        n_seen = 0
+        while upcoming and n_seen < self.max_pending and len(pending) < self.max_pending:
+            path, depth = upcoming.pop()
+            n_seen += 1
+            future = pending.get(path)
+            if future is None:
+                pending[path] = pool.submit(scan_directory, path, depth,
+                                            self.need_stat, self.follow_symlinks)
+            elif future.done():
+                subdirs = future.result().subdirs[:self.max_pending]
+                upcoming.extend((os.path.join(path, name), depth + 1) for name in reversed(subdirs))
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns:
+            Dict[str, float]: Directories and entries read so far, the time
+            spent walking, and entries read per second.
+        """
+        return {
+            'directories': self.n_directories,
+            'entries': self.n_entries,
+            'seconds': self.seconds,
+            'entries_per_s': self.n_entries / self.seconds if self.seconds > 0 else 0.0,
+        }
+
+    def format_stats(self) -> str:
+        """
+        The stats as one line of text.
+        """
+        stats = self.stats()
+        return (f"{stats['entries']} entries in {stats['directories']} directories, "
+                f"{stats['seconds']:.3f} s ({stats['entries_per_s']:.0f} entries/s)")
+
+
+def directory_totals(scans: Iterable[DirectoryScan]) -> Iterator[Tuple[str, int]]:
+    """
+    Add up the sizes of the directories of a walk over their subtrees.
+
+    Args:
+        scans (Iterable[DirectoryScan]): The directories, in the order
+            TreeWalker.walk yields them.
+
+    Yields:
+        Tuple[str, int]: Each directory and the total size of the files
+        under it, after all of its subdirectories, as du lists them.
+    """
+    # Directories whose subtree is not finished, with their running totals
+    open_dirs: List[List] = []
+    for scan in scans:
+        while open_dirs and open_dirs[-1][1] >= scan.depth:
+            yield _close_directory(open_dirs)
+        open_dirs.append([scan.path, scan.depth, scan.size])
+    while open_dirs:
+        yield _close_directory(open_dirs)
+
+
+def _close_directory(open_dirs: List[List]) -> Tuple[str, int]:
+    path, _, total = open_dirs.pop()
+    if open_dirs:
+        open_dirs[-1][2] += total
+    return path, total